@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import time
+import zlib
+import struct
+import hashlib
+import threading
+from typing import Callable
+import structlog
+
+# A producer turns a description into image bytes and their content type.
+ImageProducer = Callable[[str], tuple[bytes, str]]
+
+CONTENT_TYPE_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/webp": ".webp",
+}
+
+
+def normalize_description(description: str) -> str:
+    """Lowercases the description and collapses whitespace and trailing punctuation."""
+    return " ".join(description.lower().split()).strip(" .,;:!?")
+
+
+def description_key(description: str) -> str:
+    """Returns the store key for a description: SHA-256 of its normalised form."""
+    return hashlib.sha256(normalize_description(description).encode("utf-8")).hexdigest()
+
+
+def stub_producer(description: str) -> tuple[bytes, str]:
+    """
+    An offline producer that renders a 1x1 PNG whose colour is derived from the
+    description, so tests and local runs never call an image model.
+    """
+    red, green, blue = hashlib.sha256(description.encode("utf-8")).digest()[:3]
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(bytes([0, red, green, blue]))
+    png = b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+    return png, "image/png"
+
+
+class ArtifactStore:
+    """
+    Stores generated images on disk keyed by the normalised description hash,
+    so a repeated description never triggers a new image generation.
+    Each artifact is a `<key><ext>` file next to a `<key>.json` metadata file.
+    """
+    def __init__(self, logger, root_dir: str):
+        """
+        Initializes the ArtifactStore in `root_dir`, creating it if needed.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.root_dir = root_dir
+        self._lock = threading.Lock()
+        os.makedirs(root_dir, exist_ok=True)
+
+    def _metadata_path(self, key: str) -> str:
+        return os.path.join(self.root_dir, f"{key}.json")
+
+    def get(self, description: str) -> dict | None:
+        """Returns the metadata of a stored artifact for the description, or None."""
+        return self.get_by_key(description_key(description))
+
+    def get_by_key(self, key: str) -> dict | None:
+        """Returns the metadata for a store key, or None if it is missing or its file is gone."""
+        if not re.fullmatch(r"[0-9a-f]{64}", key):
+            return None
+        try:
+            with open(self._metadata_path(key), "r") as f:
+                metadata = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if not os.path.exists(os.path.join(self.root_dir, metadata["filename"])):
+            return None
+        return metadata
+
+    def get_or_create(self, description: str, producer: ImageProducer) -> dict:
+        """
+        Returns the stored artifact for the description, producing it first if needed.
+
+        Args:
+            description (str): The robot description.
+            producer (ImageProducer): Called with the description only when no artifact exists.
+
+        Returns:
+            dict: Metadata with "key", "filename", "content_type", "etag", "size" and "description".
+        """
+        key = description_key(description)
+        with self._lock:
+            metadata = self.get_by_key(key)
+            if metadata:
+                self.logger.info(f"Artifact cache hit for key {key}")
+                return metadata
+
+            self.logger.info(f"Artifact cache miss for key {key}, producing image")
+            data, content_type = producer(description)
+            filename = f"{key}{CONTENT_TYPE_EXTENSIONS.get(content_type, '.bin')}"
+            tmp_path = os.path.join(self.root_dir, f"{filename}.tmp")
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.root_dir, filename))
+
+            metadata = {
+                "key": key,
+                "filename": filename,
+                "content_type": content_type,
+                "etag": hashlib.sha256(data).hexdigest()[:32],
+                "size": len(data),
+                "description": description,
+                "created": time.time(),
+            }
+            tmp_path = f"{self._metadata_path(key)}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(metadata, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self._metadata_path(key))
+            return metadata
@@ -0,0 +1,250 @@
+import os
+import sys
+import json
+import time
+import base64
+import hashlib
+import threading
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_STATE_DIR = "./downloads/batch"
+DONE_STATES = {"JOB_STATE_SUCCEEDED", "JOB_STATE_FAILED", "JOB_STATE_CANCELLED", "JOB_STATE_EXPIRED"}
+
+
+def text_part(text: str) -> dict:
+    return {"text": text}
+
+
+def inline_part(data: bytes, mime_type: str) -> dict:
+    return {"inline_data": {"mime_type": mime_type, "data": base64.b64encode(data).decode("ascii")}}
+
+
+def build_request(parts: list[dict], system_instruction: str | None = None, **generation_config) -> dict:
+    """Builds one GenerateContentRequest in the JSON shape used by batch-job input files."""
+    request = {"contents": [{"role": "user", "parts": parts}]}
+    if system_instruction:
+        request["system_instruction"] = {"parts": [text_part(system_instruction)]}
+    if generation_config:
+        request["generation_config"] = generation_config
+    return request
+
+
+def response_text(response: dict) -> str | None:
+    """Joins the text parts of the first candidate of a GenerateContentResponse dict."""
+    candidates = response.get("candidates") or []
+    if not candidates:
+        return None
+    parts = (candidates[0].get("content") or {}).get("parts") or []
+    return "".join(part.get("text", "") for part in parts)
+
+
+class GeminiBatchBackend:
+    """Submits JSONL request files to the Gemini Batch API and downloads the result files."""
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, jsonl_path: str, model: str, display_name: str) -> str:
+        uploaded = self.client.files.upload(file=jsonl_path, config={"display_name": display_name, "mime_type": "jsonl"})
+        job = self.client.batches.create(model=model, src=uploaded.name, config={"display_name": display_name})
+        return job.name
+
+    def state(self, job_name: str) -> str:
+        job = self.client.batches.get(name=job_name)
+        return getattr(job.state, "name", str(job.state))
+
+    def results(self, job_name: str) -> bytes:
+        job = self.client.batches.get(name=job_name)
+        return self.client.files.download(file=job.dest.file_name)
+
+
+class LocalBatchStandIn:
+    """
+    A local stand-in for the batch endpoint: jobs are answered by
+    `responder(key, request) -> text` on a background thread after
+    `delay_seconds`, and results use the provider's output JSONL shape.
+    """
+    def __init__(self, responder, delay_seconds: float = 0.0):
+        self.responder = responder
+        self.delay_seconds = delay_seconds
+        self.submitted = 0
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, jsonl_path: str, model: str, display_name: str) -> str:
+        with open(jsonl_path, "r", encoding="utf-8") as f:
+            lines = [json.loads(line) for line in f if line.strip()]
+        with self._lock:
+            self.submitted += 1
+            job_name = f"batches/local-{self.submitted}"
+            self._jobs[job_name] = {"state": "JOB_STATE_PENDING", "output": b""}
+        threading.Thread(target=self._run, args=(job_name, lines), daemon=True).start()
+        return job_name
+
+    def _run(self, job_name: str, lines: list[dict]):
+        time.sleep(self.delay_seconds)
+        output = []
+        for line in lines:
+            try:
+                text = self.responder(line["key"], line["request"])
+                output.append({"key": line["key"], "response": {"candidates": [{"content": {"parts": [text_part(text)]}}]}})
+            except Exception as e:
+                output.append({"key": line["key"], "error": {"message": str(e)}})
+        with self._lock:
+            self._jobs[job_name] = {"state": "JOB_STATE_SUCCEEDED",
+                                    "output": "".join(json.dumps(item) + "\n" for item in output).encode("utf-8")}
+
+    def state(self, job_name: str) -> str:
+        with self._lock:
+            return self._jobs[job_name]["state"]
+
+    def results(self, job_name: str) -> bytes:
+        with self._lock:
+            return self._jobs[job_name]["output"]
+
+
+class BatchJobRunner:
+    """
+    Runs many generate_content requests as provider batch jobs instead of
+    interactive calls. Requests are written to JSONL chunks, submitted,
+    polled and mapped back to their keys. Progress is kept in a state file
+    per job id, so an interrupted run resumes: written chunks are not
+    rewritten, submitted jobs are polled rather than resubmitted and
+    downloaded results are reused. A chunk whose job failed, expired or was
+    cancelled is submitted again, up to `max_resubmits` times. Changing the
+    requests starts a new job.
+    """
+    def __init__(self, logger, backend, state_dir: str = DEFAULT_STATE_DIR, chunk_size: int = 1000,
+                 poll_interval_seconds: float = 60.0, max_resubmits: int = 2):
+        """
+        Initializes the BatchJobRunner.
+
+        Args:
+            logger: The logger.
+            backend: GeminiBatchBackend or LocalBatchStandIn.
+            state_dir (str, optional): Where JSONL inputs, results and state files are kept.
+            chunk_size (int, optional): Requests per submitted batch job.
+            poll_interval_seconds (float, optional): Delay between status checks.
+            max_resubmits (int, optional): How often a chunk that did not succeed is submitted again.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.backend = backend
+        self.state_dir = state_dir
+        self.chunk_size = chunk_size
+        self.poll_interval_seconds = poll_interval_seconds
+        self.max_resubmits = max_resubmits
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.state.json")
+
+    def _save_state(self, job_id: str, state: dict):
+        tmp_path = f"{self._state_path(job_id)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp_path, self._state_path(job_id))
+
+    def _load_state(self, job_id: str, model: str, requests: dict[str, dict]) -> dict:
+        fingerprint = hashlib.sha256(json.dumps([model, requests], sort_keys=True).encode("utf-8")).hexdigest()
+        try:
+            with open(self._state_path(job_id), "r") as f:
+                state = json.load(f)
+            if state.get("fingerprint") == fingerprint:
+                return state
+            self.logger.info(f"Requests of batch job {job_id} changed, starting over")
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+        keys = list(requests)
+        chunks = []
+        for number, start in enumerate(range(0, len(keys), self.chunk_size)):
+            chunk_keys = keys[start:start + self.chunk_size]
+            jsonl_path = os.path.join(self.state_dir, f"{job_id}.{number}.jsonl")
+            with open(jsonl_path, "w", encoding="utf-8") as f:
+                for key in chunk_keys:
+                    f.write(json.dumps({"key": key, "request": requests[key]}, ensure_ascii=False) + "\n")
+            chunks.append({"input": jsonl_path, "keys": chunk_keys, "job_name": None, "state": "WRITTEN", "submissions": 0,
+                           "output": os.path.join(self.state_dir, f"{job_id}.{number}.results.jsonl")})
+        state = {"fingerprint": fingerprint, "model": model, "chunks": chunks}
+        self._save_state(job_id, state)
+        return state
+
+    def run(self, job_id: str, model: str, requests: dict[str, dict], wait: bool = True) -> dict[str, str | None]:
+        """
+        Submits (or resumes) a batch job and returns the response text per request key.
+
+        Args:
+            job_id (str): Stable name of the job, e.g. "classification-ocr".
+            model (str): The model name.
+            requests (dict[str, dict]): Requests (see build_request) keyed by e.g. filename.
+            wait (bool, optional): Poll until every chunk finished; otherwise return what is done so far.
+
+        Returns:
+            dict[str, str | None]: Response text per key; None for failed or unfinished requests.
+        """
+        if not requests:
+            return {}
+        os.makedirs(self.state_dir, exist_ok=True)
+        state = self._load_state(job_id, model, requests)
+
+        self._submit(job_id, model, state)
+        while True:
+            pending = [chunk for chunk in state["chunks"] if chunk["state"] not in DONE_STATES]
+            for chunk in pending:
+                chunk["state"] = self.backend.state(chunk["job_name"])
+                if chunk["state"] == "JOB_STATE_SUCCEEDED":
+                    with open(chunk["output"], "wb") as f:
+                        f.write(self.backend.results(chunk["job_name"]))
+                    self.logger.info(f"Batch {chunk['job_name']} finished")
+                elif chunk["state"] in DONE_STATES:
+                    self.logger.error(f"Batch {chunk['job_name']} ended in {chunk['state']}")
+            self._save_state(job_id, state)
+            self._submit(job_id, model, state)
+            if not wait or all(chunk["state"] in DONE_STATES for chunk in state["chunks"]):
+                break
+            time.sleep(self.poll_interval_seconds)
+
+        return self._collect(state)
+
+    def _submit(self, job_id: str, model: str, state: dict):
+        """Submits chunks that were never submitted, and resubmits unsuccessful ones while retries are left."""
+        for number, chunk in enumerate(state["chunks"]):
+            submissions = chunk.setdefault("submissions", 0 if chunk["job_name"] is None else 1)
+            failed = chunk["state"] in DONE_STATES and chunk["state"] != "JOB_STATE_SUCCEEDED"
+            if failed and submissions <= self.max_resubmits:
+                self.logger.warning(f"Resubmitting batch {chunk['job_name']} that ended in {chunk['state']}")
+                chunk["job_name"], chunk["state"] = None, "WRITTEN"
+            if chunk["job_name"] is None:
+                chunk["job_name"] = self.backend.submit(chunk["input"], model, f"{job_id}-{number}")
+                chunk["state"] = "SUBMITTED"
+                chunk["submissions"] = submissions + 1
+                self._save_state(job_id, state)
+                self.logger.info(f"Submitted batch {chunk['job_name']} with {len(chunk['keys'])} requests")
+
+    def _collect(self, state: dict) -> dict[str, str | None]:
+        results = {key: None for chunk in state["chunks"] for key in chunk["keys"]}
+        for chunk in state["chunks"]:
+            if chunk["state"] != "JOB_STATE_SUCCEEDED":
+                continue
+            with open(chunk["output"], "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    item = json.loads(line)
+                    if "error" in item:
+                        self.logger.error(f"Batch request {item.get('key')} failed: {item['error']}")
+                        continue
+                    results[item["key"]] = response_text(item.get("response") or {})
+        return results
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    stand_in = LocalBatchStandIn(lambda key, request: f"echo of {key}", delay_seconds=0.5)
+    runner = BatchJobRunner(logger, stand_in, chunk_size=2, poll_interval_seconds=0.2)
+    requests = {f"doc-{i}": build_request([text_part(f"document {i}")]) for i in range(5)}
+    print(runner.run("demo", "gemini-2.0-flash", requests))
+    print(runner.run("demo", "gemini-2.0-flash", requests), f"(submitted jobs: {stand_in.submitted})")
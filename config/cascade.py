@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import threading
+from dataclasses import dataclass
+from collections import defaultdict
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.tokens import estimate_tokens
+from config.logger import setup_logging
+
+
+@dataclass
+class ModelTier:
+    """One step of a cascade: a model and its price in USD per million tokens."""
+    model: str
+    provider: str = "gemini"
+    input_cost_per_million: float = 0.0
+    output_cost_per_million: float = 0.0
+
+    def cost(self, input_tokens: int, output_tokens: int) -> float:
+        return (input_tokens * self.input_cost_per_million + output_tokens * self.output_cost_per_million) / 1_000_000
+
+
+# Cheapest tier first; a tier is only used when every cheaper one failed validation.
+DEFAULT_TIERS = {
+    "captcha": [
+        ModelTier("gpt-3.5-turbo", "openai", 0.5, 1.5),
+        ModelTier("gpt-4o", "openai", 2.5, 10.0),
+    ],
+    "ready": [
+        ModelTier("gpt-4o-mini", "openai", 0.15, 0.6),
+        ModelTier("gpt-4o", "openai", 2.5, 10.0),
+    ],
+    "classify": [
+        ModelTier("gemini-2.0-flash-lite", "gemini", 0.075, 0.3),
+        ModelTier("gemini-2.0-flash", "gemini", 0.1, 0.4),
+        ModelTier("gemini-2.5-pro", "gemini", 1.25, 10.0),
+    ],
+}
+
+
+class LowConfidence(ValueError):
+    """Raised by a validator when the answer parses but the model reported low confidence."""
+
+
+class CascadeExhausted(Exception):
+    """Raised when no tier produced an answer that passed validation."""
+    def __init__(self, task: str, last_raw=None, last_error: Exception | None = None):
+        super().__init__(f"No tier of cascade {task!r} produced a valid answer: {last_error}")
+        self.last_raw = last_raw
+        self.last_error = last_error
+
+
+class ModelCascade:
+    """
+    Tries the cheapest model of a task first and escalates to the next tier
+    only when the answer fails validation (the validator raises ValueError,
+    e.g. LowConfidence) or the call errors. Latency and estimated cost are
+    tracked per task and tier.
+    """
+    def __init__(self, logger, tiers: dict[str, list[ModelTier]] | None = None):
+        """
+        Initializes the ModelCascade.
+
+        Args:
+            logger: The logger.
+            tiers (dict[str, list[ModelTier]] | None, optional): Tiers per task, cheapest first. Defaults to DEFAULT_TIERS.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.tiers = tiers if tiers is not None else DEFAULT_TIERS
+        self._stats: dict[tuple[str, str], dict] = defaultdict(
+            lambda: {"calls": 0, "accepted": 0, "escalated": 0, "errors": 0, "latency_seconds": 0.0, "cost_usd": 0.0}
+        )
+        self._lock = threading.Lock()
+
+    def tiers_for(self, task: str) -> list[ModelTier]:
+        if task not in self.tiers:
+            raise KeyError(f"No cascade tiers configured for task {task!r}")
+        return self.tiers[task]
+
+    def _record(self, task: str, tier: ModelTier, latency: float, input_tokens: int, raw, outcome: str):
+        output_tokens = estimate_tokens(str(raw)) if raw is not None else 0
+        with self._lock:
+            stats = self._stats[(task, tier.model)]
+            stats["calls"] += 1
+            stats[outcome] += 1
+            stats["latency_seconds"] += latency
+            stats["cost_usd"] += tier.cost(input_tokens, output_tokens)
+
+    def _check(self, task: str, tier: ModelTier, is_last: bool, started: float, input_tokens: int,
+               raw, error: Exception | None, validate):
+        """Validates one tier's answer; returns (accepted, value, error)."""
+        latency = time.monotonic() - started
+        if error is None:
+            try:
+                value = validate(raw)
+                self._record(task, tier, latency, input_tokens, raw, "accepted")
+                return True, value, None
+            except ValueError as e:
+                error = e
+            self._record(task, tier, latency, input_tokens, raw, "escalated")
+        else:
+            self._record(task, tier, latency, input_tokens, None, "errors")
+        if not is_last:
+            self.logger.info(f"Cascade {task}: {tier.model} rejected ({error}), escalating")
+        return False, None, error
+
+    def run(self, task: str, call, validate, input_tokens: int = 0):
+        """
+        Runs `call(tier)` tier by tier until `validate(raw)` accepts the result.
+
+        Args:
+            task (str): The task whose tiers are used, e.g. "captcha".
+            call: Takes a ModelTier and returns the raw answer (e.g. response text).
+            validate: Takes the raw answer and returns the parsed value, raising ValueError to escalate.
+            input_tokens (int, optional): Estimated prompt tokens, used for the cost report.
+
+        Returns:
+            tuple: The parsed value and the raw answer it came from.
+        """
+        tiers = self.tiers_for(task)
+        raw, error = None, None
+        for index, tier in enumerate(tiers):
+            started = time.monotonic()
+            try:
+                raw, error = call(tier), None
+            except Exception as e:
+                raw, error = None, e
+                self.logger.warning(f"Cascade {task}: {tier.model} failed: {e}")
+            accepted, value, error = self._check(task, tier, index == len(tiers) - 1, started, input_tokens, raw, error, validate)
+            if accepted:
+                return value, raw
+        raise CascadeExhausted(task, raw, error)
+
+    async def run_async(self, task: str, call, validate, input_tokens: int = 0):
+        """The asyncio counterpart of `run`; `call(tier)` is a coroutine function."""
+        tiers = self.tiers_for(task)
+        raw, error = None, None
+        for index, tier in enumerate(tiers):
+            started = time.monotonic()
+            try:
+                raw, error = await call(tier), None
+            except Exception as e:
+                raw, error = None, e
+                self.logger.warning(f"Cascade {task}: {tier.model} failed: {e}")
+            accepted, value, error = self._check(task, tier, index == len(tiers) - 1, started, input_tokens, raw, error, validate)
+            if accepted:
+                return value, raw
+        raise CascadeExhausted(task, raw, error)
+
+    def report(self) -> dict:
+        """Returns calls, outcomes, mean latency and estimated cost per task and tier."""
+        with self._lock:
+            stats = {key: dict(value) for key, value in self._stats.items()}
+        report = {}
+        for (task, model), values in stats.items():
+            values["mean_latency_seconds"] = round(values["latency_seconds"] / values["calls"], 3)
+            values["latency_seconds"] = round(values["latency_seconds"], 3)
+            values["cost_usd"] = round(values["cost_usd"], 6)
+            report.setdefault(task, {})[model] = values
+        return report
+
+
+if __name__ == "__main__":
+    import random
+
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    cascade = ModelCascade(logger)
+
+    def call(tier):
+        # Stand-in model: the cheapest tier answers badly a third of the time.
+        time.sleep(0.01 if tier.model.startswith("gpt-3.5") else 0.03)
+        return "unsure" if tier.model.startswith("gpt-3.5") and random.random() < 0.33 else "1410"
+
+    for _ in range(30):
+        cascade.run("captcha", call, lambda raw: int(raw.strip()), input_tokens=40)
+    for model, values in cascade.report()["captcha"].items():
+        print(f"{model:16} {values}")
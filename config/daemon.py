@@ -0,0 +1,333 @@
+import io
+import os
+import sys
+import json
+import time
+import runpy
+import socket
+import logging
+import importlib
+import threading
+import traceback
+import subprocess
+import socketserver
+from contextlib import contextmanager
+from dotenv import load_dotenv
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_SOCKET_PATH = "./downloads/worker.sock"
+# SDKs imported once when the daemon starts; missing ones are skipped.
+DEFAULT_PRELOAD = (
+    "google.genai", "google.generativeai", "openai", "httpx", "requests",
+    "PIL.Image", "bs4", "structlog", "langfuse",
+)
+# Scripts whose module body only imports and defines things (no downloads, no LLM calls),
+# so the benchmark can execute it without its `__main__` block. Keep this list explicit:
+# tasks/s01e04/langfuse.py and tasks/s02e01/mp3.py call models at module level.
+BENCHMARK_SCRIPTS = (
+    "tasks/s00e01/poligon.py",
+    "tasks/s01e01/captcha.py",
+    "tasks/s01e02/ready.py",
+    "tasks/s01e03/task_json.py",
+    "tasks/s01e05/cenzura.py",
+    "tasks/s02e02/recognize.py",
+    "tasks/s02e03/robotid.py",
+    "tasks/s02e04/clasiffication.py",
+)
+# Function jobs and their kwargs. These reuse the module's shared clients in the daemon, so the
+# warm time includes the kept-alive connection pool. login contacts the login page and OpenAI.
+BENCHMARK_FUNCTIONS = {
+    "tasks.s01e01.captcha:get_openai_client": {},
+    "tasks.s01e01.captcha:login": {"attempts": 1},
+}
+
+
+class _ThreadRoutedStream(io.TextIOBase):
+    """
+    Replaces sys.stdout in the daemon: text written by a thread that is
+    running a job goes to that job's connection, everything else to the
+    original stream.
+    """
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self.local = threading.local()
+
+    def write(self, text):
+        sink = getattr(self.local, "sink", None)
+        if sink is None:
+            return self.fallback.write(text)
+        if text:
+            sink({"type": "stdout", "text": text})
+        return len(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+
+class _ThreadRoutedLogHandler(logging.Handler):
+    """Forwards log records emitted on a job's thread to that job's connection."""
+    def __init__(self, stream: _ThreadRoutedStream):
+        super().__init__()
+        self.stream = stream
+        self.setFormatter(logging.Formatter("%(message)s"))
+
+    def emit(self, record):
+        sink = getattr(self.stream.local, "sink", None)
+        if sink is not None:
+            sink({"type": "log", "level": record.levelname, "line": self.format(record)})
+
+
+class WarmDaemon:
+    """
+    A long-lived local worker that keeps SDK imports, `.env`, module-level
+    clients and their connection pools warm between task runs. Jobs arrive
+    as one JSON line over a Unix socket; stdout, log lines and the result are
+    streamed back as JSON lines.
+
+    Job forms:
+        {"function": "tasks.s01e01.captcha:login", "args": [...], "kwargs": {...}}
+            Imports the module once and calls the function. Modules stay
+            imported, so their shared clients are reused. Runs concurrently.
+        {"script": "tasks/s02e04/clasiffication.py", "argv": [...], "run_name": "__main__"}
+            Executes a task script with the given argv. Scripts share the
+            process-wide sys.argv, so they run one at a time. The script body
+            is executed again for every job, so module-level clients (e.g.
+            `client = genai.Client(...)`) are recreated each time; only the
+            SDK imports stay warm. Use function jobs to reuse clients.
+
+    Jobs run from the daemon's working directory. Output of threads started
+    by a job is not routed back and appears in the daemon's own output.
+    """
+    def __init__(self, logger, socket_path: str = DEFAULT_SOCKET_PATH, preload: tuple[str, ...] = DEFAULT_PRELOAD):
+        """
+        Initializes the WarmDaemon.
+
+        Args:
+            logger: The logger.
+            socket_path (str, optional): Path of the Unix socket to listen on.
+            preload (tuple[str, ...], optional): Modules imported at startup.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.socket_path = socket_path
+        self.preload = preload
+        self.jobs = 0
+        self._script_lock = threading.Lock()
+        self._server = None
+
+    def warm_up(self) -> dict:
+        """Loads `.env` and imports the preload modules; returns the import time per module."""
+        load_dotenv()
+        timings = {}
+        for module_name in self.preload:
+            started = time.perf_counter()
+            try:
+                importlib.import_module(module_name)
+            except ImportError as e:
+                self.logger.warning(f"Preload of {module_name} skipped: {e}")
+                continue
+            timings[module_name] = round(time.perf_counter() - started, 3)
+        self.logger.info(f"Daemon warmed up: {timings}")
+        return timings
+
+    def run_job(self, job: dict):
+        """Runs one job on the current thread and returns its JSON-serialisable result."""
+        if "function" in job:
+            module_name, _, function_name = job["function"].partition(":")
+            function = getattr(importlib.import_module(module_name), function_name)
+            return function(*job.get("args", []), **job.get("kwargs", {}))
+        if "script" in job:
+            script_path = os.path.abspath(job["script"])
+            with self._script_lock, self._script_environment(script_path, job.get("argv", [])):
+                runpy.run_path(script_path, run_name=job.get("run_name", "__main__"))
+            return None
+        raise ValueError("A job needs either 'function' or 'script'")
+
+    @contextmanager
+    def _script_environment(self, script_path: str, argv: list[str]):
+        """Sets sys.argv for the script and drops the log handlers it adds (setup_logging adds one per run)."""
+        saved_argv = sys.argv
+        root_logger = logging.getLogger()
+        saved_handlers = list(root_logger.handlers)
+        sys.argv = [script_path, *argv]
+        try:
+            yield
+        finally:
+            sys.argv = saved_argv
+            for handler in root_logger.handlers[:]:
+                if handler not in saved_handlers:
+                    root_logger.removeHandler(handler)
+                    handler.close()
+
+    def _handler_class(self):
+        daemon = self
+
+        class JobHandler(socketserver.StreamRequestHandler):
+            def handle(self):
+                write_lock = threading.Lock()
+
+                def send(event: dict):
+                    line = (json.dumps(event, default=str) + "\n").encode("utf-8")
+                    with write_lock:
+                        try:
+                            self.wfile.write(line)
+                            self.wfile.flush()
+                        except OSError:
+                            pass  # <--- The client went away; the job still finishes
+
+                try:
+                    job = json.loads(self.rfile.readline())
+                except json.JSONDecodeError as e:
+                    send({"type": "error", "error": f"Invalid job: {e}"})
+                    return
+                daemon.jobs += 1
+                started = time.perf_counter()
+                stream = sys.stdout if isinstance(sys.stdout, _ThreadRoutedStream) else None
+                if stream:
+                    stream.local.sink = send
+                try:
+                    result = daemon.run_job(job)
+                    send({"type": "result", "ok": True, "value": result, "seconds": round(time.perf_counter() - started, 3)})
+                except SystemExit as e:
+                    event = "result" if e.code in (0, None) else "error"
+                    send({"type": event, "ok": event == "result", "exit_code": e.code,
+                          "seconds": round(time.perf_counter() - started, 3)})
+                except Exception as e:
+                    send({"type": "error", "error": repr(e), "traceback": traceback.format_exc(),
+                          "seconds": round(time.perf_counter() - started, 3)})
+                finally:
+                    if stream:
+                        stream.local.sink = None
+
+        return JobHandler
+
+    def serve_forever(self):
+        """Warms up, then serves jobs until interrupted."""
+        self.warm_up()
+        os.makedirs(os.path.dirname(os.path.abspath(self.socket_path)), exist_ok=True)
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        stream = _ThreadRoutedStream(sys.stdout)
+        sys.stdout = stream
+        logging.getLogger().addHandler(_ThreadRoutedLogHandler(stream))
+        self._server = socketserver.ThreadingUnixStreamServer(self.socket_path, self._handler_class())
+        self._server.daemon_threads = True
+        self.logger.info(f"Daemon listening on {self.socket_path}")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            sys.stdout = stream.fallback
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+
+
+def submit(job: dict, socket_path: str = DEFAULT_SOCKET_PATH, timeout: float | None = None):
+    """
+    Sends a job to the daemon and yields its events (stdout, log, then result or error) as they arrive.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+        connection.settimeout(timeout)
+        connection.connect(socket_path)
+        connection.sendall((json.dumps(job) + "\n").encode("utf-8"))
+        with connection.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                yield json.loads(line)
+
+
+def run_remote(job: dict, socket_path: str = DEFAULT_SOCKET_PATH):
+    """Submits a job, echoes its stdout and logs locally, and returns the final result or error event."""
+    final = None
+    for event in submit(job, socket_path):
+        if event["type"] == "stdout":
+            sys.stdout.write(event["text"])
+        elif event["type"] == "log":
+            sys.stderr.write(event["line"] + "\n")
+        else:
+            final = event
+    return final
+
+
+def benchmark_entry_points() -> list[str]:
+    """
+    The allow-listed scripts that exist in this checkout, followed by the allow-listed function jobs.
+    A `__main__` guard alone does not make a script safe to benchmark: some tasks download files or
+    call models at module level.
+    """
+    return [path for path in BENCHMARK_SCRIPTS if os.path.exists(path)] + list(BENCHMARK_FUNCTIONS)
+
+
+def _benchmark_job(entry: str) -> tuple[list[str], dict]:
+    """Returns the cold command and the daemon job for a script path or a "module:function" entry."""
+    if ":" in entry:
+        if entry not in BENCHMARK_FUNCTIONS:
+            raise ValueError(f"Not in BENCHMARK_FUNCTIONS: {entry}")
+        kwargs = BENCHMARK_FUNCTIONS[entry]
+        code = ("import sys, json, importlib; module, _, name = sys.argv[1].partition(':'); "
+                "getattr(importlib.import_module(module), name)(**json.loads(sys.argv[2]))")
+        return [sys.executable, "-c", code, entry, json.dumps(kwargs)], {"function": entry, "kwargs": kwargs}
+    if os.path.normpath(entry) not in map(os.path.normpath, BENCHMARK_SCRIPTS):
+        raise ValueError(f"Not in BENCHMARK_SCRIPTS (its module body may have side effects): {entry}")
+    code = f"import runpy; runpy.run_path({entry!r}, run_name='__bench__')"
+    return [sys.executable, "-c", code], {"script": entry, "run_name": "__bench__"}
+
+
+def benchmark(entries: list[str], socket_path: str = DEFAULT_SOCKET_PATH, repeats: int = 3) -> dict:
+    """
+    Compares cold and warm runs, once in a fresh interpreter and once inside the running daemon.
+    A script entry executes the module body (imports, `.env`, prompt setup) without its `__main__`
+    block, so only import time is measured. A "module:function" entry calls the function, so the
+    warm run also reuses the module's clients and their open connections. Only entries from
+    BENCHMARK_SCRIPTS and BENCHMARK_FUNCTIONS are accepted.
+
+    Returns:
+        dict: Per entry, the best cold and warm seconds (None if every run failed).
+    """
+    jobs = {entry: _benchmark_job(entry) for entry in entries}  # <--- Rejects unknown entries before running any
+    results = {}
+    for entry, (cold_command, job) in jobs.items():
+        cold, warm = [], []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            completed = subprocess.run(cold_command, capture_output=True)
+            if completed.returncode == 0:
+                cold.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            final = run_remote(job, socket_path)
+            if final and final["type"] == "result":
+                warm.append(time.perf_counter() - started)
+        results[entry] = {"cold_seconds": round(min(cold), 3) if cold else None,
+                          "warm_seconds": round(min(warm), 3) if warm else None}
+    return results
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "serve"
+    if command == "serve":
+        setup_logging()
+        WarmDaemon(structlog.get_logger(__name__)).serve_forever()
+    elif command == "run":
+        # python config/daemon.py run tasks/s02e04/clasiffication.py --batched
+        final = run_remote({"script": sys.argv[2], "argv": sys.argv[3:]})
+        print(final)
+        sys.exit(0 if final and final["type"] == "result" else 1)
+    elif command == "call":
+        # python config/daemon.py call tasks.s01e01.captcha:login '{"attempts": 2}'
+        final = run_remote({"function": sys.argv[2], "kwargs": json.loads(sys.argv[3]) if len(sys.argv) > 3 else {}})
+        print(final)
+        sys.exit(0 if final and final["type"] == "result" else 1)
+    elif command == "bench":
+        entries = sys.argv[2:] or benchmark_entry_points()
+        for entry, timing in benchmark(entries).items():
+            print(f"{entry:40} cold={timing['cold_seconds']}s warm={timing['warm_seconds']}s")
+    else:
+        print("Usage: daemon.py [serve | run <script> [args...] | call <module:function> [kwargs-json] | bench [scripts or module:functions...]]")
+        sys.exit(2)
@@ -0,0 +1,185 @@
+import time
+import asyncio
+import threading
+from collections import deque, defaultdict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+import structlog
+
+
+class HedgeBudgetExceeded(TimeoutError):
+    """Raised when neither the primary nor the hedged request finished within the call budget."""
+
+
+class HedgingPolicy:
+    """
+    Opt-in request hedging for idempotent calls. When a call has not finished
+    by the configured percentile of its recent latencies, a duplicate is sent
+    (to the same function or a backup, e.g. another model) and the first
+    success wins. Only primary attempts feed the percentile, so fast hedges
+    cannot pull the trigger down. Asyncio losers are cancelled; thread-based
+    losers cannot be interrupted, so callers pass `attempt_timeout()` to their
+    client and a running loser gives up its request, and its admission slot,
+    by the end of the budget at the latest.
+    """
+    def __init__(self, logger, percentile: float = 0.95, min_samples: int = 10, initial_delay_seconds: float = 5.0,
+                 budget_seconds: float | None = 60.0, window: int = 200, max_workers: int = 16,
+                 backup_models: dict[str, str] | None = None):
+        """
+        Initializes the HedgingPolicy.
+
+        Args:
+            logger: The logger.
+            percentile (float, optional): Latency percentile after which the hedge fires.
+            min_samples (int, optional): Samples needed before the percentile replaces `initial_delay_seconds`.
+            initial_delay_seconds (float, optional): Hedge delay used until enough latencies are observed.
+            budget_seconds (float | None, optional): Hard limit for the whole call, including the hedge.
+            window (int, optional): Number of recent latencies kept per key.
+            max_workers (int, optional): Threads shared by all hedged calls.
+            backup_models (dict[str, str] | None, optional): Model to send the hedge to, per primary model.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.initial_delay_seconds = initial_delay_seconds
+        self.budget_seconds = budget_seconds
+        self.backup_models = backup_models or {}
+        self._latencies: dict[str, deque] = defaultdict(lambda: deque(maxlen=window))
+        self._stats: dict[str, dict] = defaultdict(lambda: {"calls": 0, "hedges_fired": 0, "hedges_won": 0, "budget_exceeded": 0})
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="hedge")
+
+    def backup_model(self, model_name: str) -> str:
+        """Returns the model the hedge should use; the primary model itself if no backup is configured."""
+        return self.backup_models.get(model_name, model_name)
+
+    def hedge_delay(self, key: str) -> float:
+        """Returns the current hedge delay for a key: the latency percentile, or the initial delay."""
+        with self._lock:
+            samples = sorted(self._latencies[key])
+        if len(samples) < self.min_samples:
+            return self.initial_delay_seconds
+        return samples[min(len(samples) - 1, int(self.percentile * len(samples)))]
+
+    def attempt_timeout(self) -> float | None:
+        """Client timeout in seconds for one attempt: the hard budget, after which nobody waits for it."""
+        return self.budget_seconds
+
+    def _record_primary(self, key: str, started: float, primary):
+        """Done callback of the primary attempt: adds its latency if it succeeded, even after the hedge won."""
+        if primary.cancelled() or primary.exception() is not None:
+            return
+        with self._lock:
+            self._latencies[key].append(time.monotonic() - started)
+
+    def _record(self, key: str, hedged: bool, hedge_won: bool, budget_exceeded: bool = False):
+        with self._lock:
+            stats = self._stats[key]
+            stats["calls"] += 1
+            stats["hedges_fired"] += hedged
+            stats["hedges_won"] += hedge_won
+            stats["budget_exceeded"] += budget_exceeded
+
+    def _first_wait(self, key: str, started: float) -> float | None:
+        delay = self.hedge_delay(key)
+        remaining = self._remaining(started)
+        return delay if remaining is None else min(delay, remaining)
+
+    def _remaining(self, started: float) -> float | None:
+        if self.budget_seconds is None:
+            return None
+        return max(0.0, self.budget_seconds - (time.monotonic() - started))
+
+    def call(self, key: str, function, backup_function=None):
+        """
+        Runs `function()` with hedging.
+
+        Args:
+            key (str): Groups calls with similar latency, e.g. "classify:gemini-2.0-flash".
+            function: The idempotent zero-argument call.
+            backup_function (optional): Used for the hedge instead of repeating `function`.
+
+        Returns:
+            The result of whichever request succeeded first.
+        """
+        started = time.monotonic()
+        primary = self._executor.submit(function)
+        primary.add_done_callback(lambda future: self._record_primary(key, started, future))
+        pending = {primary}
+        hedge = None
+        last_error = None
+
+        done, _ = wait(pending, timeout=self._first_wait(key, started))
+        while True:
+            for future in done:
+                pending.discard(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    self.logger.warning(f"Hedged call {key} attempt failed: {e}")
+                    continue
+                for loser in pending:
+                    loser.cancel()
+                self._record(key, hedge is not None, future is hedge)
+                return result
+
+            remaining = self._remaining(started)
+            if hedge is None and (remaining is None or remaining > 0):
+                hedge = self._executor.submit(backup_function or function)
+                pending.add(hedge)
+                self.logger.info(f"Hedge fired for {key} after {time.monotonic() - started:.2f}s")
+            elif not pending:
+                self._record(key, hedge is not None, False)
+                raise last_error
+            if remaining == 0:
+                for loser in pending:
+                    loser.cancel()
+                self._record(key, hedge is not None, False, budget_exceeded=True)
+                raise HedgeBudgetExceeded(f"Call {key} exceeded its {self.budget_seconds}s budget")
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+
+    async def call_async(self, key: str, coroutine_function, backup_coroutine_function=None):
+        """The asyncio counterpart of `call`; the losing request is cancelled, also when the caller is."""
+        started = time.monotonic()
+        primary = asyncio.ensure_future(coroutine_function())
+        primary.add_done_callback(lambda task: self._record_primary(key, started, task))
+        pending = {primary}
+        hedge = None
+        last_error = None
+
+        done, _ = await asyncio.wait(pending, timeout=self._first_wait(key, started))
+        try:
+            while True:
+                for task in done:
+                    pending.discard(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        self.logger.warning(f"Hedged call {key} attempt failed: {last_error}")
+                        continue
+                    self._record(key, hedge is not None, task is hedge)
+                    return task.result()
+
+                remaining = self._remaining(started)
+                if hedge is None and (remaining is None or remaining > 0):
+                    hedge = asyncio.ensure_future((backup_coroutine_function or coroutine_function)())
+                    pending.add(hedge)
+                    self.logger.info(f"Hedge fired for {key} after {time.monotonic() - started:.2f}s")
+                elif not pending:
+                    self._record(key, hedge is not None, False)
+                    raise last_error
+                if remaining == 0:
+                    self._record(key, hedge is not None, False, budget_exceeded=True)
+                    raise HedgeBudgetExceeded(f"Call {key} exceeded its {self.budget_seconds}s budget")
+                done, _ = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def report(self) -> dict:
+        """Returns per-key counts of calls, fired hedges, hedges that won and budget overruns, plus the current delay."""
+        with self._lock:
+            keys = list(self._stats)
+            stats = {key: dict(self._stats[key]) for key in keys}
+        for key in keys:
+            stats[key]["hedge_delay_seconds"] = round(self.hedge_delay(key), 3)
+        return stats
@@ -0,0 +1,167 @@
+import io
+import os
+import sys
+import zipfile
+from dataclasses import dataclass
+from typing import Iterator
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+SNIFF_BYTES = 64
+DEFAULT_ARCHIVE_CAP_BYTES = 256 * 1024 * 1024  # <--- Maximum uncompressed bytes read from one archive
+DEFAULT_MAX_DEPTH = 3  # <--- Maximum nesting of archives inside archives
+
+
+@dataclass
+class Document:
+    """A file or archive member ready for extraction, identified by its sniffed kind."""
+    name: str
+    data: bytes
+    kind: str
+    mime_type: str
+
+
+def sniff(head: bytes) -> tuple[str, str] | None:
+    """
+    Identifies content by its magic bytes.
+
+    Returns:
+        tuple[str, str] | None: (kind, mime type) where kind is "image", "audio", "text" or "zip",
+        or None if the content is not recognised.
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image", "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image", "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image", "image/gif"
+    if head.startswith(b"RIFF") and head[8:12] == b"WEBP":
+        return "image", "image/webp"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip", "application/zip"
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio", "audio/mpeg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "audio", "audio/wav"
+    if head.startswith(b"OggS"):
+        return "audio", "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio", "audio/flac"
+    if head[4:8] == b"ftyp":
+        return "audio", "audio/mp4"
+    if looks_like_text(head):
+        return "text", "text/plain"
+    return None
+
+
+def looks_like_text(head: bytes) -> bool:
+    """Treats content as text if it decodes as UTF-8 (allowing a cut multi-byte tail) without control bytes."""
+    if not head or b"\x00" in head:
+        return False
+    try:
+        text = head.decode("utf-8")
+    except UnicodeDecodeError as e:
+        if e.start < len(head) - 3:
+            return False
+        text = head[:e.start].decode("utf-8")
+    return all(c.isprintable() or c in "\r\n\t\f" for c in text)
+
+
+class DocumentIngestor:
+    """
+    Turns files into Documents routed by magic bytes rather than extension.
+    Zip archives are streamed member by member from memory, including nested
+    archives, without unpacking anything to disk.
+    """
+    def __init__(self, logger, archive_cap_bytes: int = DEFAULT_ARCHIVE_CAP_BYTES, max_depth: int = DEFAULT_MAX_DEPTH,
+                 archive_password: bytes | None = None):
+        """
+        Initializes the DocumentIngestor.
+
+        Args:
+            logger: The logger.
+            archive_cap_bytes (int, optional): Maximum uncompressed bytes read from one top-level archive.
+            max_depth (int, optional): Maximum archive nesting depth.
+            archive_password (bytes | None, optional): Password for encrypted archive members.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.archive_cap_bytes = archive_cap_bytes
+        self.max_depth = max_depth
+        self.archive_password = archive_password
+
+    def iter_path(self, file_path: str) -> Iterator[Document]:
+        """Yields the documents contained in a file: the file itself, or the members of an archive."""
+        if not os.path.isfile(file_path):
+            self.logger.info(f"Skipping non-file path: {file_path}")
+            return
+        name = os.path.basename(file_path)
+        with open(file_path, "rb") as f:
+            detected = sniff(f.read(SNIFF_BYTES))
+            if detected is None:
+                self.logger.warning(f"Unsupported file type: {name}")
+                return
+            kind, mime_type = detected
+            f.seek(0)
+            if kind == "zip":
+                yield from self._iter_archive(f, name, depth=1, budget=[self.archive_cap_bytes])
+            else:
+                yield Document(name, f.read(), kind, mime_type)
+
+    def iter_directory(self, base_path: str) -> Iterator[Document]:
+        """Yields the documents of every file directly inside base_path, in os.listdir order."""
+        for file in os.listdir(base_path):
+            yield from self.iter_path(os.path.join(base_path, file))
+
+    def _iter_archive(self, stream, archive_name: str, depth: int, budget: list[int]) -> Iterator[Document]:
+        try:
+            archive = zipfile.ZipFile(stream)
+        except zipfile.BadZipFile as e:
+            self.logger.error(f"Invalid archive {archive_name}: {e}")
+            return
+        with archive:
+            for member in archive.infolist():
+                if member.is_dir():
+                    continue
+                member_name = f"{archive_name}/{member.filename}"
+                if member.file_size > budget[0]:
+                    self.logger.error(f"Archive size cap exceeded at {member_name}, skipping the rest of {archive_name}")
+                    return
+                if member.flag_bits & 0x1 and not self.archive_password:
+                    self.logger.warning(f"Skipping encrypted archive member without a password (set ARCHIVE_PASSWORD): {member_name}")
+                    continue
+                try:
+                    with archive.open(member, pwd=self.archive_password) as member_stream:
+                        data = member_stream.read(budget[0] + 1)
+                except (RuntimeError, zipfile.BadZipFile) as e:
+                    self.logger.error(f"Could not read archive member {member_name}: {e}")
+                    continue
+                if len(data) > budget[0]:
+                    self.logger.error(f"Archive size cap exceeded at {member_name}, skipping the rest of {archive_name}")
+                    return
+                budget[0] -= len(data)
+
+                detected = sniff(data[:SNIFF_BYTES])
+                if detected is None:
+                    self.logger.warning(f"Unsupported archive member: {member_name}")
+                    continue
+                kind, mime_type = detected
+                if kind == "zip":
+                    if depth >= self.max_depth:
+                        self.logger.warning(f"Archive nesting too deep, skipping {member_name}")
+                        continue
+                    yield from self._iter_archive(io.BytesIO(data), member_name, depth + 1, budget)
+                else:
+                    yield Document(member_name, data, kind, mime_type)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    archive_password = os.getenv("ARCHIVE_PASSWORD")
+    ingestor = DocumentIngestor(logger, archive_password=archive_password.encode() if archive_password else None)
+    for document in ingestor.iter_directory(sys.argv[1] if len(sys.argv) > 1 else "./documents/pliki_z_fabryki"):
+        print(f"{document.kind:6} {document.mime_type:12} {len(document.data):8} {document.name}")
@@ -0,0 +1,339 @@
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import threading
+from dataclasses import dataclass
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_QUEUE_PATH = "./downloads/jobs.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    queue TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (queue, key)
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (queue, status, id);
+"""
+
+
+@dataclass
+class Job:
+    """A leased job. `attempts` includes the current one."""
+    id: int
+    queue: str
+    key: str
+    payload: dict
+    attempts: int
+
+
+class JobQueue:
+    """
+    A durable job queue in one SQLite file, without an external broker.
+    Workers lease jobs for `lease_seconds` and extend the lease with
+    heartbeats; a job whose lease expires (the worker died) is handed to
+    another worker, up to `max_attempts`. Enqueueing is idempotent per
+    (queue, key), and only the first completion of a job is stored, so a
+    job finished twice after a lost lease has no effect the second time.
+
+    Use journal_mode="WAL" when all workers run on one host. On a shared
+    network volume WAL does not work, so use "DELETE" there, which relies
+    on the file system's locking instead.
+    """
+    def __init__(self, logger, path: str = DEFAULT_QUEUE_PATH, lease_seconds: float = 60.0,
+                 journal_mode: str = "WAL", busy_timeout_ms: int = 30000):
+        """
+        Initializes the JobQueue and creates the schema if needed.
+
+        Args:
+            logger: The logger.
+            path (str, optional): The SQLite database file.
+            lease_seconds (float, optional): How long a leased job stays with a worker without a heartbeat.
+            journal_mode (str, optional): "WAL" for one host, "DELETE" for a shared volume.
+            busy_timeout_ms (int, optional): How long a writer waits for the write lock.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.journal_mode = journal_mode
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            connection.execute(f"PRAGMA journal_mode={self.journal_mode}")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def _transaction(self, statements):
+        """Runs `statements(connection)` in one write transaction and returns its result."""
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = statements(connection)
+            connection.execute("COMMIT")
+            return result
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def enqueue_many(self, queue: str, jobs: list[tuple[str, dict]], max_attempts: int = 3) -> int:
+        """
+        Adds (key, payload) jobs; keys already in the queue are left as they are.
+
+        Returns:
+            int: Number of jobs added.
+        """
+        now = time.time()
+        rows = [(queue, key, json.dumps(payload), max_attempts, now, now) for key, payload in jobs]
+        return self._transaction(lambda connection: connection.executemany(
+            "INSERT OR IGNORE INTO jobs (queue, key, payload, max_attempts, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+            rows
+        ).rowcount)
+
+    def enqueue(self, queue: str, key: str, payload: dict, max_attempts: int = 3) -> bool:
+        return self.enqueue_many(queue, [(key, payload)], max_attempts) == 1
+
+    def lease(self, queues: list[str], owner: str, limit: int = 1) -> list[Job]:
+        """
+        Leases up to `limit` pending jobs (or jobs whose lease expired) from the given queues, oldest first.
+        Expired jobs without attempts left are marked failed instead.
+        """
+        placeholders = ",".join("?" * len(queues))
+
+        def statements(connection):
+            now = time.time()
+            connection.execute(
+                f"UPDATE jobs SET status = 'failed', error = 'Lease expired after the last attempt', updated_at = ? "
+                f"WHERE queue IN ({placeholders}) AND status = 'leased' AND lease_expires < ? AND attempts >= max_attempts",
+                (now, *queues, now)
+            )
+            rows = connection.execute(
+                f"SELECT id, queue, key, payload, attempts FROM jobs WHERE queue IN ({placeholders}) "
+                f"AND (status = 'pending' OR (status = 'leased' AND lease_expires < ?)) ORDER BY id LIMIT ?",
+                (*queues, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET status = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                "updated_at = ? WHERE id = ?",
+                [(owner, now + self.lease_seconds, now, row["id"]) for row in rows]
+            )
+            return [Job(row["id"], row["queue"], row["key"], json.loads(row["payload"]), row["attempts"] + 1) for row in rows]
+
+        return self._transaction(statements)
+
+    def heartbeat(self, job_id: int, owner: str) -> bool:
+        """Extends the lease; returns False if the job is no longer leased by `owner`."""
+        now = time.time()
+        cursor = self._connection().execute(
+            "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (now + self.lease_seconds, now, job_id, owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: int, result) -> bool:
+        """Stores the result of a job; returns False if the job was already completed (the first result wins)."""
+        cursor = self._connection().execute(
+            "UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL, updated_at = ? WHERE id = ? AND status != 'done'",
+            (json.dumps(result), time.time(), job_id)
+        )
+        return cursor.rowcount == 1
+
+    def fail(self, job_id: int, owner: str, error: str):
+        """Returns the job to the queue, or marks it failed when no attempts are left."""
+        self._connection().execute(
+            "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE id = ? AND lease_owner = ? AND status = 'leased'",
+            (error, time.time(), job_id, owner)
+        )
+
+    def counts(self, queue: str | None = None) -> dict[str, int]:
+        """Returns the number of jobs per status, for one queue or all."""
+        rows = self._connection().execute(
+            "SELECT status, COUNT(*) AS jobs FROM jobs WHERE ? IS NULL OR queue = ? GROUP BY status", (queue, queue)
+        ).fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def is_drained(self, queues: list[str]) -> bool:
+        """True when no job of the given queues is pending or leased."""
+        placeholders = ",".join("?" * len(queues))
+        row = self._connection().execute(
+            f"SELECT COUNT(*) FROM jobs WHERE queue IN ({placeholders}) AND status IN ('pending', 'leased')", queues
+        ).fetchone()
+        return row[0] == 0
+
+    def results(self, queue: str) -> dict[str, dict]:
+        """Returns {key: {"result", "payload"}} of the completed jobs of a queue, in enqueue order."""
+        rows = self._connection().execute(
+            "SELECT key, payload, result FROM jobs WHERE queue = ? AND status = 'done' ORDER BY id", (queue,)
+        ).fetchall()
+        return {row["key"]: {"result": json.loads(row["result"]), "payload": json.loads(row["payload"])} for row in rows}
+
+    def clear(self):
+        self._transaction(lambda connection: connection.execute("DELETE FROM jobs"))
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+class Worker:
+    """
+    Pulls jobs from a JobQueue and runs `handlers[queue](payload)`; the return
+    value is stored as the result. A heartbeat thread keeps the lease while
+    the handler runs. Several workers (threads, processes or hosts) can share
+    one queue file.
+    """
+    def __init__(self, logger, job_queue: JobQueue, handlers: dict, owner: str | None = None,
+                 heartbeat_seconds: float | None = None, idle_seconds: float = 0.5):
+        """
+        Initializes the Worker.
+
+        Args:
+            logger: The logger.
+            job_queue (JobQueue): The shared queue.
+            handlers (dict): Handler per queue name; the worker leases from these queues only.
+            owner (str | None, optional): Lease owner name; defaults to host, process and a random suffix.
+            heartbeat_seconds (float | None, optional): Lease extension interval; defaults to a third of the lease.
+            idle_seconds (float, optional): Wait before asking again when no job is available.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.job_queue = job_queue
+        self.handlers = handlers
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.heartbeat_seconds = heartbeat_seconds or job_queue.lease_seconds / 3
+        self.idle_seconds = idle_seconds
+        self.stats = {"completed": 0, "duplicates": 0, "failed": 0}
+
+    def _run_job(self, job: Job):
+        stop = threading.Event()
+
+        def heartbeat():
+            while not stop.wait(self.heartbeat_seconds):
+                if not self.job_queue.heartbeat(job.id, self.owner):
+                    self.logger.warning(f"Lost the lease of job {job.queue}/{job.key}")
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            result = self.handlers[job.queue](job.payload)
+        except Exception as e:
+            self.stats["failed"] += 1
+            self.logger.error(f"Job {job.queue}/{job.key} failed (attempt {job.attempts}): {e}")
+            self.job_queue.fail(job.id, self.owner, str(e))
+            return
+        finally:
+            stop.set()
+            beat.join()
+        if self.job_queue.complete(job.id, result):
+            self.stats["completed"] += 1
+        else:
+            self.stats["duplicates"] += 1
+            self.logger.info(f"Job {job.queue}/{job.key} was already completed by another worker")
+
+    def run(self, drain: bool = True, max_jobs: int | None = None) -> dict:
+        """
+        Processes jobs until the queues are drained (or forever with drain=False).
+
+        Returns:
+            dict: Completed, duplicate and failed job counts of this worker.
+        """
+        queues = list(self.handlers)
+        processed = 0
+        while max_jobs is None or processed < max_jobs:
+            jobs = self.job_queue.lease(queues, self.owner)
+            if not jobs:
+                if drain and self.job_queue.is_drained(queues):
+                    break
+                time.sleep(self.idle_seconds)  # <--- Other workers hold leases, or follow-up jobs are on their way
+                continue
+            for job in jobs:
+                self._run_job(job)
+                processed += 1
+        return self.stats
+
+
+def _simulated_job(payload: dict) -> dict:
+    time.sleep(payload["seconds"])  # <--- Stands in for a network-bound OCR or LLM call
+    return {"number": payload["number"]}
+
+
+def _benchmark_worker(path: str):
+    Worker(None, JobQueue(None, path), {"bench": _simulated_job}, idle_seconds=0.05).run()
+
+
+def benchmark(worker_counts=(1, 2, 4, 8), jobs: int = 200, job_seconds: float = 0.05,
+              path: str = "./downloads/jobs-bench.sqlite") -> list[dict]:
+    """
+    Measures throughput of 1..N worker processes on the same queue with simulated jobs.
+
+    Returns:
+        list[dict]: Workers, seconds, jobs per second and speedup over one worker.
+    """
+    import multiprocessing
+    rows = []
+    for workers in worker_counts:
+        job_queue = JobQueue(None, path)
+        job_queue.clear()
+        job_queue.enqueue_many("bench", [(str(number), {"number": number, "seconds": job_seconds}) for number in range(jobs)])
+        started = time.perf_counter()
+        processes = [multiprocessing.Process(target=_benchmark_worker, args=(path,)) for _ in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        seconds = time.perf_counter() - started
+        done = job_queue.counts("bench").get("done", 0)
+        rows.append({"workers": workers, "jobs": done, "seconds": round(seconds, 2), "jobs_per_second": round(done / seconds, 1)})
+        job_queue.close()
+    for row in rows:
+        row["speedup"] = round(row["jobs_per_second"] / rows[0]["jobs_per_second"], 2)
+    return rows
+
+
+if __name__ == "__main__":
+    # python config/job_queue.py bench [max_workers] [jobs]
+    # python config/job_queue.py stats
+    # python config/job_queue.py clear
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "bench":
+        max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+        counts = [count for count in (1, 2, 4, 8, 16, 32) if count <= max_workers]
+        for row in benchmark(counts, jobs=int(sys.argv[3]) if len(sys.argv) > 3 else 200):
+            print(row)
+    elif command == "clear":
+        JobQueue(logger).clear()
+    else:
+        print(JobQueue(logger).counts())
@@ -0,0 +1,319 @@
+import os
+import sys
+import time
+import random
+import threading
+from dataclasses import dataclass, field
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+from config.secret_resolver import get_secret
+from config.rate_limiter import AdmissionController, ProviderLimits, is_rate_limit_error
+
+OPENROUTER_BASE_URL = "https://openrouter.ai/api/v1"
+CONNECTION_ERROR_NAMES = {"APIConnectionError", "APITimeoutError", "ConnectionError", "Timeout", "ServiceUnavailable"}
+
+
+def error_status(error: Exception) -> int | None:
+    """Returns the HTTP status of an OpenAI, google-genai or requests error, if it has one."""
+    for value in (getattr(error, "status_code", None), getattr(error, "code", None),
+                  getattr(getattr(error, "response", None), "status_code", None)):
+        if isinstance(value, int):
+            return value
+    return None
+
+
+def is_endpoint_error(error: Exception) -> bool:
+    """
+    True for failures that say something about the endpoint: bad credentials
+    (401/403), server errors (5xx) and connection problems. Invalid requests
+    (400/404/422) or errors raised by the caller's function fail the same way
+    everywhere, so they are not held against the endpoint.
+    """
+    status = error_status(error)
+    if status is not None:
+        return status in (401, 403) or status >= 500
+    return isinstance(error, (ConnectionError, TimeoutError)) or \
+        any(cls.__name__ in CONNECTION_ERROR_NAMES for cls in type(error).__mro__)
+
+
+@dataclass
+class Endpoint:
+    """One credential at one provider endpoint. The API key and clients are kept out of repr."""
+    name: str
+    api_key: str = field(repr=False)
+    base_url: str | None = None
+    model_prefix: str = ""  # <--- e.g. "openai/" when OpenAI models are reached through OpenRouter
+    limits: ProviderLimits = field(default_factory=ProviderLimits)
+    models: tuple[str, ...] | None = None  # <--- None serves every model
+    client: object = field(default=None, repr=False)
+    async_client: object = field(default=None, repr=False)
+
+    def serves(self, model: str) -> bool:
+        return self.models is None or model in self.models
+
+    def model_name(self, model: str) -> str:
+        return f"{self.model_prefix}{model}"
+
+    def sync_client(self):
+        if self.client is None:
+            from openai import OpenAI
+            self.client = OpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self.client
+
+    def asyncio_client(self):
+        if self.async_client is None:
+            from openai import AsyncOpenAI
+            self.async_client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
+        return self.async_client
+
+
+class EndpointHealth:
+    """Moving averages of latency and errors of one endpoint, and its ejection state."""
+    def __init__(self):
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.ejections = 0
+        self.ejected_until = 0.0
+        self.probing = False
+        self.stats = {"requests": 0, "succeeded": 0, "failed": 0, "throttled": 0, "rejected": 0, "ejected": 0}
+
+
+class LoadBalancer:
+    """
+    Spreads requests for the same model across several credentials and
+    endpoints (e.g. multiple OpenAI keys and OpenRouter), so aggregate
+    throughput is the sum of their quotas. Each endpoint has its own
+    admission state (token buckets and AIMD concurrency from
+    AdmissionController). An endpoint is picked by "power of two choices"
+    on a health score built from free quota, recent latency and error rate.
+    Endpoints with too many errors are ejected for an exponentially growing
+    period, then get a single probe request before rejoining.
+    """
+    def __init__(self, logger, endpoints: list[Endpoint], smoothing: float = 0.2, error_threshold: float = 0.5,
+                 max_consecutive_failures: int = 3, eject_seconds: float = 30.0, max_eject_seconds: float = 600.0):
+        """
+        Initializes the LoadBalancer.
+
+        Args:
+            logger: The logger.
+            endpoints (list[Endpoint]): The credentials and endpoints to balance over.
+            smoothing (float, optional): Weight of the newest sample in the latency and error moving averages.
+            error_threshold (float, optional): Error rate above which an endpoint is ejected.
+            max_consecutive_failures (int, optional): Failures in a row that eject an endpoint regardless of the rate.
+            eject_seconds (float, optional): First ejection period; doubled for every ejection in a row.
+            max_eject_seconds (float, optional): Upper bound of the ejection period.
+        """
+        if not endpoints:
+            raise ValueError("LoadBalancer needs at least one endpoint")
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.endpoints = {endpoint.name: endpoint for endpoint in endpoints}
+        self.smoothing = smoothing
+        self.error_threshold = error_threshold
+        self.max_consecutive_failures = max_consecutive_failures
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.admission = AdmissionController(self.logger, {(endpoint.name, "*"): endpoint.limits for endpoint in endpoints})
+        self.health = {endpoint.name: EndpointHealth() for endpoint in endpoints}
+        self._random = random.Random()
+        self._lock = threading.Lock()
+
+    def _score(self, endpoint: Endpoint, model: str, now: float) -> float:
+        """Higher is better: free concurrency and request quota, divided by latency, discounted by errors."""
+        state = self.admission.state(endpoint.name, model)
+        health = self.health[endpoint.name]
+        if state.blocked_until > now:
+            return 0.0
+        free_slots = max(0.0, state.concurrency_limit - state.in_flight) / state.concurrency_limit
+        free_requests = max(0.0, state.requests.available()) / state.requests.capacity
+        latencies = [other.latency for other in self.health.values() if other.latency is not None]
+        latency = health.latency if health.latency is not None else (min(latencies) if latencies else 1.0)
+        return (1.0 - health.error_rate) * free_slots * (0.1 + free_requests) / max(latency, 1e-3)
+
+    def choose(self, model: str, exclude: set[str] = frozenset()) -> Endpoint:
+        """Picks an endpoint for `model`; if all are ejected, the one returning soonest is used."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints.values()
+                          if endpoint.serves(model) and endpoint.name not in exclude]
+            if not candidates:
+                candidates = [endpoint for endpoint in self.endpoints.values() if endpoint.serves(model)]
+            if not candidates:
+                raise ValueError(f"No endpoint serves model {model}")
+            available = []
+            for endpoint in candidates:
+                health = self.health[endpoint.name]
+                if health.ejected_until > now:
+                    continue
+                if health.ejections and not health.probing:
+                    health.probing = True  # <--- Ejection over: one probe request decides if it rejoins
+                    return endpoint
+                if not health.probing:
+                    available.append(endpoint)
+            if not available:
+                return min(candidates, key=lambda endpoint: self.health[endpoint.name].ejected_until)
+            pair = self._random.sample(available, min(2, len(available)))
+            return max(pair, key=lambda endpoint: self._score(endpoint, model, now))
+
+    def _end_probe(self, endpoint: Endpoint):
+        with self._lock:
+            self.health[endpoint.name].probing = False
+
+    def _record(self, endpoint: Endpoint, latency: float | None, error: Exception | None):
+        health = self.health[endpoint.name]
+        with self._lock:
+            health.stats["requests"] += 1
+            health.probing = False
+            if error is not None and is_rate_limit_error(error):
+                health.stats["throttled"] += 1  # <--- Quota, not health: admission already backs off
+                return
+            if error is not None and not is_endpoint_error(error):
+                health.stats["rejected"] += 1  # <--- The request itself is bad, another endpoint would fail too
+                return
+            failed = error is not None
+            if failed and health.ejected_until > time.monotonic():
+                health.stats["failed"] += 1  # <--- Request sent before the ejection, do not extend it
+                return
+            health.error_rate += self.smoothing * (float(failed) - health.error_rate)
+            if not failed:
+                health.stats["succeeded"] += 1
+                health.consecutive_failures = 0
+                if health.ejections:
+                    health.ejections = 0
+                    health.error_rate = 0.0  # <--- Probe succeeded: rejoin with a clean record
+                health.latency = latency if health.latency is None else health.latency + self.smoothing * (latency - health.latency)
+                return
+            health.stats["failed"] += 1
+            health.consecutive_failures += 1
+            if health.error_rate < self.error_threshold and health.consecutive_failures < self.max_consecutive_failures \
+                    and not health.ejections:
+                return
+            period = min(self.max_eject_seconds, self.eject_seconds * 2 ** health.ejections)
+            health.ejections += 1
+            health.ejected_until = time.monotonic() + period
+            health.stats["ejected"] += 1
+        self.logger.warning(f"Ejected endpoint {endpoint.name} for {period:.0f}s after {error}")
+
+    def call(self, model: str, function, tokens: int = 0, attempts: int | None = None):
+        """
+        Calls `function(client, model_name)` on a chosen endpoint, retrying rate limits and endpoint
+        failures on other endpoints. Invalid requests (400/404/422) are raised at once.
+
+        Args:
+            model (str): The model name without provider prefix, e.g. "gpt-4o-mini".
+            function: Receives the endpoint's OpenAI client and the model name as that endpoint expects it.
+            tokens (int, optional): Estimated tokens of the request, charged to the endpoint's TPM bucket.
+            attempts (int | None, optional): Endpoints to try; defaults to the number of endpoints.
+
+        Returns:
+            The return value of `function`.
+        """
+        tried, last_error = set(), None
+        for _ in range(attempts or len(self.endpoints)):
+            endpoint = self.choose(model, tried)
+            tried.add(endpoint.name)
+            try:
+                with self.admission.admit(endpoint.name, model, tokens):
+                    started = time.monotonic()
+                    result = function(endpoint.sync_client(), endpoint.model_name(model))
+            except Exception as e:
+                self._record(endpoint, None, e)
+                if not is_rate_limit_error(e) and not is_endpoint_error(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                self._end_probe(endpoint)  # <--- Cancelled: no verdict, but the next request may probe again
+                raise
+            self._record(endpoint, time.monotonic() - started, None)
+            return result
+        raise last_error
+
+    async def call_async(self, model: str, function, tokens: int = 0, attempts: int | None = None):
+        """The asyncio counterpart of `call`; `function(client, model_name)` gets an AsyncOpenAI client and is awaited."""
+        tried, last_error = set(), None
+        for _ in range(attempts or len(self.endpoints)):
+            endpoint = self.choose(model, tried)
+            tried.add(endpoint.name)
+            try:
+                async with self.admission.admit_async(endpoint.name, model, tokens):
+                    started = time.monotonic()
+                    result = await function(endpoint.asyncio_client(), endpoint.model_name(model))
+            except Exception as e:
+                self._record(endpoint, None, e)
+                if not is_rate_limit_error(e) and not is_endpoint_error(e):
+                    raise
+                last_error = e
+                continue
+            except BaseException:
+                self._end_probe(endpoint)  # <--- Cancelled: no verdict, but the next request may probe again
+                raise
+            self._record(endpoint, time.monotonic() - started, None)
+            return result
+        raise last_error
+
+    def report(self) -> dict:
+        """Returns health and counters per endpoint."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                name: {
+                    "latency": round(health.latency, 3) if health.latency is not None else None,
+                    "error_rate": round(health.error_rate, 3),
+                    "ejected_for": round(max(0.0, health.ejected_until - now), 1),
+                    **health.stats,
+                }
+                for name, health in self.health.items()
+            }
+
+
+def _split_keys(value: str | None) -> list[str]:
+    return [key.strip() for key in (value or "").split(",") if key.strip()]
+
+
+def endpoints_from_env() -> list[Endpoint]:
+    """
+    Builds endpoints from OPENAI_API_KEYS (comma separated, falling back to
+    OPENAI_API_KEY) and OPENROUTER_API_KEYS (or OPENROUTER_API_KEY). Quotas per
+    key come from OPENAI_RPM / OPENAI_TPM and OPENROUTER_RPM / OPENROUTER_TPM.
+    """
+    endpoints = []
+    openai_limits = ProviderLimits(requests_per_minute=float(os.getenv("OPENAI_RPM", "500")),
+                                   tokens_per_minute=float(os.getenv("OPENAI_TPM", "200000")))
+    for number, key in enumerate(_split_keys(get_secret("OPENAI_API_KEYS") or get_secret("OPENAI_API_KEY"))):
+        endpoints.append(Endpoint(f"openai-{number}", key, limits=openai_limits))
+    openrouter_limits = ProviderLimits(requests_per_minute=float(os.getenv("OPENROUTER_RPM", "200")),
+                                       tokens_per_minute=float(os.getenv("OPENROUTER_TPM", "1000000")))
+    for number, key in enumerate(_split_keys(get_secret("OPENROUTER_API_KEYS") or get_secret("OPENROUTER_API_KEY"))):
+        endpoints.append(Endpoint(f"openrouter-{number}", key, base_url=OPENROUTER_BASE_URL, model_prefix="openai/",
+                                  limits=openrouter_limits))
+    return endpoints
+
+
+if __name__ == "__main__":
+    # Simulation: keys with 5 requests/s each; key-2 starts failing after 2 seconds
+    from concurrent.futures import ThreadPoolExecutor
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    limits = ProviderLimits(requests_per_minute=300, initial_concurrency=8)
+
+    for names in (["key-0"], ["key-0", "key-1", "key-2"]):
+        balancer = LoadBalancer(logger, [Endpoint(name, "unused", limits=limits, client=name) for name in names],
+                                eject_seconds=2.0)
+        started = time.monotonic()
+
+        def complete(client, model_name):
+            time.sleep(0.05)
+            if client == "key-2" and time.monotonic() - started > 2:
+                raise ConnectionError(f"{client} unavailable")
+            return client
+
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda _: balancer.call("gpt-4o-mini", complete), range(120)))
+        elapsed = time.monotonic() - started
+        print(f"{len(names)} endpoint(s): {len(results) / elapsed:.1f} requests/s")
+        print(balancer.report())
@@ -0,0 +1,220 @@
+import os
+import sys
+import json
+import glob
+import math
+import mmap
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_INDEX_PATH = "./downloads/index/logs.json"
+DURATION_MARKER = b'"duration_seconds"'
+DIMENSIONS = ("stage", "file", "model")
+BUCKETS_PER_OCTAVE = 4  # <--- Histogram resolution: percentiles are accurate to about 19%
+MIN_DURATION = 1e-4
+
+
+def bucket_of(seconds: float) -> int:
+    return math.floor(math.log2(max(seconds, MIN_DURATION)) * BUCKETS_PER_OCTAVE)
+
+
+def bucket_upper_bound(bucket: int) -> float:
+    return 2 ** ((bucket + 1) / BUCKETS_PER_OCTAVE)
+
+
+def new_group() -> dict:
+    return {"count": 0, "errors": 0, "total": 0.0, "max": 0.0, "histogram": {}}
+
+
+def add_to_group(group: dict, seconds: float, failed: bool):
+    group["count"] += 1
+    group["errors"] += failed
+    group["total"] += seconds
+    group["max"] = max(group["max"], seconds)
+    bucket = str(bucket_of(seconds))
+    group["histogram"][bucket] = group["histogram"].get(bucket, 0) + 1
+
+
+def merge_groups(target: dict, source: dict):
+    target["count"] += source["count"]
+    target["errors"] += source["errors"]
+    target["total"] += source["total"]
+    target["max"] = max(target["max"], source["max"])
+    for bucket, count in source["histogram"].items():
+        target["histogram"][bucket] = target["histogram"].get(bucket, 0) + count
+
+
+def percentile(group: dict, fraction: float) -> float:
+    """Approximates a latency percentile from the histogram (upper bound of the bucket)."""
+    wanted = fraction * group["count"]
+    seen = 0
+    for bucket in sorted(group["histogram"], key=int):
+        seen += group["histogram"][bucket]
+        if seen >= wanted:
+            return min(bucket_upper_bound(int(bucket)), group["max"])
+    return group["max"]
+
+
+class LogIndex:
+    """
+    A compact on-disk index over the JSON-line logs in `logs/`. Only events
+    with `duration_seconds` (see `config.logger.timed`) are aggregated, into
+    per-stage, per-file and per-model counters with a log-scale latency
+    histogram. Files are scanned through mmap from the last indexed offset,
+    so appending to a log only costs the new bytes; a truncated or replaced
+    log is re-indexed from the start.
+    """
+    def __init__(self, logger, logs_dir: str = "logs", index_path: str = DEFAULT_INDEX_PATH):
+        """
+        Initializes the LogIndex.
+
+        Args:
+            logger: The logger.
+            logs_dir (str, optional): Directory with the *.log files written by setup_logging.
+            index_path (str, optional): Where the index is stored.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.logs_dir = logs_dir
+        self.index_path = index_path
+        self.files: dict[str, dict] = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                self.files = json.load(f)["files"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            self.files = {}
+
+    def save(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_path)), exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, separators=(",", ":"))
+        os.replace(tmp_path, self.index_path)
+
+    def update(self) -> dict:
+        """
+        Indexes new bytes of every log file and saves the index.
+
+        Returns:
+            dict: Bytes scanned and events added per log file that changed.
+        """
+        changes = {}
+        log_paths = sorted(glob.glob(os.path.join(self.logs_dir, "*.log")))
+        for missing in set(self.files) - {os.path.basename(path) for path in log_paths}:
+            del self.files[missing]
+        for path in log_paths:
+            name = os.path.basename(path)
+            stat = os.stat(path)
+            entry = self.files.get(name)
+            if entry is None or entry["inode"] != stat.st_ino or stat.st_size < entry["offset"]:
+                entry = {"inode": stat.st_ino, "offset": 0, "events": 0, "groups": {}}
+                self.files[name] = entry
+            if stat.st_size == entry["offset"]:
+                continue
+            start, events = entry["offset"], entry["events"]
+            self._scan(path, entry)
+            changes[name] = {"bytes": entry["offset"] - start, "events": entry["events"] - events}
+        self.save()
+        if changes:
+            self.logger.info(f"Log index updated: {changes}")
+        return changes
+
+    def _scan(self, path: str, entry: dict):
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                end = mapped.rfind(b"\n", entry["offset"], size) + 1  # <--- Stop at the last complete line
+                if end <= entry["offset"]:
+                    return
+                position = entry["offset"]
+                while (marker := mapped.find(DURATION_MARKER, position, end)) != -1:
+                    line_start = mapped.rfind(b"\n", 0, marker) + 1
+                    line_end = mapped.find(b"\n", marker, end)
+                    self._add_line(entry, mapped[line_start:line_end])
+                    position = line_end + 1
+                entry["offset"] = end
+
+    def _add_line(self, entry: dict, line: bytes):
+        try:
+            event = json.loads(line)
+            seconds = float(event["duration_seconds"])
+        except (ValueError, KeyError, TypeError):
+            return
+        failed = event.get("status") == "error"
+        entry["events"] += 1
+        for dimension in DIMENSIONS:
+            values = event.get(dimension)
+            if dimension == "file" and values is None:
+                values = event.get("files")
+            for value in values if isinstance(values, list) else [values]:
+                if value is None:
+                    continue
+                key = f"{dimension}:{value}"
+                add_to_group(entry["groups"].setdefault(key, new_group()), seconds, failed)
+
+    def report(self, dimension: str, top: int | None = 20, sort_by: str = "total") -> list[dict]:
+        """
+        Merges all log files into one row per value of `dimension`.
+
+        Args:
+            dimension (str): "stage", "file" or "model".
+            top (int | None, optional): Number of rows to return; None for all.
+            sort_by (str, optional): "total", "mean", "p95", "max", "count" or "errors".
+
+        Returns:
+            list[dict]: Rows with count, errors, total, mean, p50, p95 and max in seconds.
+        """
+        prefix = f"{dimension}:"
+        merged: dict[str, dict] = {}
+        for entry in self.files.values():
+            for key, group in entry["groups"].items():
+                if key.startswith(prefix):
+                    merge_groups(merged.setdefault(key[len(prefix):], new_group()), group)
+        rows = [{
+            dimension: value,
+            "count": group["count"],
+            "errors": group["errors"],
+            "total": round(group["total"], 3),
+            "mean": round(group["total"] / group["count"], 3),
+            "p50": round(percentile(group, 0.5), 3),
+            "p95": round(percentile(group, 0.95), 3),
+            "max": round(group["max"], 3),
+        } for value, group in merged.items()]
+        rows.sort(key=lambda row: row[sort_by], reverse=True)
+        return rows[:top] if top else rows
+
+
+def format_report(rows: list[dict], dimension: str) -> str:
+    header = f"{dimension:50} {'count':>7} {'errors':>7} {'total':>10} {'mean':>8} {'p50':>8} {'p95':>8} {'max':>8}"
+    lines = [header]
+    for row in rows:
+        lines.append(f"{str(row[dimension])[:50]:50} {row['count']:>7} {row['errors']:>7} {row['total']:>10.3f} "
+                     f"{row['mean']:>8.3f} {row['p50']:>8.3f} {row['p95']:>8.3f} {row['max']:>8.3f}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    # python config/log_index.py [stage|file|model ...] [--top N] [--sort total|mean|p95|max|count|errors]
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    arguments = sys.argv[1:]
+    top, sort_by = 20, "total"
+    if "--top" in arguments:
+        top = int(arguments.pop(arguments.index("--top") + 1))
+        arguments.remove("--top")
+    if "--sort" in arguments:
+        sort_by = arguments.pop(arguments.index("--sort") + 1)
+        arguments.remove("--sort")
+    index = LogIndex(logger)
+    index.update()
+    for dimension in arguments or DIMENSIONS:
+        print(format_report(index.report(dimension, top, sort_by), dimension))
+        print()
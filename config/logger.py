@@ -1,7 +1,9 @@
 import structlog
 import logging
 import os
+import time
 import inspect
+from contextlib import contextmanager
 
 def setup_logging():
     # Get the name of the calling script
@@ -19,6 +21,7 @@ def setup_logging():
         processors=[
             structlog.stdlib.add_logger_name,
             structlog.stdlib.add_log_level,
+            structlog.processors.TimeStamper(fmt="iso", utc=True),
             structlog.processors.StackInfoRenderer(),
             structlog.processors.format_exc_info,
             structlog.processors.JSONRenderer(),
@@ -37,4 +40,21 @@ def setup_logging():
     # Get the root logger from the standard logging library
     root_logger = logging.getLogger()
     root_logger.addHandler(file_handler)
-    root_logger.setLevel(logging.INFO)
\ No newline at end of file
+    root_logger.setLevel(logging.INFO)
+
+@contextmanager
+def timed(logger, stage: str, **fields):
+    """
+    Logs one event with the duration of the block, for the log index report.
+    The event carries `stage`, `duration_seconds`, `status` ("ok" or "error")
+    and the given fields, e.g. file=... and model=...; exceptions are re-raised.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        logger.info(event=f"{stage} finished", stage=stage, duration_seconds=round(time.perf_counter() - started, 4),
+                    status="error", error=repr(e), **fields)
+        raise
+    logger.info(event=f"{stage} finished", stage=stage, duration_seconds=round(time.perf_counter() - started, 4),
+                status="ok", **fields)
@@ -0,0 +1,76 @@
+import os
+import json
+import hashlib
+import structlog
+
+
+def hash_file(file_path: str, chunk_size: int = 1 << 20) -> str:
+    """Returns the SHA-256 hex digest of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    """Returns the SHA-256 hex digest of a string."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """
+    A JSON manifest that records, for every artifact, the inputs it was built
+    from (content hashes, model, prompt, ...) and the hash of the output.
+    A stage only needs to re-run when its inputs or its output changed.
+    """
+    def __init__(self, logger, manifest_path: str):
+        """
+        Initializes the Manifest and loads existing entries from `manifest_path`.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.manifest_path = manifest_path
+        try:
+            with open(manifest_path, "r") as f:
+                self.entries = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self.entries = {}
+
+    def is_fresh(self, artifact: str, inputs: dict, output_path: str) -> bool:
+        """
+        Checks whether an artifact is up to date.
+
+        Args:
+            artifact (str): The artifact key, e.g. "transcribe:adam.m4a".
+            inputs (dict): Everything the artifact depends on; must be JSON-serialisable.
+            output_path (str): The file the stage writes.
+
+        Returns:
+            bool: True if the recorded inputs match and the output file still has the recorded hash.
+        """
+        entry = self.entries.get(artifact)
+        if not entry or entry.get("inputs") != inputs or not os.path.exists(output_path):
+            return False
+        return entry.get("output_hash") == hash_file(output_path)
+
+    def record(self, artifact: str, inputs: dict, output_path: str):
+        """Records the inputs and output hash of a freshly built artifact and saves the manifest."""
+        self.entries[artifact] = {
+            "inputs": inputs,
+            "output_path": output_path,
+            "output_hash": hash_file(output_path),
+        }
+        self.save()
+
+    def output_hash(self, artifact: str) -> str | None:
+        """Returns the recorded output hash of an artifact, if any."""
+        entry = self.entries.get(artifact)
+        return entry.get("output_hash") if entry else None
+
+    def save(self):
+        """Writes the manifest atomically."""
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
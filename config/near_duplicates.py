@@ -0,0 +1,126 @@
+import os
+import sys
+import random
+import hashlib
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.retrieval import tokenize
+from config.logger import setup_logging
+
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+
+
+def shingles(text: str, size: int = 2) -> set[str]:
+    """Word n-grams over normalized tokens (stemmed, diacritics folded, stopwords dropped)."""
+    tokens = tokenize(text)
+    if len(tokens) < size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _hash32(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+def choose_bands(num_perm: int, threshold: float) -> tuple[int, int]:
+    """Picks the LSH (bands, rows) split of the signature whose S-curve midpoint is closest to the threshold."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        distance = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or distance < best[0]:
+            best = (distance, bands, rows)
+    return best[1], best[2]
+
+
+class NearDuplicateIndex:
+    """
+    Groups near-identical texts with MinHash signatures and LSH banding.
+    Clustering is leader-based: a text joins the cluster whose representative
+    is most similar, if the estimated Jaccard similarity is at least
+    `threshold`, otherwise it starts a new cluster. Every member is therefore
+    similar to its representative (no chaining through intermediate texts).
+    """
+    def __init__(self, logger, threshold: float = 0.8, num_perm: int = 128, shingle_size: int = 2, seed: int = 1):
+        """
+        Initializes the NearDuplicateIndex.
+
+        Args:
+            logger: The logger.
+            threshold (float, optional): Minimum estimated Jaccard similarity to the representative.
+            num_perm (int, optional): MinHash signature length.
+            shingle_size (int, optional): Words per shingle.
+            seed (int, optional): Seed of the hash permutations.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        generator = random.Random(seed)
+        self._permutations = [(generator.randrange(1, MERSENNE_PRIME), generator.randrange(0, MERSENNE_PRIME))
+                              for _ in range(num_perm)]
+        self.bands, self.rows = choose_bands(num_perm, threshold)
+        self._buckets: list[dict[tuple, list[str]]] = [{} for _ in range(self.bands)]
+        self._signatures: dict[str, list[int]] = {}
+        self.clusters: dict[str, list[str]] = {}
+        self.representative_of: dict[str, str] = {}
+
+    def signature(self, text: str) -> list[int]:
+        hashes = [_hash32(shingle) for shingle in shingles(text, self.shingle_size)]
+        if not hashes:
+            return [MAX_HASH] * self.num_perm
+        return [min(((a * h + b) % MERSENNE_PRIME) & MAX_HASH for h in hashes) for a, b in self._permutations]
+
+    @staticmethod
+    def similarity(first: list[int], second: list[int]) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return sum(x == y for x, y in zip(first, second)) / len(first)
+
+    def add(self, key: str, text: str) -> str:
+        """
+        Adds a text and returns the key of its cluster representative (the key itself for a new cluster).
+        """
+        signature = self.signature(text)
+        band_keys = [tuple(signature[band * self.rows:(band + 1) * self.rows]) for band in range(self.bands)]
+        candidates = []
+        for band, band_key in enumerate(band_keys):
+            for representative in self._buckets[band].get(band_key, ()):
+                if representative not in candidates:
+                    candidates.append(representative)
+        best, best_similarity = None, self.threshold
+        for representative in candidates:
+            similarity = self.similarity(signature, self._signatures[representative])
+            if similarity >= best_similarity:
+                best, best_similarity = representative, similarity
+        if best is not None:
+            self.clusters[best].append(key)
+            self.representative_of[key] = best
+            self.logger.info(f"Near-duplicate: {key} ~ {best} ({best_similarity:.2f})")
+            return best
+
+        self._signatures[key] = signature
+        for band, band_key in enumerate(band_keys):
+            self._buckets[band].setdefault(band_key, []).append(key)
+        self.clusters[key] = [key]
+        self.representative_of[key] = key
+        return key
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    base_path = sys.argv[1] if len(sys.argv) > 1 else "./documents/pliki_z_fabryki"
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.8
+    index = NearDuplicateIndex(logger, threshold)
+    for file in sorted(os.listdir(base_path)):
+        if file.endswith(".txt"):
+            with open(os.path.join(base_path, file), "r", encoding="utf-8") as f:
+                index.add(file, f.read())
+    for representative, members in index.clusters.items():
+        print(f"{representative}: {members}")
@@ -1,5 +1,9 @@
+import io
 import os
 import sys
+import time
+import hashlib
+import mimetypes
 import PIL
 import structlog
 import google.generativeai as genai
@@ -7,17 +11,56 @@ import google.generativeai as genai
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(PROJECT_ROOT)
 
-from config.logger import setup_logging
+from config.logger import setup_logging, timed
+from config.secret_resolver import get_secret
+from config.rate_limiter import AdmissionController, admitted_call
+from config.hedging import HedgingPolicy
+from config.results_store import ResultsStore
+from config.manifest import hash_file
+from config.batch_jobs import BatchJobRunner, build_request, inline_part, text_part
+from config.prompts import PromptRegistry, PromptTemplate
+
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate(
+    "ocr", "Extract text from the following image, do not include any other information, just the text.",
+    budget_tokens=100  # <--- Text part only, the image is billed separately
+))
+OCR_PROMPT = PROMPTS.render("ocr")[0]
 
 class ImageOCRProcessor:
     """
     A class to handle OCR processing of images.
     """
-    def __init__(self, logger):
+    def __init__(self, logger, admission: AdmissionController | None = None, hedging: HedgingPolicy | None = None,
+                 results_store: ResultsStore | None = None):
         """
-        Initializes the ImageOCRProcessor with an optional logger.
+        Initializes the ImageOCRProcessor with an optional logger, admission controller, hedging policy
+        and results store that replaces the sidecar .txt files.
         """
         self.logger = logger if logger else structlog.get_logger(__name__)
+        self.admission = admission
+        self.hedging = hedging
+        self.results_store = results_store
+
+    def _generate(self, model_name: str, make_contents):
+        """
+        Runs an OCR generation, hedged against a backup model when a hedging policy is set.
+        `make_contents()` is called once per attempt, so the primary and the hedge never share
+        a PIL image (not thread-safe) across threads. A losing attempt that already started
+        cannot be interrupted, so when hedging each request times out at the hedging budget.
+        """
+        timeout = self.hedging.attempt_timeout() if self.hedging else None
+        request_options = {"timeout": timeout} if timeout else None
+
+        def send(name):
+            model = genai.GenerativeModel(model_name=name)
+            return admitted_call(self.admission, "gemini", name, model.generate_content, make_contents(),
+                                 request_options=request_options)
+
+        if self.hedging:
+            return self.hedging.call(f"ocr:{model_name}", lambda: send(model_name),
+                                     lambda: send(self.hedging.backup_model(model_name)))
+        return send(model_name)
 
     def extract_text_from_image(self, image_path: str, model: genai.GenerativeModel, prompt: str) -> str:
         """
@@ -27,7 +70,8 @@ class ImageOCRProcessor:
         logger.info(f"Starting text extraction from {image_path}")
         try:
             image = PIL.Image.open(image_path)
-            response = model.generate_content([prompt, image])
+            response = admitted_call(self.admission, "gemini", getattr(model, "model_name", "default"),
+                                     model.generate_content, [prompt, image])
             response.resolve()
             raw_response_text = response.text
             logger.info(f"Extracted text from {image_path}: {raw_response_text}")
@@ -54,15 +98,21 @@ class ImageOCRProcessor:
         ocr_results = {} # Initialize an empty dictionary to store results
         try:
             model = genai.GenerativeModel(model_name=model_name)
-            prompt = "Extract text from the following image, do not include any other information, just the text."
+            prompt = OCR_PROMPT
 
+            started = time.time()
             ocr_text = self.extract_text_from_image(file_path, model, prompt)
             filename = os.path.basename(file_path) # Get filename for dictionary key
             ocr_results[filename] = ocr_text # Store result in dictionary
             logger.info(f"Extracted text from {file_path}: {ocr_text}")
 
-            if save_output:
-                txt_file_path = os.path.join(os.path.dirname(file_path), f"{os.path.basename(file_path).split('.')[0]}.txt")
+            if self.results_store:
+                if not ocr_text.startswith("Error during OCR"):
+                    self.results_store.add(file_path, hash_file(file_path), "ocr", ocr_text, model=model_name,
+                                           started_at=started, duration_seconds=time.time() - started)
+                    logger.info(f"OCR text of {file_path} saved to the results store")
+            elif save_output:
+                txt_file_path = os.path.join(os.path.dirname(file_path), f"{os.path.splitext(os.path.basename(file_path))[0]}.txt")
                 with open(txt_file_path, "w") as f:
                     f.write(ocr_text)
                 logger.info(f"OCR text saved to: {txt_file_path}")
@@ -75,6 +125,66 @@ class ImageOCRProcessor:
             logger.error(f"Error during OCR: {e}")
             return ocr_results
 
+    def perform_ocr_on_bytes(self, data: bytes, name: str, model_name: str) -> dict:
+        """
+        Performs OCR on an in-memory image, e.g. an archive member.
+
+        Args:
+            data (bytes): The encoded image.
+            name (str): The document name used as the result key and in logs.
+            model_name (str): The name of the Gemini model to use.
+
+        Returns:
+            dict: A dictionary with the name as key and OCR text as value, or an empty dictionary on error.
+        """
+        logger = self.logger
+        logger.info(f"Starting OCR processing for in-memory image {name}")
+        try:
+            started = time.time()
+            prompt = OCR_PROMPT
+            with timed(logger, "ocr", file=name, model=model_name):
+                response = self._generate(model_name, lambda: [prompt, PIL.Image.open(io.BytesIO(data))])
+                response.resolve()
+            logger.info(f"Extracted text from {name}: {response.text}")
+            if self.results_store:
+                self.results_store.add(name, hashlib.sha256(data).hexdigest(), "ocr", response.text, model=model_name,
+                                       started_at=started, duration_seconds=time.time() - started)
+            return {name: response.text}
+        except Exception as e:
+            logger.error(f"Error during OCR of {name}: {e}")
+            return {}
+
+    def perform_ocr_batch(self, runner: BatchJobRunner, images: dict[str, tuple[bytes, str]], model_name: str,
+                          job_id: str = "ocr") -> dict:
+        """
+        Performs OCR on many images as one offline batch job instead of one request per image.
+        Re-running with the same images resumes the job from its state file.
+
+        Args:
+            runner (BatchJobRunner): Submits and polls the batch job.
+            images (dict[str, tuple[bytes, str]]): (encoded image, MIME type) per name.
+            model_name (str): The name of the Gemini model to use.
+            job_id (str, optional): Name of the batch job and its state file.
+
+        Returns:
+            dict: A dictionary with the name as key and OCR text as value; failed images are left out.
+        """
+        logger = self.logger
+        logger.info(f"Starting batch OCR of {len(images)} images")
+        started = time.time()
+        requests = {name: build_request([text_part(OCR_PROMPT), inline_part(data, mime_type)])
+                    for name, (data, mime_type) in images.items()}
+        with timed(logger, "ocr_batch", files=list(images), model=model_name):
+            texts = runner.run(job_id, model_name, requests)
+        ocr_results = {name: text for name, text in texts.items() if text is not None}
+        if self.results_store and ocr_results:
+            self.results_store.add_many([{
+                "source_path": name, "source_hash": hashlib.sha256(images[name][0]).hexdigest(), "stage": "ocr",
+                "text": text, "model": model_name, "started_at": started, "duration_seconds": time.time() - started
+            } for name, text in ocr_results.items()])
+        logger.info(f"Batch OCR complete: {len(ocr_results)} of {len(images)} images")
+        return ocr_results
+
     def process_images_in_directory(self, client, base_path: str, model_name: str, save_output: bool = False) -> dict:
         """
         Processes all image files in a given directory using OCR.
@@ -106,9 +216,21 @@ class ImageOCRProcessor:
 if __name__ == "__main__":
     setup_logging()
     logger = structlog.get_logger(__name__)
-    processor = ImageOCRProcessor(logger)
+    processor = ImageOCRProcessor(logger, results_store=ResultsStore(logger))  # <--- `python config/results_store.py export ocr` writes the .txt files
     base_path = "documents/pliki_z_fabryki"  # <--- Set your base path here
     model_name = "gemini-2.0-flash" # <--- Choose your Gemini model
-    client = genai.configure(api_key=os.getenv('GEMINI_API_KEY'))
-
-    ocr_results = processor.process_images_in_directory(client, base_path, model_name, save_output=True)
\ No newline at end of file
+    client = genai.configure(api_key=get_secret('GEMINI_API_KEY'))
+
+    if "--batch" in sys.argv:
+        from google import genai as batch_genai
+        from config.batch_jobs import GeminiBatchBackend
+        runner = BatchJobRunner(logger, GeminiBatchBackend(batch_genai.Client(api_key=get_secret('GEMINI_API_KEY'))))
+        images = {}
+        for filename in sorted(os.listdir(base_path)):
+            mime_type = mimetypes.guess_type(filename)[0]
+            if mime_type and mime_type.startswith("image/"):
+                with open(os.path.join(base_path, filename), "rb") as f:
+                    images[os.path.join(base_path, filename)] = (f.read(), mime_type)  # <--- Full paths, like perform_ocr stores
+        ocr_results = processor.perform_ocr_batch(runner, images, model_name)
+    else:
+        ocr_results = processor.process_images_in_directory(client, base_path, model_name, save_output=True)
\ No newline at end of file
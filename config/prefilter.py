@@ -0,0 +1,261 @@
+import os
+import re
+import sys
+import json
+import math
+import random
+import zlib
+from collections import Counter
+from typing import Callable
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.retrieval import tokenize
+from config.logger import setup_logging
+
+LABEL_CATEGORIES = ("people", "hardware")
+DEFAULT_LABELS_PATH = "./downloads/classification_labels.jsonl"
+FEATURE_BUCKETS = 1 << 14
+
+# Documents matching these patterns are "other" regardless of the model.
+OTHER_PATTERNS = [
+    re.compile(r"^\W*(entry deleted|wpis usunięty)\W*$", re.IGNORECASE),
+]
+
+
+def append_label(labels_path: str, filename: str, text: str, flags: dict):
+    """Appends one labelled document to the JSONL label store."""
+    os.makedirs(os.path.dirname(labels_path) or ".", exist_ok=True)
+    record = {"filename": filename, "text": text, **{category: bool(flags.get(category)) for category in LABEL_CATEGORIES}}
+    with open(labels_path, "a") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def load_labels(labels_path: str = DEFAULT_LABELS_PATH) -> list[dict]:
+    """Loads the label store; later records for the same filename override earlier ones."""
+    records = {}
+    try:
+        with open(labels_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    records[record["filename"]] = record
+    except FileNotFoundError:
+        pass
+    return list(records.values())
+
+
+def featurize(text: str) -> dict[int, float]:
+    """Hashes unigrams and bigrams of the stemmed tokens into a sparse, length-normalised vector."""
+    tokens = tokenize(text)
+    grams = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+    counts = Counter(zlib.crc32(gram.encode("utf-8")) % FEATURE_BUCKETS for gram in grams)
+    norm = math.sqrt(sum(value * value for value in counts.values())) or 1.0
+    return {index: value / norm for index, value in counts.items()}
+
+
+def sigmoid(value: float) -> float:
+    if value >= 0:
+        return 1.0 / (1.0 + math.exp(-value))
+    exp = math.exp(value)
+    return exp / (1.0 + exp)
+
+
+class LogisticModel:
+    """Binary logistic regression over sparse features, trained with SGD and L2 regularisation."""
+    def __init__(self, epochs: int = 30, learning_rate: float = 0.5, l2: float = 1e-4):
+        self.epochs = epochs
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self.weights: dict[int, float] = {}
+        self.bias = 0.0
+
+    def decision(self, features: dict[int, float]) -> float:
+        return self.bias + sum(self.weights.get(index, 0.0) * value for index, value in features.items())
+
+    def fit(self, samples: list[dict[int, float]], targets: list[int], seed: int = 0):
+        order = list(range(len(samples)))
+        rng = random.Random(seed)
+        for epoch in range(self.epochs):
+            rng.shuffle(order)
+            rate = self.learning_rate / (1 + epoch)
+            for i in order:
+                error = sigmoid(self.decision(samples[i])) - targets[i]
+                self.bias -= rate * error
+                for index, value in samples[i].items():
+                    weight = self.weights.get(index, 0.0)
+                    self.weights[index] = weight - rate * (error * value + self.l2 * weight)
+        return self
+
+
+class PlattCalibrator:
+    """Maps raw decision values to calibrated probabilities: p = sigmoid(a * score + b)."""
+    def __init__(self):
+        self.a = 1.0
+        self.b = 0.0
+
+    def fit(self, scores: list[float], targets: list[int], iterations: int = 500, learning_rate: float = 0.1):
+        positives = sum(targets)
+        negatives = len(targets) - positives
+        # Platt's smoothed targets avoid overconfident calibration on small data
+        high = (positives + 1) / (positives + 2)
+        low = 1 / (negatives + 2)
+        smoothed = [high if target else low for target in targets]
+        for _ in range(iterations):
+            grad_a = grad_b = 0.0
+            for score, target in zip(scores, smoothed):
+                error = sigmoid(self.a * score + self.b) - target
+                grad_a += error * score
+                grad_b += error
+            self.a -= learning_rate * grad_a / max(len(scores), 1)
+            self.b -= learning_rate * grad_b / max(len(scores), 1)
+        return self
+
+    def probability(self, score: float) -> float:
+        return sigmoid(self.a * score + self.b)
+
+
+class LocalPrefilter:
+    """
+    A local classifier in front of the LLM: keyword rules plus one calibrated
+    logistic model per category, trained on labels stored from past runs.
+    Documents are decided locally only when every category is confident.
+    """
+    def __init__(self, logger, threshold: float = 0.9, folds: int = 5):
+        """
+        Initializes an untrained prefilter.
+
+        Args:
+            logger: The logger.
+            threshold (float, optional): Minimum calibrated confidence per category to skip the LLM.
+            folds (int, optional): Cross-validation folds used for calibration and evaluation.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.threshold = threshold
+        self.folds = folds
+        self.models: dict[str, LogisticModel] = {}
+        self.calibrators: dict[str, PlattCalibrator] = {}
+
+    @property
+    def trained(self) -> bool:
+        return bool(self.models)
+
+    def _out_of_fold_scores(self, samples: list[dict], targets: list[int]) -> list[float]:
+        folds = max(2, min(self.folds, len(samples)))
+        scores = [0.0] * len(samples)
+        for fold in range(folds):
+            train = [i for i in range(len(samples)) if i % folds != fold]
+            model = LogisticModel().fit([samples[i] for i in train], [targets[i] for i in train])
+            for i in range(fold, len(samples), folds):
+                scores[i] = model.decision(samples[i])
+        return scores
+
+    def fit(self, records: list[dict]):
+        """
+        Trains the per-category models and calibrates them on out-of-fold scores.
+
+        Args:
+            records (list[dict]): Labelled documents with "text" and a boolean per category.
+        """
+        if len(records) < 4:
+            self.logger.warning(f"Not enough labelled documents to train the prefilter: {len(records)}")
+            return self
+        samples = [featurize(record["text"]) for record in records]
+        for category in LABEL_CATEGORIES:
+            targets = [int(bool(record[category])) for record in records]
+            self.calibrators[category] = PlattCalibrator().fit(self._out_of_fold_scores(samples, targets), targets)
+            self.models[category] = LogisticModel().fit(samples, targets)
+        self.logger.info(f"Prefilter trained on {len(records)} labelled documents")
+        return self
+
+    def predict(self, text: str) -> tuple[dict[str, bool], float]:
+        """
+        Predicts category flags for a document.
+
+        Returns:
+            tuple[dict[str, bool], float]: The flags and the lowest per-category confidence.
+        """
+        if any(pattern.search(text) for pattern in OTHER_PATTERNS):
+            return {category: False for category in LABEL_CATEGORIES}, 1.0
+        if not self.trained:
+            return {category: False for category in LABEL_CATEGORIES}, 0.0
+
+        features = featurize(text)
+        flags, confidence = {}, 1.0
+        for category in LABEL_CATEGORIES:
+            probability = self.calibrators[category].probability(self.models[category].decision(features))
+            flags[category] = probability >= 0.5
+            confidence = min(confidence, max(probability, 1 - probability))
+        return flags, confidence
+
+    def decide(self, text: str) -> dict[str, bool] | None:
+        """Returns the local decision if it is confident enough, otherwise None (escalate to the LLM)."""
+        flags, confidence = self.predict(text)
+        return flags if confidence >= self.threshold else None
+
+    def evaluate(self, records: list[dict], llm: Callable[[str], dict[str, bool] | None] | None = None) -> dict:
+        """
+        Cross-validates the prefilter against stored labels. Locally decided
+        documents are compared with their labels; escalated documents count as
+        LLM calls and are scored with the answers of `llm`.
+
+        Args:
+            records (list[dict]): Labelled documents with "text" and a boolean per category.
+            llm (Callable[[str], dict[str, bool] | None] | None, optional): Classifies an escalated document,
+                returning None if the answer could not be parsed. Without it, escalated documents are assumed to
+                receive their stored label and the combined scores are reported as "combined_upper_bound".
+
+        Returns:
+            dict: Per-category precision/recall of local decisions and of the combined system, plus LLM-call savings.
+        """
+        folds = max(2, min(self.folds, len(records)))
+        counts = {category: Counter() for category in LABEL_CATEGORIES}
+        local_counts = {category: Counter() for category in LABEL_CATEGORIES}
+        decided = llm_failures = 0
+        for fold in range(folds):
+            train = [record for i, record in enumerate(records) if i % folds != fold]
+            test = records[fold::folds]
+            prefilter = LocalPrefilter(self.logger, self.threshold, self.folds).fit(train)
+            for record in test:
+                decision = prefilter.decide(record["text"])
+                decided += decision is not None
+                answer = decision
+                if answer is None:
+                    answer = llm(record["text"]) if llm else {category: bool(record[category]) for category in LABEL_CATEGORIES}
+                    if answer is None:
+                        llm_failures += 1
+                        continue
+                for category in LABEL_CATEGORIES:
+                    actual = bool(record[category])
+                    predicted = bool(answer[category])
+                    outcome = ("t" if predicted == actual else "f") + ("p" if predicted else "n")
+                    counts[category][outcome] += 1
+                    if decision is not None:
+                        local_counts[category][outcome] += 1
+
+        def scores(counter: Counter) -> dict:
+            tp, fp, fn = counter["tp"], counter["fp"], counter["fn"]
+            return {
+                "precision": round(tp / (tp + fp), 3) if tp + fp else None,
+                "recall": round(tp / (tp + fn), 3) if tp + fn else None,
+            }
+
+        return {
+            "documents": len(records),
+            "decided_locally": decided,
+            "llm_calls_saved": round(decided / len(records), 3) if records else 0.0,
+            "threshold": self.threshold,
+            "local": {category: scores(local_counts[category]) for category in LABEL_CATEGORIES},
+            "combined" if llm else "combined_upper_bound": {category: scores(counts[category]) for category in LABEL_CATEGORIES},
+            **({"llm_failures": llm_failures} if llm else {}),
+        }
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    labels_path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_LABELS_PATH
+    report = LocalPrefilter(logger).evaluate(load_labels(labels_path))
+    print(json.dumps(report, indent=2))
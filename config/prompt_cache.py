@@ -0,0 +1,263 @@
+import os
+import sys
+import time
+import hashlib
+import textwrap
+import threading
+from types import SimpleNamespace
+import structlog
+from google.genai import types
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.tokens import estimate_tokens
+from config.logger import setup_logging
+
+
+# Smallest prompt the Gemini cached-content API accepts, by model prefix (most specific first)
+MIN_CACHE_TOKENS = {
+    "gemini-2.5-flash": 1024,
+    "gemini-2.0-flash": 2048,
+    "gemini-2.5-pro": 4096,
+    "gemini-1.5": 32768,
+}
+DEFAULT_MIN_CACHE_TOKENS = 4096
+DEFINITIVE_CACHE_ERRORS = (400, 403, 404, "INVALID_ARGUMENT", "PERMISSION_DENIED", "NOT_FOUND")
+
+
+def min_cache_tokens(model_name: str) -> int:
+    """Returns the minimum cacheable prompt size of a Gemini model."""
+    name = model_name.removeprefix("models/")
+    return next((tokens for prefix, tokens in MIN_CACHE_TOKENS.items() if name.startswith(prefix)), DEFAULT_MIN_CACHE_TOKENS)
+
+
+def is_definitive_cache_error(error: Exception) -> bool:
+    """True for errors that will not go away on retry (prompt too small, unsupported model); False for 429/5xx/network."""
+    if isinstance(error, (ValueError, KeyError, TypeError)):
+        return True
+    for attribute in ("code", "status_code", "status"):
+        if getattr(error, attribute, None) in DEFINITIVE_CACHE_ERRORS:
+            return True
+    return getattr(getattr(error, "response", None), "status_code", None) in DEFINITIVE_CACHE_ERRORS
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Removes the indentation that triple-quoted prompts inherit from the source,
+    trailing spaces and repeated blank lines. Only whitespace is changed.
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(prompt).strip().splitlines()]
+    normalized = []
+    for line in lines:
+        if not line and normalized and not normalized[-1]:
+            continue
+        normalized.append(line)
+    return "\n".join(normalized)
+
+
+class PromptCache:
+    """
+    Registers static system prompts once through the Gemini cached-content API
+    and hands out generation configs that reference the cache handle.
+    Handles are refreshed before they expire and a superseded cache is deleted.
+    A prompt that cannot be cached (below the model's minimum size, unsupported
+    model) is sent inline from then on; after a transient error (429, 5xx,
+    network) it is sent inline until `retry_seconds` have passed.
+    """
+    def __init__(self, logger, client, ttl_seconds: int = 3600, refresh_margin_seconds: int = 300,
+                 retry_seconds: int = 60):
+        """
+        Initializes the PromptCache.
+
+        Args:
+            logger: The logger.
+            client: The google-genai client (or a compatible stand-in).
+            ttl_seconds (int, optional): Lifetime requested for each cache entry.
+            refresh_margin_seconds (int, optional): Refresh the TTL when less than this is left.
+            retry_seconds (int, optional): Wait after a transient error before trying to cache the prompt again.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.retry_seconds = retry_seconds
+        self._entries: dict[str, dict] = {}
+        self._unsupported: set[str] = set()
+        self._retry_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(model_name: str, system_instruction: str) -> str:
+        return hashlib.sha256(f"{model_name}\n{system_instruction}".encode("utf-8")).hexdigest()
+
+    def handle(self, model_name: str, system_instruction: str) -> str | None:
+        """
+        Returns a valid cached-content name for the prompt, creating or refreshing it if needed.
+
+        Returns:
+            str | None: The cache name, or None if the prompt has to be sent inline.
+        """
+        key = self._key(model_name, system_instruction)
+        with self._lock:
+            now = time.time()
+            if key in self._unsupported or self._retry_at.get(key, 0.0) > now:
+                return None
+            tokens, minimum = estimate_tokens(system_instruction), min_cache_tokens(model_name)
+            if tokens < minimum:
+                self.logger.info(f"Prompt of {tokens} tokens is below the {minimum} token cache minimum of {model_name}, sending it inline")
+                self._unsupported.add(key)
+                return None
+            entry = self._entries.get(key)
+            try:
+                if entry is None or entry["expires_at"] <= now:
+                    if entry is not None:
+                        self._delete(entry["name"])  # <--- Superseded by the new cache
+                        self._entries.pop(key)
+                    cache = self.client.caches.create(
+                        model=model_name,
+                        config=types.CreateCachedContentConfig(
+                            system_instruction=system_instruction,
+                            display_name=f"prompt-{key[:12]}",
+                            ttl=f"{self.ttl_seconds}s",
+                        )
+                    )
+                    entry = {"name": cache.name, "expires_at": now + self.ttl_seconds}
+                    self._entries[key] = entry
+                    self.logger.info(f"Registered cached prompt {cache.name} for {model_name}")
+                elif entry["expires_at"] - now < self.refresh_margin_seconds:
+                    self.client.caches.update(
+                        name=entry["name"],
+                        config=types.UpdateCachedContentConfig(ttl=f"{self.ttl_seconds}s")
+                    )
+                    entry["expires_at"] = now + self.ttl_seconds
+                    self.logger.info(f"Refreshed TTL of cached prompt {entry['name']}")
+            except Exception as e:
+                if is_definitive_cache_error(e):
+                    self.logger.warning(f"Prompt caching unavailable for {model_name}, sending it inline: {e}")
+                    self._unsupported.add(key)
+                else:
+                    self.logger.warning(f"Prompt caching failed for {model_name}, inline for {self.retry_seconds}s: {e}")
+                    self._retry_at[key] = now + self.retry_seconds
+                stale = self._entries.pop(key, None)
+                if stale:
+                    self._delete(stale["name"])
+                return None
+            self._retry_at.pop(key, None)
+            return entry["name"]
+
+    def _delete(self, name: str):
+        """Deletes a cache on the server; failures are only logged since the cache expires anyway."""
+        try:
+            self.client.caches.delete(name=name)
+            self.logger.info(f"Deleted cached prompt {name}")
+        except Exception as e:
+            self.logger.warning(f"Could not delete cached prompt {name}: {e}")
+
+    def invalidate(self, model_name: str, system_instruction: str):
+        """Forgets (and deletes) the handle of a prompt, e.g. after a call with it failed."""
+        with self._lock:
+            entry = self._entries.pop(self._key(model_name, system_instruction), None)
+            if entry:
+                self._delete(entry["name"])
+
+    def close(self):
+        """Deletes every cache created by this instance."""
+        with self._lock:
+            for entry in self._entries.values():
+                self._delete(entry["name"])
+            self._entries.clear()
+
+    def generate_content(self, model_name: str, system_instruction: str, contents, **config_kwargs):
+        """
+        Calls generate_content with the cached prompt when possible, otherwise inline.
+        A call rejected because of the cache (expired, deleted, not permitted) is retried
+        once with the inline prompt; transient errors (429, 5xx) are raised and the cache is kept.
+
+        Args:
+            model_name (str): The Gemini model name.
+            system_instruction (str): The static system prompt.
+            contents: The per-call contents.
+            **config_kwargs: Additional GenerateContentConfig fields, e.g. response_mime_type.
+        """
+        name = self.handle(model_name, system_instruction)
+        if name:
+            try:
+                return self.client.models.generate_content(
+                    model=model_name,
+                    config=types.GenerateContentConfig(cached_content=name, **config_kwargs),
+                    contents=contents
+                )
+            except Exception as e:
+                if not is_definitive_cache_error(e):
+                    raise  # <--- Retrying inline under throttling would only add requests
+                self.logger.warning(f"Call with cached prompt {name} failed, retrying inline: {e}")
+                self.invalidate(model_name, system_instruction)
+        return self.client.models.generate_content(
+            model=model_name,
+            config=types.GenerateContentConfig(system_instruction=system_instruction, **config_kwargs),
+            contents=contents
+        )
+
+
+class LocalCacheStandIn:
+    """
+    A local stand-in for the google-genai client's `caches` and `models`
+    surfaces that counts billed input tokens: cached prompt tokens are billed
+    once at creation, inline prompts on every call.
+    """
+    def __init__(self):
+        self.billed_input_tokens = 0
+        self.calls = 0
+        self.created = 0
+        self._caches: dict[str, str] = {}
+        self.caches = SimpleNamespace(create=self._create_cache, update=self._update_cache, delete=self._delete_cache)
+        self.models = SimpleNamespace(generate_content=self._generate_content)
+
+    def _create_cache(self, model, config):
+        tokens, minimum = estimate_tokens(config.system_instruction), min_cache_tokens(model)
+        if tokens < minimum:
+            raise ValueError(f"Cached content is too small: {tokens} < {minimum} tokens")
+        self.created += 1
+        name = f"cachedContents/{self.created}"
+        self._caches[name] = config.system_instruction
+        self.billed_input_tokens += tokens
+        return SimpleNamespace(name=name)
+
+    def _update_cache(self, name, config):
+        if name not in self._caches:
+            raise KeyError(name)
+        return SimpleNamespace(name=name)
+
+    def _delete_cache(self, name):
+        if self._caches.pop(name, None) is None:
+            raise KeyError(name)
+
+    def _generate_content(self, model, config, contents):
+        self.calls += 1
+        cached_name = getattr(config, "cached_content", None)
+        if cached_name and cached_name not in self._caches:
+            raise KeyError(cached_name)
+        prompt = None if cached_name else getattr(config, "system_instruction", None)
+        self.billed_input_tokens += (estimate_tokens(prompt) if prompt else 0) + estimate_tokens(str(contents))
+        return SimpleNamespace(text="{}")
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    prompt = normalize_prompt(" " * 12 + "You are a classifier. " * 1000)
+    for use_cache in (False, True):
+        stand_in = LocalCacheStandIn()
+        cache = PromptCache(logger, stand_in)
+        for _ in range(25):
+            if use_cache:
+                cache.generate_content("gemini-2.0-flash", prompt, "entry deleted")
+            else:
+                stand_in.models.generate_content(
+                    model="gemini-2.0-flash",
+                    config=types.GenerateContentConfig(system_instruction=prompt),
+                    contents="entry deleted"
+                )
+        cache.close()
+        print(f"cached={use_cache}: {stand_in.calls} calls, {stand_in.billed_input_tokens} billed input tokens")
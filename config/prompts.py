@@ -0,0 +1,241 @@
+import os
+import sys
+import json
+import math
+import string
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.retrieval import tokenize
+from config.tokens import estimate_tokens
+from config.prompt_cache import normalize_prompt
+from config.logger import setup_logging
+
+DEFAULT_BASELINE_PATH = "./downloads/prompt_tokens.json"
+TIKTOKEN_ENCODINGS = {"gpt-4o": "o200k_base", "gpt-4.1": "o200k_base", "o1": "o200k_base", "o3": "o200k_base"}
+
+_encodings = {}
+_encodings_lock = threading.Lock()
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """
+    Counts tokens locally: exactly with tiktoken for OpenAI models when it is
+    installed, otherwise (Gemini, or no tiktoken) with the 4-characters-per-token estimate.
+    """
+    if not model or not model.startswith(("gpt-", "o1", "o3")):
+        return estimate_tokens(text)
+    name = next((encoding for prefix, encoding in TIKTOKEN_ENCODINGS.items() if model.startswith(prefix)), "cl100k_base")
+    with _encodings_lock:
+        if name not in _encodings:
+            try:
+                import tiktoken
+                _encodings[name] = tiktoken.get_encoding(name)
+            except Exception:
+                _encodings[name] = None  # <--- Not installed or no cached encoding: estimate instead
+        encoding = _encodings[name]
+    return len(encoding.encode(text)) if encoding else estimate_tokens(text)
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when a prompt does not fit its template's token budget even without few-shot examples."""
+
+
+@dataclass
+class FewShotExample:
+    """One sample input with its expected result, and an optional explanation."""
+    input: str
+    output: str
+    note: str | None = None
+
+
+@dataclass
+class PromptTemplate:
+    """
+    A named prompt. `template` uses string.Template placeholders ($name), so
+    JSON braces need no escaping; `$examples` is replaced by the rendered
+    few-shot examples. `k` limits the examples to the k most similar to the
+    input (None sends all) but never below one example per distinct output,
+    and `budget_tokens` caps prompt plus input.
+    """
+    name: str
+    template: str
+    examples: list[FewShotExample] = field(default_factory=list)
+    k: int | None = None
+    budget_tokens: int | None = None
+    model: str | None = None
+    example_format: str = "Sample input $number:\n$input\n\nSample result:\n$output"
+
+
+class PromptRegistry:
+    """
+    Keeps prompt templates in one place and renders them with normalized
+    whitespace, local token counts and dynamic few-shot selection. Token
+    counts of every call are recorded per template and compared with a saved
+    baseline, so a prompt that grew shows up in `report`.
+    """
+    def __init__(self, logger, baseline_path: str | None = DEFAULT_BASELINE_PATH, regression_tolerance: float = 0.1):
+        """
+        Initializes the PromptRegistry.
+
+        Args:
+            logger: The logger.
+            baseline_path (str | None, optional): JSON file with mean tokens per template from an earlier run.
+            regression_tolerance (float, optional): Growth of the mean over the baseline reported as a regression.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.baseline_path = baseline_path
+        self.regression_tolerance = regression_tolerance
+        self.templates: dict[str, PromptTemplate] = {}
+        self._stats: dict[str, dict] = {}
+        self._idf: dict[str, tuple[list[Counter], dict[str, float]]] = {}
+        self._lock = threading.Lock()
+        self._baseline = None
+
+    @property
+    def baseline(self) -> dict:
+        """Mean tokens per template from `baseline_path`, read on first use rather than at import."""
+        if self._baseline is None:
+            baseline = {}
+            if self.baseline_path and os.path.exists(self.baseline_path):
+                with open(self.baseline_path, "r") as f:
+                    baseline = json.load(f)
+            self._baseline = baseline
+        return self._baseline
+
+    def register(self, template: PromptTemplate) -> PromptTemplate:
+        template.template = normalize_prompt(template.template)
+        self.templates[template.name] = template
+        vectors = [Counter(tokenize(example.input)) for example in template.examples]
+        documents = len(vectors)
+        frequencies = Counter(token for vector in vectors for token in vector)
+        idf = {token: math.log(1 + documents / frequency) for token, frequency in frequencies.items()}
+        self._idf[template.name] = (vectors, idf)
+        return template
+
+    def select_examples(self, name: str, query: str, k: int) -> list[int]:
+        """
+        Returns the indices of the examples most similar to `query` (TF-IDF cosine): first the most
+        similar example of every distinct output, so each label keeps a sample, then the rest up to k.
+        """
+        vectors, idf = self._idf[name]
+        query_vector = Counter(tokenize(query))
+
+        def weight(vector):
+            return {token: count * idf.get(token, 0.0) for token, count in vector.items()}
+
+        query_weights = weight(query_vector)
+        query_norm = math.sqrt(sum(value * value for value in query_weights.values())) or 1.0
+        scores = []
+        for index, vector in enumerate(vectors):
+            weights = weight(vector)
+            norm = math.sqrt(sum(value * value for value in weights.values())) or 1.0
+            dot = sum(value * query_weights.get(token, 0.0) for token, value in weights.items())
+            scores.append((dot / (norm * query_norm), -index))
+        ranked = [-negative_index for _, negative_index in sorted(scores, reverse=True)]
+        outputs = [self.templates[name].examples[index].output for index in ranked]
+        covering = [index for position, index in enumerate(ranked) if outputs[position] not in outputs[:position]]
+        rest = [index for index in ranked if index not in covering]
+        return (covering + rest)[:max(k, len(covering))]
+
+    def _render_examples(self, template: PromptTemplate, indices: list[int]) -> str:
+        rendered = []
+        for number, index in enumerate(sorted(indices), start=1):  # <--- Original order keeps prompts stable
+            example = template.examples[index]
+            text = string.Template(template.example_format).substitute(number=number, input=example.input, output=example.output)
+            rendered.append(f"{text}\nReason: {example.note}" if example.note else text)
+        return "\n\n".join(rendered)
+
+    def render(self, name: str, input_text: str = "", k: int | None = None, **fields) -> tuple[str, int]:
+        """
+        Renders a template for one call.
+
+        Args:
+            name (str): The template name.
+            input_text (str, optional): The content sent with the prompt; drives few-shot selection and the budget.
+            k (int | None, optional): Overrides the template's number of few-shot examples.
+            **fields: Values of the other $placeholders.
+
+        Returns:
+            tuple[str, int]: The prompt and the token count of prompt plus input.
+        """
+        template = self.templates[name]
+        k = k if k is not None else template.k
+        indices = list(range(len(template.examples)))
+        if k is not None and input_text and k < len(indices):
+            indices = self.select_examples(name, input_text, k)
+        elif input_text and template.budget_tokens:
+            indices = self.select_examples(name, input_text, len(indices))
+        input_tokens = count_tokens(input_text, template.model) if input_text else 0
+        while True:
+            prompt = normalize_prompt(string.Template(template.template).substitute(
+                examples=self._render_examples(template, indices), **fields))
+            tokens = count_tokens(prompt, template.model) + input_tokens
+            if not template.budget_tokens or tokens <= template.budget_tokens:
+                return prompt, tokens
+            if not indices:
+                raise PromptBudgetExceeded(f"Prompt {name} needs {tokens} tokens, budget is {template.budget_tokens}")
+            indices = indices[:-1]  # <--- Drop the least similar example and try again
+            self.logger.warning(f"Prompt {name} over budget ({tokens} > {template.budget_tokens}), "
+                                f"keeping {len(indices)} examples")
+
+    def record(self, name: str, tokens: int):
+        """Records the prompt tokens of one call."""
+        with self._lock:
+            stats = self._stats.setdefault(name, {"calls": 0, "total_tokens": 0, "max_tokens": 0})
+            stats["calls"] += 1
+            stats["total_tokens"] += tokens
+            stats["max_tokens"] = max(stats["max_tokens"], tokens)
+
+    def report(self) -> dict:
+        """Returns calls, mean and max tokens per template, with the change against the baseline."""
+        with self._lock:
+            stats = {name: dict(values) for name, values in self._stats.items()}
+        report = {}
+        for name, values in stats.items():
+            mean = values["total_tokens"] / values["calls"]
+            row = {"calls": values["calls"], "mean_tokens": round(mean, 1), "max_tokens": values["max_tokens"]}
+            if name in self.baseline:
+                change = mean / self.baseline[name] - 1
+                row["change_vs_baseline"] = round(change, 3)
+                if change > self.regression_tolerance:
+                    self.logger.warning(f"Prompt {name} grew {change:.0%} over its baseline of {self.baseline[name]} tokens")
+            report[name] = row
+        return report
+
+    def save_baseline(self):
+        """Stores the current mean tokens per template as the baseline for later runs."""
+        with self._lock:
+            means = {name: round(values["total_tokens"] / values["calls"], 1) for name, values in self._stats.items()}
+        self.baseline.update(means)
+        os.makedirs(os.path.dirname(os.path.abspath(self.baseline_path)), exist_ok=True)
+        with open(self.baseline_path, "w") as f:
+            json.dump(self.baseline, f, indent=2)
+
+
+if __name__ == "__main__":
+    # python config/prompts.py "<text to classify>" [k]
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    registry = PromptRegistry(logger, baseline_path=None)
+    registry.register(PromptTemplate("sentiment", """
+        Classify the sentiment of the text as "positive", "negative" or "neutral".
+
+        $examples
+    """, [
+        FewShotExample("The repair went smoothly and the unit works again.", "positive"),
+        FewShotExample("Sensor broke down again, nobody came to fix it.", "negative"),
+        FewShotExample("Patrol finished at 22:00.", "neutral"),
+        FewShotExample("Great pizza at the canteen today.", "positive"),
+    ]))
+    text = sys.argv[1] if len(sys.argv) > 1 else "The cable broke down and the sensor is dead."
+    k = int(sys.argv[2]) if len(sys.argv) > 2 else 2
+    prompt, tokens = registry.render("sentiment", text, k=k)
+    registry.record("sentiment", tokens)
+    print(prompt)
+    print(f"\n{tokens} tokens with {k} examples, {registry.render('sentiment', text)[1]} with all")
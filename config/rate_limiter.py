@@ -0,0 +1,263 @@
+import time
+import asyncio
+import threading
+from contextlib import contextmanager, asynccontextmanager
+from dataclasses import dataclass
+import structlog
+
+
+@dataclass
+class ProviderLimits:
+    """Published limits of one provider/model and the bounds for adaptive concurrency."""
+    requests_per_minute: float = 60
+    tokens_per_minute: float = 1_000_000
+    initial_concurrency: float = 4
+    min_concurrency: float = 1
+    max_concurrency: float = 32
+    target_latency_seconds: float = 10.0  # <--- Slower successes count as congestion
+
+
+class RateLimitError(Exception):
+    """Raised by callers to signal a 429 explicitly, optionally with a Retry-After delay."""
+    def __init__(self, message: str = "Rate limited", retry_after: float | None = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+RATE_LIMIT_ERROR_NAMES = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Recognises 429 / RESOURCE_EXHAUSTED errors from the OpenAI, google-genai and requests clients
+    by exception type or status code, never by the message text.
+    """
+    if isinstance(error, RateLimitError) or any(cls.__name__ in RATE_LIMIT_ERROR_NAMES for cls in type(error).__mro__):
+        return True
+    for attribute in ("status_code", "code", "status"):
+        if getattr(error, attribute, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) == 429
+
+
+def retry_after_seconds(error: Exception) -> float | None:
+    """Reads the Retry-After delay (in seconds) from an error or its HTTP response, if present."""
+    if getattr(error, "retry_after", None) is not None:
+        return float(error.retry_after)
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket. `reserve` takes the full amount immediately
+    (the balance may go negative) and returns how long the caller has to wait,
+    so the same bucket works for blocking and asyncio callers.
+    """
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate_per_second)
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate_per_second)
+
+    def available(self) -> float:
+        """Returns the current balance (refilled to now) without taking anything."""
+        with self._lock:
+            return min(self.capacity, self.tokens + (time.monotonic() - self.updated) * self.rate_per_second)
+
+
+class ProviderState:
+    """Rate buckets, AIMD concurrency limit and Retry-After block for one provider/model."""
+    def __init__(self, limits: ProviderLimits):
+        self.limits = limits
+        self.requests = TokenBucket(limits.requests_per_minute / 60, max(1.0, limits.requests_per_minute / 60))
+        self.tokens = TokenBucket(limits.tokens_per_minute / 60, limits.tokens_per_minute)  # <--- A full minute's quota may burst
+        self.concurrency_limit = float(limits.initial_concurrency)
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.stats = {"admitted": 0, "succeeded": 0, "throttled": 0, "failed": 0}
+        self.condition = threading.Condition()
+
+    def try_acquire(self) -> float:
+        """Takes a concurrency slot if one is free; otherwise returns a suggested wait in seconds."""
+        with self.condition:
+            blocked_for = self.blocked_until - time.monotonic()
+            if blocked_for > 0:
+                return blocked_for
+            if self.in_flight >= int(self.concurrency_limit):
+                return -1.0
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            return 0.0
+
+    def release(self, latency: float | None, throttled: bool, retry_after: float | None):
+        """Frees a slot and applies AIMD: multiplicative decrease on 429 or slow calls, additive increase otherwise."""
+        limits = self.limits
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.stats["throttled"] += 1
+                self.concurrency_limit = max(limits.min_concurrency, self.concurrency_limit / 2)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            elif latency is None:
+                self.stats["failed"] += 1
+            else:
+                self.stats["succeeded"] += 1
+                if latency > limits.target_latency_seconds:
+                    self.concurrency_limit = max(limits.min_concurrency, self.concurrency_limit * 0.9)
+                else:
+                    self.concurrency_limit = min(limits.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            self.condition.notify_all()
+
+
+class AdmissionController:
+    """
+    Shared admission control for LLM providers. Each (provider, model) pair has
+    token buckets for requests and tokens per minute and an AIMD concurrency
+    limit driven by latency and 429s; Retry-After pauses the pair. Use
+    `admit` from threads and `admit_async` from asyncio code.
+    """
+    def __init__(self, logger, limits: dict[tuple[str, str], ProviderLimits] | None = None,
+                 default_limits: ProviderLimits | None = None):
+        """
+        Initializes the AdmissionController.
+
+        Args:
+            logger: The logger.
+            limits (dict, optional): Limits per (provider, model); a model of "*" applies to the whole provider.
+            default_limits (ProviderLimits, optional): Limits for pairs without an entry.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.limits = limits or {}
+        self.default_limits = default_limits or ProviderLimits()
+        self._states: dict[tuple[str, str], ProviderState] = {}
+        self._lock = threading.Lock()
+
+    def state(self, provider: str, model: str) -> ProviderState:
+        key = (provider, model)
+        with self._lock:
+            if key not in self._states:
+                limits = self.limits.get(key) or self.limits.get((provider, "*")) or self.default_limits
+                self._states[key] = ProviderState(limits)
+            return self._states[key]
+
+    def _finish(self, state: ProviderState, provider: str, model: str, started: float, error: BaseException | None):
+        if error is None:
+            state.release(time.monotonic() - started, throttled=False, retry_after=None)
+        elif is_rate_limit_error(error):
+            retry_after = retry_after_seconds(error)
+            state.release(None, throttled=True, retry_after=retry_after)
+            self.logger.warning(f"Rate limited by {provider}/{model}, concurrency limit now "
+                                f"{state.concurrency_limit:.1f}, retry after {retry_after}")
+        else:
+            state.release(None, throttled=False, retry_after=None)
+
+    @contextmanager
+    def admit(self, provider: str, model: str, tokens: int = 0):
+        """
+        Blocks until a request may be sent, then records its outcome.
+
+        Args:
+            provider (str): e.g. "gemini" or "openai".
+            model (str): The model name.
+            tokens (int, optional): Estimated tokens of the request, charged to the TPM bucket.
+        """
+        state = self.state(provider, model)
+        time.sleep(state.requests.reserve(1) + state.tokens.reserve(tokens))
+        while (wait := state.try_acquire()) != 0.0:
+            with state.condition:
+                state.condition.wait(timeout=wait if wait > 0 else 1.0)
+        started = time.monotonic()
+        error = None
+        try:
+            yield state
+        except BaseException as e:  # <--- Cancellation and Ctrl-C must give the slot back too
+            error = e
+            raise
+        finally:
+            self._finish(state, provider, model, started, error)
+
+    @asynccontextmanager
+    async def admit_async(self, provider: str, model: str, tokens: int = 0):
+        """The asyncio counterpart of `admit`; waits without blocking the event loop."""
+        state = self.state(provider, model)
+        await asyncio.sleep(state.requests.reserve(1) + state.tokens.reserve(tokens))
+        poll = 0.01
+        while (wait := state.try_acquire()) != 0.0:
+            await asyncio.sleep(wait if wait > 0 else poll)
+            poll = min(poll * 2, 0.5)
+        started = time.monotonic()
+        error = None
+        try:
+            yield state
+        except BaseException as e:  # <--- Cancellation and Ctrl-C must give the slot back too
+            error = e
+            raise
+        finally:
+            self._finish(state, provider, model, started, error)
+
+    def call(self, provider: str, model: str, function, /, *args, tokens: int = 0, retries: int = 3, **kwargs):
+        """
+        Calls `function` under admission control, retrying 429s after their Retry-After delay.
+        """
+        for attempt in range(retries + 1):
+            try:
+                with self.admit(provider, model, tokens):
+                    return function(*args, **kwargs)
+            except Exception as e:
+                if attempt == retries or not is_rate_limit_error(e):
+                    raise
+                time.sleep(retry_after_seconds(e) or 2 ** attempt)
+
+    async def call_async(self, provider: str, model: str, function, /, *args, tokens: int = 0, retries: int = 3, **kwargs):
+        """The asyncio counterpart of `call` for coroutine functions."""
+        for attempt in range(retries + 1):
+            try:
+                async with self.admit_async(provider, model, tokens):
+                    return await function(*args, **kwargs)
+            except Exception as e:
+                if attempt == retries or not is_rate_limit_error(e):
+                    raise
+                await asyncio.sleep(retry_after_seconds(e) or 2 ** attempt)
+
+    def report(self) -> dict:
+        """Returns the current concurrency limit and counters per provider/model."""
+        with self._lock:
+            states = dict(self._states)
+        return {
+            f"{provider}/{model}": {"concurrency_limit": round(state.concurrency_limit, 2), **state.stats}
+            for (provider, model), state in states.items()
+        }
+
+
+def admitted_call(controller: AdmissionController | None, provider: str, model: str, function, /, *args, tokens: int = 0, **kwargs):
+    """Calls `function` through `controller` if one is configured, otherwise directly."""
+    if controller is None:
+        return function(*args, **kwargs)
+    return controller.call(provider, model, function, *args, tokens=tokens, **kwargs)
+
+
+@contextmanager
+def admitted(controller: AdmissionController | None, provider: str, model: str, tokens: int = 0):
+    """Context-manager form of `admitted_call`, for calls that cannot simply be retried (e.g. streams)."""
+    if controller is None:
+        yield None
+        return
+    with controller.admit(provider, model, tokens) as state:
+        yield state
+
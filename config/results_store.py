@@ -0,0 +1,177 @@
+import os
+import sys
+import time
+import sqlite3
+import threading
+from typing import Iterator
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_STORE_PATH = "./downloads/results.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_path TEXT NOT NULL,
+    source_hash TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    model TEXT,
+    params_hash TEXT,
+    text TEXT NOT NULL,
+    started_at REAL,
+    duration_seconds REAL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_by_stage ON results (stage, source_path, id);
+CREATE INDEX IF NOT EXISTS results_by_source ON results (source_hash, stage, model, params_hash);
+"""
+
+
+class ResultsStore:
+    """
+    An append-only SQLite store (WAL mode) for stage outputs such as OCR text
+    and transcripts, replacing one sidecar .txt per source. Rows are never
+    updated: the newest row per (stage, source_path) is the current result.
+    Each thread gets its own connection; WAL lets readers run alongside one
+    writer, and other writers wait up to `busy_timeout_ms`.
+    """
+    def __init__(self, logger, path: str = DEFAULT_STORE_PATH, busy_timeout_ms: int = 10000):
+        """
+        Initializes the ResultsStore and creates the schema if needed.
+
+        Args:
+            logger: The logger.
+            path (str, optional): The SQLite database file.
+            busy_timeout_ms (int, optional): How long a writer waits for the write lock.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.path = path
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+            connection.row_factory = sqlite3.Row
+            self._local.connection = connection
+        return connection
+
+    def add(self, source_path: str, source_hash: str, stage: str, text: str, model: str | None = None,
+            params_hash: str | None = None, started_at: float | None = None, duration_seconds: float | None = None) -> int:
+        """
+        Appends a result.
+
+        Args:
+            source_path (str): The source file or document name.
+            source_hash (str): Content hash of the source.
+            stage (str): e.g. "ocr" or "transcribe".
+            text (str): The stage output.
+            model (str | None, optional): The model that produced it.
+            params_hash (str | None, optional): Hash of other inputs, e.g. the prompt.
+            started_at (float | None, optional): Unix time the stage started.
+            duration_seconds (float | None, optional): How long the stage took.
+
+        Returns:
+            int: The row id.
+        """
+        cursor = self._connection().execute(
+            "INSERT INTO results (source_path, source_hash, stage, model, params_hash, text, started_at, duration_seconds, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (source_path, source_hash, stage, model, params_hash, text, started_at, duration_seconds, time.time())
+        )
+        return cursor.lastrowid
+
+    def add_many(self, rows: list[dict]):
+        """Appends several results in one transaction; each dict takes the keyword arguments of `add`."""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany(
+                "INSERT INTO results (source_path, source_hash, stage, model, params_hash, text, started_at, duration_seconds, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row["source_path"], row["source_hash"], row["stage"], row.get("model"), row.get("params_hash"), row["text"],
+                  row.get("started_at"), row.get("duration_seconds"), now) for row in rows]
+            )
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+
+    def latest(self, source_hash: str, stage: str, model: str | None = None, params_hash: str | None = None) -> dict | None:
+        """Returns the newest result for the same content, stage, model and parameters, if any."""
+        row = self._connection().execute(
+            "SELECT * FROM results WHERE source_hash = ? AND stage = ? AND model IS ? AND params_hash IS ? "
+            "ORDER BY id DESC LIMIT 1",
+            (source_hash, stage, model, params_hash)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def iter_stage(self, stage: str) -> Iterator[dict]:
+        """Yields the current (newest) result per source of a stage, ordered by source path, in one query."""
+        cursor = self._connection().execute(
+            "SELECT * FROM results WHERE id IN (SELECT MAX(id) FROM results WHERE stage = ? GROUP BY source_path) "
+            "ORDER BY source_path",
+            (stage,)
+        )
+        while rows := cursor.fetchmany(1000):
+            for row in rows:
+                yield dict(row)
+
+    def texts(self, stage: str) -> dict[str, str]:
+        """Returns {source_path: text} for the current results of a stage."""
+        return {row["source_path"]: row["text"] for row in self.iter_stage(stage)}
+
+    def export_txt(self, stage: str, output_dir: str | None = None) -> list[str]:
+        """
+        Writes the current results of a stage in the old sidecar layout:
+        `<name without extension>.txt` in `output_dir`, or next to the source if omitted.
+
+        Returns:
+            list[str]: The written paths.
+        """
+        written = {}
+        for row in self.iter_stage(stage):
+            directory = output_dir if output_dir else os.path.dirname(row["source_path"])
+            txt_path = os.path.join(directory, os.path.splitext(os.path.basename(row["source_path"]))[0] + ".txt")
+            if txt_path in written:
+                self.logger.warning(f"Export collision: {row['source_path']} and {written[txt_path]} both map to {txt_path}")
+            os.makedirs(directory or ".", exist_ok=True)
+            with open(txt_path, "w") as f:
+                f.write(row["text"])
+            written[txt_path] = row["source_path"]
+        self.logger.info(f"Exported {len(written)} {stage} results")
+        return list(written)
+
+    def close(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+
+if __name__ == "__main__":
+    # python config/results_store.py export <stage> [output_dir]
+    # python config/results_store.py stats
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    store = ResultsStore(logger)
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "export":
+        for path in store.export_txt(sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None):
+            print(path)
+    else:
+        for row in store._connection().execute(
+                "SELECT stage, COUNT(*) AS results, COUNT(DISTINCT source_path) AS sources, "
+                "ROUND(AVG(duration_seconds), 3) AS mean_seconds FROM results GROUP BY stage"):
+            print(dict(row))
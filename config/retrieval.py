@@ -0,0 +1,255 @@
+import os
+import sys
+import re
+import json
+import math
+import hashlib
+import unicodedata
+from collections import Counter, defaultdict
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+from config.tokens import estimate_tokens
+
+# Most frequent Polish inflectional endings, longest first so the greediest match wins.
+POLISH_SUFFIXES = sorted([
+    "ami", "ach", "owie", "owi", "ego", "emu", "ymi", "imi", "ych", "ich",
+    "owa", "owe", "owy", "owej", "ową", "nia", "niu", "nie", "cie", "ciu",
+    "om", "ów", "em", "ie", "ej", "ą", "ę", "a", "e", "i", "o", "u", "y",
+], key=len, reverse=True)
+
+POLISH_STOPWORDS = {
+    "i", "w", "z", "na", "do", "nie", "sie", "to", "że", "ze", "jest", "a", "o", "jak", "ale", "po",
+    "czy", "co", "tak", "od", "za", "the", "of", "and", "in", "is", "to", "a",
+}
+
+DEFAULT_SOURCES = [
+    "./downloads/audio",
+    "./documents/pliki_z_fabryki/facts",
+    "./documents/pliki_z_fabryki",
+]
+DEFAULT_INDEX_PATH = "./downloads/index/bm25.json"
+
+
+def fold_diacritics(text: str) -> str:
+    """Replaces Polish diacritics with ASCII letters (ł is not decomposed by NFKD)."""
+    text = text.replace("ł", "l").replace("Ł", "L")
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def stem(token: str) -> str:
+    """Light suffix-stripping stemmer for Polish; keeps at least four characters of the stem."""
+    for suffix in POLISH_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 4:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercases, stems and diacritic-folds the words in text, dropping stopwords."""
+    tokens = []
+    for word in re.findall(r"\w+", text.lower()):
+        if word in POLISH_STOPWORDS or len(word) < 2:
+            continue
+        tokens.append(fold_diacritics(stem(word)))
+    return tokens
+
+
+def split_into_passages(text: str, max_tokens: int) -> list[str]:
+    """Splits text on blank lines and merges or cuts paragraphs so each passage fits max_tokens."""
+    passages = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while estimate_tokens(paragraph) > max_tokens:
+            cut = paragraph.rfind(" ", 0, max_tokens * 4)
+            cut = cut if cut > 0 else max_tokens * 4
+            passages.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and estimate_tokens(current + "\n\n" + paragraph) > max_tokens:
+            passages.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        passages.append(current)
+    return passages
+
+
+class BM25Index:
+    """
+    An on-disk BM25 index over text files.
+
+    The index file stores, per source file, its mtime/size and the term
+    frequencies of each passage; the inverted postings are rebuilt in memory
+    on load. `update()` only re-reads files that were added or changed.
+    """
+    def __init__(self, logger, index_path: str = DEFAULT_INDEX_PATH, passage_tokens: int = 200, k1: float = 1.5, b: float = 0.75):
+        """
+        Initializes the index and loads it from disk if it exists.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.index_path = index_path
+        self.passage_tokens = passage_tokens
+        self.k1 = k1
+        self.b = b
+        self.documents: dict[str, dict] = {}
+        self._load()
+        self._build_postings()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("passage_tokens") == self.passage_tokens:
+            self.documents = data.get("documents", {})
+
+    def save(self):
+        """Writes the index atomically to `index_path`."""
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"passage_tokens": self.passage_tokens, "documents": self.documents}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+
+    def _build_postings(self):
+        self.passages: list[tuple[str, int]] = []
+        self.passage_lengths: list[int] = []
+        self.postings: dict[str, list[tuple[int, int]]] = defaultdict(list)
+        for path, document in self.documents.items():
+            for position, passage in enumerate(document["passages"]):
+                passage_id = len(self.passages)
+                self.passages.append((path, position))
+                self.passage_lengths.append(passage["length"])
+                for term, count in passage["tf"].items():
+                    self.postings[term].append((passage_id, count))
+        total = sum(self.passage_lengths)
+        self.average_length = total / len(self.passage_lengths) if self.passage_lengths else 0.0
+
+    def _index_text(self, path: str, text: str, **metadata):
+        passages = []
+        for passage in split_into_passages(text, self.passage_tokens):
+            terms = tokenize(passage)
+            passages.append({"text": passage, "length": len(terms), "tf": dict(Counter(terms))})
+        self.documents[path] = {**metadata, "passages": passages}
+
+    def _index_file(self, path: str, stat: os.stat_result):
+        with open(path, "r", errors="replace") as f:
+            text = f.read()
+        self._index_text(path, text, mtime=stat.st_mtime, size=stat.st_size)
+
+    def update(self, sources: list[str] = DEFAULT_SOURCES, suffix: str = ".txt", texts: dict[str, str] | None = None) -> dict:
+        """
+        Brings the index up to date with the text files in `sources`.
+
+        Args:
+            sources (list[str]): Directories (not recursive) or individual files to index.
+            suffix (str, optional): Only files with this suffix are indexed from directories.
+            texts (dict[str, str] | None, optional): In-memory documents by name, e.g. from the results store;
+                re-indexed when their content hash changes.
+
+        Returns:
+            dict: Counts of added, updated, removed and unchanged files.
+        """
+        logger = self.logger
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        for source in sources:
+            if os.path.isdir(source):
+                paths = [os.path.join(source, name) for name in sorted(os.listdir(source)) if name.endswith(suffix)]
+            elif os.path.isfile(source):
+                paths = [source]
+            else:
+                logger.warning(f"Index source does not exist: {source}")
+                continue
+            for path in paths:
+                path = os.path.normpath(path)
+                if path in seen or not os.path.isfile(path):
+                    continue
+                seen.add(path)
+                stat = os.stat(path)
+                known = self.documents.get(path)
+                if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+                    stats["unchanged"] += 1
+                    continue
+                stats["updated" if known else "added"] += 1
+                self._index_file(path, stat)
+
+        for path, text in (texts or {}).items():
+            seen.add(path)
+            digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            known = self.documents.get(path)
+            if known and known.get("hash") == digest:
+                stats["unchanged"] += 1
+                continue
+            stats["updated" if known else "added"] += 1
+            self._index_text(path, text, hash=digest)
+
+        for path in list(self.documents):
+            if path not in seen:
+                del self.documents[path]
+                stats["removed"] += 1
+
+        if stats["added"] or stats["updated"] or stats["removed"]:
+            self.save()
+        self._build_postings()
+        logger.info(f"Index updated: {stats}")
+        return stats
+
+    def score(self, query: str) -> dict[int, float]:
+        """Returns BM25 scores for every passage that shares a term with the query."""
+        scores: dict[int, float] = defaultdict(float)
+        passage_count = len(self.passages)
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (passage_count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for passage_id, count in postings:
+                length_norm = 1 - self.b + self.b * self.passage_lengths[passage_id] / (self.average_length or 1)
+                scores[passage_id] += idf * count * (self.k1 + 1) / (count + self.k1 * length_norm)
+        return scores
+
+    def query(self, query: str, top_k: int = 5, token_budget: int = 1000) -> list[dict]:
+        """
+        Returns the best matching passages that fit the token budget.
+
+        Args:
+            query (str): The natural-language query.
+            top_k (int, optional): Maximum number of passages to return.
+            token_budget (int, optional): Maximum total estimated tokens of the returned passages.
+
+        Returns:
+            list[dict]: Passages with "path", "text" and "score", best first.
+        """
+        scores = self.score(query)
+        results = []
+        used_tokens = 0
+        for passage_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True):
+            path, position = self.passages[passage_id]
+            text = self.documents[path]["passages"][position]["text"]
+            tokens = estimate_tokens(text)
+            if used_tokens + tokens > token_budget:
+                continue
+            results.append({"path": path, "text": text, "score": round(score, 4)})
+            used_tokens += tokens
+            if len(results) >= top_k:
+                break
+        self.logger.info(f"Query returned {len(results)} passages, {used_tokens} tokens: {query}")
+        return results
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    index = BM25Index(logger)
+    index.update()
+    query = " ".join(sys.argv[1:]) or "uczelnia Andrzej Maj ulica"
+    for result in index.query(query):
+        print(f"[{result['score']}] {result['path']}\n{result['text']}\n")
@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dotenv import load_dotenv
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.logger import setup_logging
+
+DEFAULT_CACHE_PATH = "./downloads/secrets.cache"
+DEFAULT_SECRET_NAMES = ("GEMINI_API_KEY", "OPENAI_API_KEY", "AIDEVS_API_KEY")
+
+
+class SecretManagerBackend:
+    """
+    Reads the latest version of secrets from GCP Secret Manager. `client`
+    defaults to the real SecretManagerServiceClient (google-cloud-secret-manager);
+    any object with the same `access_secret_version` method works, e.g.
+    LocalSecretManagerFake.
+    """
+    def __init__(self, project_id: str, client=None):
+        self.project_id = project_id
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud import secretmanager
+            self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def access(self, name: str) -> str:
+        """Returns the secret value; raises KeyError if the secret does not exist."""
+        path = f"projects/{self.project_id}/secrets/{name}/versions/latest"
+        try:
+            response = self.client.access_secret_version(request={"name": path})
+        except Exception as e:
+            if type(e).__name__ == "NotFound" or isinstance(e, KeyError):
+                raise KeyError(name) from e
+            raise
+        return response.payload.data.decode("utf-8")
+
+
+class LocalSecretManagerFake:
+    """
+    An in-memory stand-in for SecretManagerServiceClient.access_secret_version
+    that counts calls and can simulate latency, for testing without GCP.
+    """
+    def __init__(self, secrets: dict[str, str] | None = None, latency_seconds: float = 0.0):
+        self.secrets = dict(secrets or {})
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def access_secret_version(self, request: dict):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_seconds)
+        name = request["name"].split("/secrets/")[1].split("/")[0]
+        if name not in self.secrets:
+            raise KeyError(name)
+        data = self.secrets[name].encode("utf-8")
+        return type("AccessSecretVersionResponse", (), {"payload": type("SecretPayload", (), {"data": data})})()
+
+
+class EncryptedFileCache:
+    """
+    Stores resolved secrets in a local file encrypted with Fernet
+    (the `cryptography` package). The key comes from SECRETS_CACHE_KEY and is
+    never written next to the cache; without a key the file cache is disabled.
+    """
+    def __init__(self, logger, path: str = DEFAULT_CACHE_PATH, key: str | None = None):
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.path = path
+        self._fernet = None
+        key = key or os.getenv("SECRETS_CACHE_KEY")
+        if key:
+            from cryptography.fernet import Fernet
+            self._fernet = Fernet(key.encode("ascii") if isinstance(key, str) else key)
+
+    @property
+    def enabled(self) -> bool:
+        return self._fernet is not None
+
+    def load(self) -> dict:
+        """Returns {name: {"value", "fetched_at"}}; an unreadable or foreign cache is ignored."""
+        if not self.enabled or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "rb") as f:
+                return json.loads(self._fernet.decrypt(f.read()))
+        except Exception as e:
+            self.logger.warning(f"Ignoring unreadable secrets cache {self.path}: {type(e).__name__}")
+            return {}
+
+    def save(self, entries: dict):
+        if not self.enabled:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(self._fernet.encrypt(json.dumps(entries).encode("utf-8")))
+        os.replace(tmp_path, self.path)
+
+
+class SecretResolver:
+    """
+    Resolves credentials once per TTL instead of once per key per process.
+    Order: in-memory value, encrypted file cache, Secret Manager (missing
+    names fetched concurrently in one batch), a stale cached value if
+    Secret Manager is unreachable, and finally the environment / `.env`.
+    A failed lookup is not repeated for `failure_ttl_seconds`. Values close to expiry are served immediately and refreshed in the
+    background.
+    """
+    def __init__(self, logger, backend: SecretManagerBackend | None = None, ttl_seconds: float = 3600,
+                 refresh_margin_seconds: float = 300, file_cache: EncryptedFileCache | None = None, max_workers: int = 8,
+                 failure_ttl_seconds: float = 60):
+        """
+        Initializes the SecretResolver.
+
+        Args:
+            logger: The logger.
+            backend (SecretManagerBackend | None, optional): Remote source; None resolves from the environment only.
+            ttl_seconds (float, optional): How long a fetched value is used without asking Secret Manager again.
+            refresh_margin_seconds (float, optional): Refresh in the background when less than this is left.
+            file_cache (EncryptedFileCache | None, optional): Persists values across processes.
+            max_workers (int, optional): Concurrent Secret Manager lookups per batch.
+            failure_ttl_seconds (float, optional): How long a failed lookup is remembered before Secret Manager is asked again.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.refresh_margin_seconds = refresh_margin_seconds
+        self.file_cache = file_cache
+        self.max_workers = max_workers
+        self.failure_ttl_seconds = failure_ttl_seconds
+        self.stats = {"memory_hits": 0, "remote_fetches": 0, "failures_cached": 0, "stale_served": 0, "env_fallbacks": 0,
+                      "background_refreshes": 0}
+        self._entries: dict[str, dict] = file_cache.load() if file_cache else {}
+        self._refreshing: set[str] = set()
+        self._failed_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+        load_dotenv()
+
+    def _fetch(self, names: list[str]) -> dict[str, str]:
+        """Fetches names from the backend concurrently; missing or failing names are left out."""
+        failed = object()
+
+        def access(name):
+            try:
+                return name, self.backend.access(name)
+            except KeyError:
+                return name, None  # <--- Cached as missing, so the environment is used until the TTL ends
+            except Exception as e:
+                self.logger.warning(f"Secret Manager lookup of {name} failed: {e}")
+                return name, failed
+
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as executor:
+            fetched = {name: value for name, value in executor.map(access, names) if value is not failed}
+        now = time.time()
+        with self._lock:
+            self.stats["remote_fetches"] += len(names)
+            for name, value in fetched.items():
+                self._entries[name] = {"value": value, "fetched_at": now}
+                self._failed_until.pop(name, None)
+            for name in set(names) - set(fetched):
+                self._failed_until[name] = now + self.failure_ttl_seconds  # <--- Do not hammer an unreachable backend
+            entries = dict(self._entries)
+        if fetched and self.file_cache:
+            self.file_cache.save(entries)
+        return {name: value for name, value in fetched.items() if value is not None}
+
+    def _refresh_in_background(self, names: list[str]):
+        with self._lock:
+            names = [name for name in names if name not in self._refreshing]
+            self._refreshing.update(names)
+        if not names:
+            return
+
+        def refresh():
+            try:
+                self._fetch(names)
+                with self._lock:
+                    self.stats["background_refreshes"] += len(names)
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(names)
+
+        threading.Thread(target=refresh, name="secret-refresh", daemon=True).start()
+
+    def get_many(self, names, default: str | None = None) -> dict[str, str | None]:
+        """Resolves several secrets with at most one batch of remote lookups."""
+        names = list(dict.fromkeys(names))
+        now = time.time()
+        resolved, expired, refresh_soon, cooling = {}, [], [], []
+        with self._lock:
+            for name in names:
+                entry = self._entries.get(name)
+                age = now - entry["fetched_at"] if entry else None
+                if entry and age < self.ttl_seconds:
+                    if entry["value"] is not None:
+                        resolved[name] = entry["value"]
+                    self.stats["memory_hits"] += 1
+                    if age > self.ttl_seconds - self.refresh_margin_seconds and self._failed_until.get(name, 0.0) <= now:
+                        refresh_soon.append(name)
+                elif self._failed_until.get(name, 0.0) > now:
+                    self.stats["failures_cached"] += 1
+                    cooling.append(name)
+                else:
+                    expired.append(name)
+
+        if self.backend and refresh_soon:
+            self._refresh_in_background(refresh_soon)
+        fetched = set(cooling)
+        if self.backend and expired:
+            fetched.update(expired)
+            resolved.update(self._fetch(expired))
+
+        for name in names:
+            if name in resolved:
+                continue
+            with self._lock:
+                entry = self._entries.get(name)
+            if entry and entry["value"] is not None and name in fetched:
+                self.stats["stale_served"] += 1
+                self.logger.warning(f"Serving stale value of secret {name}")
+                resolved[name] = entry["value"]
+            else:
+                self.stats["env_fallbacks"] += 1
+                resolved[name] = os.getenv(name, default)
+        return resolved
+
+    def get(self, name: str, default: str | None = None) -> str | None:
+        return self.get_many([name], default)[name]
+
+    def export_to_environ(self, names=DEFAULT_SECRET_NAMES):
+        """Resolves names in one batch and sets them in os.environ, for code that still uses os.getenv."""
+        for name, value in self.get_many(names).items():
+            if value is not None:
+                os.environ[name] = value
+
+
+_shared_resolver = None
+_shared_lock = threading.Lock()
+
+
+def get_secret_resolver(logger=None) -> SecretResolver:
+    """
+    Returns the process-wide SecretResolver. Secret Manager is used when
+    SECRETS_PROJECT_ID (or GOOGLE_CLOUD_PROJECT) is set, otherwise only the
+    environment and `.env` are consulted.
+    """
+    global _shared_resolver
+    with _shared_lock:
+        if _shared_resolver is None:
+            load_dotenv()
+            project_id = os.getenv("SECRETS_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+            backend = SecretManagerBackend(project_id) if project_id else None
+            file_cache = EncryptedFileCache(logger) if backend else None
+            _shared_resolver = SecretResolver(logger, backend, file_cache=file_cache)
+            if backend:
+                _shared_resolver.get_many(DEFAULT_SECRET_NAMES)  # <--- One batch for the usual keys
+        return _shared_resolver
+
+
+def get_secret(name: str, default: str | None = None) -> str | None:
+    """Drop-in replacement for os.getenv for credentials."""
+    return get_secret_resolver().get(name, default)
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    fake = LocalSecretManagerFake({name: f"value-of-{name}" for name in DEFAULT_SECRET_NAMES}, latency_seconds=0.05)
+    for run in range(3):
+        resolver = SecretResolver(logger, SecretManagerBackend("local", fake), file_cache=EncryptedFileCache(logger))
+        started = time.perf_counter()
+        resolver.get_many(DEFAULT_SECRET_NAMES)
+        print(f"process {run}: {time.perf_counter() - started:.3f}s, remote calls so far {fake.calls}, stats {resolver.stats}")
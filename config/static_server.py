@@ -0,0 +1,151 @@
+import os
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import structlog
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(PROJECT_ROOT)
+
+from config.artifact_store import ArtifactStore
+from config.logger import setup_logging
+
+RANGE_PATTERN = re.compile(r"bytes=(\d*)-(\d*)$")
+
+
+def parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """
+    Parses a single-range `Range` header into an inclusive (start, end) pair.
+
+    Returns:
+        tuple[int, int] | None: The byte range, or None if the header is not satisfiable.
+    """
+    match = RANGE_PATTERN.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if start == "":
+        if end == "" or int(end) == 0:
+            return None
+        return max(size - int(end), 0), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start > end:
+        return None
+    return start, end
+
+
+def make_handler(store: ArtifactStore, logger):
+    """Builds a request handler class that serves artifacts from `store` by `/<key>.<ext>`."""
+
+    class ArtifactRequestHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.info(f"{self.address_string()} {format % args}")
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def do_GET(self):
+            self._serve(send_body=True)
+
+        def _send_empty(self, status: int, headers: dict | None = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def _serve(self, send_body: bool):
+            key = os.path.splitext(os.path.basename(self.path.split("?", 1)[0]))[0]
+            metadata = store.get_by_key(key)
+            if not metadata:
+                self._send_empty(404)
+                return
+
+            etag = f'"{metadata["etag"]}"'
+            if etag in [tag.strip() for tag in self.headers.get("If-None-Match", "").split(",")]:
+                self._send_empty(304, {"ETag": etag})
+                return
+
+            file_path = os.path.join(store.root_dir, metadata["filename"])
+            size = os.path.getsize(file_path)
+            start, end = 0, size - 1
+            status = 200
+            range_header = self.headers.get("Range")
+            if range_header and self.headers.get("If-Range", etag) == etag:
+                byte_range = parse_range(range_header, size)
+                if byte_range is None:
+                    self._send_empty(416, {"Content-Range": f"bytes */{size}"})
+                    return
+                start, end = byte_range
+                status = 206
+
+            length = end - start + 1 if size else 0
+            self.send_response(status)
+            self.send_header("Content-Type", metadata["content_type"])
+            self.send_header("Content-Length", str(length))
+            self.send_header("ETag", etag)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+            if status == 206:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            self.end_headers()
+
+            if send_body and length:
+                self.wfile.flush()
+                with open(file_path, "rb") as f:
+                    # socket.sendfile uses os.sendfile (zero-copy) where available
+                    self.connection.sendfile(f, offset=start, count=length)
+
+    return ArtifactRequestHandler
+
+
+class StaticServer:
+    """
+    A small threaded HTTP server that serves images from an ArtifactStore
+    with ETag, Range and zero-copy sendfile support.
+    """
+    def __init__(self, logger, store: ArtifactStore, host: str = "127.0.0.1", port: int = 8000):
+        """
+        Initializes the server; port 0 picks a free port.
+        """
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.store = store
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(store, self.logger))
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def url_for(self, metadata: dict, base_url: str | None = None) -> str:
+        """Returns the public URL of an artifact, using `base_url` when served behind a proxy."""
+        return f"{(base_url or self.base_url).rstrip('/')}/{metadata['filename']}"
+
+    def start(self):
+        """Starts serving in a background daemon thread."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.logger.info(f"Static server listening on {self.base_url}")
+
+    def stop(self):
+        """Stops the server and closes its socket."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread:
+            self._thread.join()
+        self.logger.info("Static server stopped")
+
+
+if __name__ == "__main__":
+    setup_logging()
+    logger = structlog.get_logger(__name__)
+    store = ArtifactStore(logger, sys.argv[1] if len(sys.argv) > 1 else "./downloads/artifacts")
+    server = StaticServer(logger, store, port=int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    print(f"Serving {store.root_dir} on {server.base_url}")
+    server.httpd.serve_forever()
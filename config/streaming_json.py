@@ -0,0 +1,84 @@
+import json
+from typing import Callable, Iterable
+import structlog
+
+
+class IncrementalJSONObjectParser:
+    """
+    Finds the first complete top-level JSON object in text that arrives in
+    pieces. Text before the opening brace (backticks, tags, prose) is ignored,
+    and braces inside strings are not counted.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self._position = 0
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> list[str]:
+        """
+        Adds text and returns the source of every top-level object completed by it.
+        """
+        self.buffer += text
+        completed = []
+        while self._position < len(self.buffer):
+            char = self.buffer[self._position]
+            self._position += 1
+            if self._start is None:
+                if char == "{":
+                    self._start = self._position - 1
+                    self._depth = 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    completed.append(self.buffer[self._start:self._position])
+                    self._start = None
+        return completed
+
+
+def first_json_object(chunks: Iterable[str], validate: Callable[[dict], bool] | None = None, logger=None) -> tuple[dict | None, str]:
+    """
+    Consumes text chunks until a complete, valid top-level JSON object is seen.
+    The chunk iterator is closed as soon as that happens, so a streaming
+    response is cancelled instead of generating trailing tokens.
+
+    Args:
+        chunks (Iterable[str]): Text pieces, e.g. from a streaming generation.
+        validate (Callable[[dict], bool] | None, optional): Extra check; objects failing it are skipped.
+        logger: The logger.
+
+    Returns:
+        tuple[dict | None, str]: The parsed object (or None) and the text consumed so far.
+    """
+    logger = logger if logger else structlog.get_logger(__name__)
+    parser = IncrementalJSONObjectParser()
+    iterator = iter(chunks)
+    try:
+        for chunk in iterator:
+            for candidate in parser.feed(chunk or ""):
+                try:
+                    parsed = json.loads(candidate)
+                except json.JSONDecodeError as e:
+                    logger.warning(f"Skipping malformed JSON object in stream: {e}")
+                    continue
+                if isinstance(parsed, dict) and (validate is None or validate(parsed)):
+                    return parsed, parser.buffer
+        return None, parser.buffer
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
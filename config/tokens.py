@@ -0,0 +1,3 @@
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the number of model tokens in text (about 4 characters per token)."""
+    return max(1, len(text) // 4)
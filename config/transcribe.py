@@ -1,23 +1,41 @@
 import os
 import sys
+import time
+import hashlib
 from dotenv import load_dotenv
 import structlog
 from google import genai
+from google.genai import types
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(PROJECT_ROOT)
-from config.logger import setup_logging
+from config.logger import setup_logging, timed
+from config.secret_resolver import get_secret
+from config.rate_limiter import AdmissionController, admitted_call
+from config.results_store import ResultsStore
+from config.manifest import hash_file
+from config.prompts import PromptRegistry, PromptTemplate
 load_dotenv()
 
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate(
+    "transcription", "Transcribe the following audio file, do not include any other information, just the text.",
+    budget_tokens=100  # <--- Text part only, the audio is billed separately
+))
+TRANSCRIPTION_PROMPT = PROMPTS.render("transcription")[0]
+
 class AudioTranscriber:
     """
     A class to handle audio transcription.
     """
-    def __init__(self, logger):
+    def __init__(self, logger, admission: AdmissionController | None = None, results_store: ResultsStore | None = None):
         """
-        Initializes the AudioTranscriber with a logger.
+        Initializes the AudioTranscriber with a logger, an optional admission controller and
+        an optional results store that replaces the sidecar .txt files.
         """
         self.logger = logger if logger else structlog.get_logger(__name__)
+        self.admission = admission
+        self.results_store = results_store
 
     def list_files(self, client):
         logger = self.logger
@@ -61,20 +79,27 @@ class AudioTranscriber:
         logger.info(f"Model name: {model_name}, File path: {file_path}, Save output: {save_output}")
 
         try:
+            started = time.time()
             object = os.path.basename(file_path)
             file = client.files.upload(file=file_path, config={'display_name': object})
             logger.info(f'Uploaded file: {object}')
-            response = client.models.generate_content(
+            response = admitted_call(
+                self.admission, "gemini", model_name,
+                client.models.generate_content,
                 model=model_name,
                 contents=[
-                    "Transcribe the following audio file, do not include any other information, just the text.",
+                    TRANSCRIPTION_PROMPT,
                     file,
                 ]
             )
             logger.info(f'Transcription response: {response.text}')
 
-            if save_output:
-                txt_file_path = os.path.join(os.path.dirname(file_path), f"{object.split('.')[0]}.txt")
+            if self.results_store:
+                self.results_store.add(file_path, hash_file(file_path), "transcribe", response.text, model=model_name,
+                                       started_at=started, duration_seconds=time.time() - started)
+                logger.info(f"Transcription of {file_path} saved to the results store")
+            elif save_output:
+                txt_file_path = os.path.join(os.path.dirname(file_path), f"{os.path.splitext(object)[0]}.txt")
                 with open(f'{txt_file_path}', 'w') as f:
                     f.write(response.text)
                 logger.info(f"Transcription saved to: {txt_file_path}")
@@ -87,6 +112,43 @@ class AudioTranscriber:
             logger.error(f"Error during transcription: {e}")
             return f"Error during transcription: {e}"
 
+    def transcribe_audio_bytes(self, client, data: bytes, name: str, mime_type: str, model_name: str) -> str:
+        """
+        Transcribes in-memory audio, e.g. an archive member, sending it inline without an upload.
+
+        Args:
+            client: The Gemini API client.
+            data (bytes): The encoded audio.
+            name (str): The document name used in logs.
+            mime_type (str): The audio MIME type, e.g. 'audio/mpeg'.
+            model_name (str): The name of the Gemini model to use for transcription.
+
+        Returns:
+            str: The transcribed text, or an error message if transcription fails.
+        """
+        logger = self.logger
+        logger.info(f"Starting transcription for in-memory audio {name}")
+        try:
+            started = time.time()
+            with timed(logger, "transcribe", file=name, model=model_name):
+                response = admitted_call(
+                    self.admission, "gemini", model_name,
+                    client.models.generate_content,
+                    model=model_name,
+                    contents=[
+                        TRANSCRIPTION_PROMPT,
+                        types.Part.from_bytes(data=data, mime_type=mime_type),
+                    ]
+                )
+            logger.info(f'Transcription response for {name}: {response.text}')
+            if self.results_store:
+                self.results_store.add(name, hashlib.sha256(data).hexdigest(), "transcribe", response.text, model=model_name,
+                                       started_at=started, duration_seconds=time.time() - started)
+            return response.text
+        except Exception as e:
+            logger.error(f"Error during transcription of {name}: {e}")
+            return f"Error during transcription: {e}"
+
     def transcribe_audio_directory(self, client, base_path: str, suffix: str, model_name: str, save_output: bool = False) -> dict:
         """
         Processes all audio files in a given directory for transcription.
@@ -122,10 +184,10 @@ if __name__ == "__main__":
     logger = structlog.get_logger(__name__)
     logger.info("Starting the script")
 
-    client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+    client = genai.Client(api_key=get_secret('GEMINI_API_KEY'))
     model_name = "gemini-2.0-flash"
     base_path = "./documents/pliki_z_fabryki"
     suffix = ".mp3"
-    transcriber = AudioTranscriber(logger)
+    transcriber = AudioTranscriber(logger, results_store=ResultsStore(logger))  # <--- `python config/results_store.py export transcribe` writes the .txt files
 
     transcriber.transcribe_audio_directory(client, base_path, suffix, model_name, save_output=True)
\ No newline at end of file
@@ -56,7 +56,16 @@ def download_file(url, filepath, overwrite=False):
         logger.error(f"Error writing file to {filepath}: {e}")
         return False
         
-def transcribe_audio(client, input_file_path, output_file_path):
+TRANSCRIBE_MODEL = 'gemini-2.0-flash-exp'
+TRANSCRIBE_PROMPT = "Transcribe the following audio file"
+
+def transcribe_audio(client, input_file_path, output_file_path, model_name=TRANSCRIBE_MODEL, prompt=TRANSCRIBE_PROMPT):
+    """
+    Transcribes an audio file with Gemini and optionally writes the transcript to `output_file_path`.
+
+    Returns:
+        str | None: The transcript, or None if the file is empty, the response has no text or the call failed.
+    """
     logger.info("Transcribing {input_file_path}", input_file_path=input_file_path)
     try:
         with open(input_file_path, 'rb') as audio_file:
@@ -64,7 +73,7 @@ def transcribe_audio(client, input_file_path, output_file_path):
 
         if not audio_content:  # Check if the file content is empty
             logger.warning("Skipping empty file: {input_file_path}", input_file_path=input_file_path)
-            return  # Skip processing this file
+            return None  # Skip processing this file
 
         audio_path = pathlib.Path(input_file_path)
         audio_path.write_bytes(audio_content)
@@ -72,7 +81,7 @@ def transcribe_audio(client, input_file_path, output_file_path):
         file_upload = client.files.upload(path=audio_path)
 
         response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
+            model=model_name,
             contents=[
                 types.Content(
                     role="user",
@@ -83,13 +92,19 @@ def transcribe_audio(client, input_file_path, output_file_path):
                         )
                     ]
                 ),
-                "Transcribe the following audio file",
+                prompt,
             ]
         )
         logger.info("Transcription response", response_text=response.candidates[-1].content.parts[0].text)
+        if not response.text:
+            logger.warning("Empty transcription of {input_file_path}", input_file_path=input_file_path)
+            return None
 
-        with open(output_file_path, 'w') as text_file:
-            text_file.write(response.text)
-        logger.info("Transcription saved to {output_file_path}", output_file_path=output_file_path)
+        if output_file_path:
+            with open(output_file_path, 'w') as text_file:
+                text_file.write(response.text)
+            logger.info("Transcription saved to {output_file_path}", output_file_path=output_file_path)
+        return response.text
     except Exception as e:
-        logger.error("Error transcribing {input_file_path}", input_file_path=input_file_path, error=str(e))
\ No newline at end of file
+        logger.error("Error transcribing {input_file_path}", input_file_path=input_file_path, error=str(e))
+        return None
\ No newline at end of file
@@ -5,6 +5,7 @@ import requests
 import logging
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
 load_dotenv()
 
 def poligon(task:str):
@@ -15,7 +16,7 @@ def poligon(task:str):
     # Prepare the payload
     payload = {
         "task": task,
-        "apikey": os.getenv('AIDEVS_API_KEY'),
+        "apikey": get_secret('AIDEVS_API_KEY'),
         "answer": data_array
     }
     # Send POST request to verify endpoint
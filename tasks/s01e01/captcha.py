@@ -1,65 +1,209 @@
 import os
+import re
+import sys
+import json
+import html
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import requests
 import logging
 import structlog
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
+from config.hedging import HedgingPolicy
+from config.cascade import ModelCascade, CascadeExhausted
+from config.prompts import PromptRegistry, PromptTemplate
 from bs4 import BeautifulSoup
-from openai import OpenAI
+from openai import OpenAI, NOT_GIVEN
 
 load_dotenv()
 
 setup_logging()
 logger = structlog.get_logger(__name__)
 
-def solve_captcha(question):
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY')
-    )
-
-    response = client.chat.completions.create(
-        model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "You are a helpful assistant that provides precise, numeric answers to historical questions."},
-            {"role": "user", "content": f"What is the numeric answer to this question: {question}? Respond ONLY with the number."}
-        ],
-        max_tokens=10,
-        temperature=0.2  # Low temperature for more precise answers
-    )
-    
-    answer = response.choices[0].message.content.strip()
+LOGIN_URL = 'https://xyz.ag3nts.org/'
+MEMO_PATH = os.path.join('downloads', 'captcha_memo.json')
+QUESTION_PATTERN = re.compile(r'<p[^>]*\bid=["\']human-question["\'][^>]*>(.*?)</p>', re.IGNORECASE | re.DOTALL)
+TAG_PATTERN = re.compile(r'<[^>]+>')
 
-    return int(answer)
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate(
+    "captcha_system", "You are a helpful assistant that provides precise, numeric answers to historical questions.",
+    budget_tokens=50, model="gpt-3.5-turbo"
+))
+PROMPTS.register(PromptTemplate(
+    "captcha", "What is the numeric answer to this question: $question? Respond ONLY with the number.",
+    budget_tokens=200, model="gpt-3.5-turbo"  # <--- Captcha questions are one short sentence
+))
 
+_openai_client = None
 
-def login():
-    url = 'https://xyz.ag3nts.org/'
-    
-    session = requests.Session()
-    
-    response = session.get(url)
-    
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Dynamically extract the captcha question
-    captcha_question_element = soup.find('p', id='human-question')
-    if captcha_question_element:
-        captcha_question = captcha_question_element.text.replace('Question:\n', '').strip()
+def get_openai_client():
+    """Returns a shared OpenAI client so the connection pool stays warm between solves."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = OpenAI(
+            api_key=get_secret('OPENAI_API_KEY')
+        )
+    return _openai_client
+
+def extract_question(page_html):
+    """
+    Extracts the captcha question from p#human-question.
+    Uses a regex over the raw HTML and only falls back to BeautifulSoup if it does not match.
+    """
+    match = QUESTION_PATTERN.search(page_html)
+    if match:
+        text = html.unescape(TAG_PATTERN.sub('', match.group(1)))
     else:
-        print("Captcha question not found")
-        return None
-    
-    captcha_answer = solve_captcha(captcha_question)
-    
-    login_payload = {
-        'username': 'tester',
-        'password': '574e112a',
-        'answer': captcha_answer
-    }
-    
-    login_response = session.post(url, data=login_payload)
-    
-    print(f"login_response: \n\n {login_response.text}")
+        element = BeautifulSoup(page_html, 'html.parser').find('p', id='human-question')
+        if not element:
+            return None
+        text = element.text
+    return text.replace('Question:', '', 1).strip()
+
+def normalize_question(question):
+    """Lowercases the question and drops punctuation and repeated whitespace, so memo keys are stable."""
+    question = re.sub(r'[^\w\s]', ' ', question.lower())
+    return ' '.join(question.split())
+
+def load_memo(path=MEMO_PATH):
+    """Loads the question -> answer memo from disk, or returns an empty one."""
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def save_memo(memo, path=MEMO_PATH):
+    """Writes the memo atomically, so an interrupted run never leaves a broken file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(memo, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def parse_captcha_answer(text):
+    """Parses the model's answer as an integer; raises ValueError for anything else."""
+    return int(text.strip())
+
+def solve_captcha(question, memo=None, hedging=None, cascade=None):
+    """
+    Answers the captcha question, from the memo when possible. The memo is
+    only read here; `login` stores an answer once the server accepts it.
+    With a HedgingPolicy the completion is re-sent if it is slower than usual and the first answer wins.
+    With a ModelCascade the cheapest "captcha" tier is asked first and a non-integer answer escalates.
+    """
+    if memo is not None:
+        key = normalize_question(question)
+        if key in memo:
+            logger.info(f"Captcha answer taken from memo: {question} -> {memo[key]}")
+            return memo[key]
+
+    client = get_openai_client()
+    system_prompt, system_tokens = PROMPTS.render("captcha_system")
+    user_prompt, user_tokens = PROMPTS.render("captcha", question=question)
+    PROMPTS.record("captcha", system_tokens + user_tokens)
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt}
+    ]
+
+    attempt_timeout = hedging.attempt_timeout() if hedging else None
+
+    def complete(model="gpt-3.5-turbo"):
+        def create():
+            return client.chat.completions.create(
+                model=model,
+                messages=messages,
+                max_tokens=10,
+                temperature=0.2,  # Low temperature for more precise answers
+                timeout=attempt_timeout or NOT_GIVEN  # <--- A losing hedge gives up at the budget
+            )
+        response = hedging.call(f"captcha:{model}", create) if hedging else create()
+        return response.choices[0].message.content
+
+    if cascade:
+        answer, _ = cascade.run("captcha", lambda tier: complete(tier.model), parse_captcha_answer,
+                                input_tokens=system_tokens + user_tokens)
+    else:
+        answer = parse_captcha_answer(complete())
+
+    return answer
+
+def fetch_question_page(session):
+    """Fetches the login page and returns the session it was fetched with together with its HTML."""
+    response = session.get(LOGIN_URL)
+    response.raise_for_status()
+    return session, response.text
+
+def login(attempts=3, prefetch=True, hedging=None, cascade=None):
+    """
+    Logs in by solving the captcha, retrying up to `attempts` times.
+
+    With `prefetch` enabled the next question page is requested on a second
+    warm session while the current answer is being solved and submitted, so a
+    failed attempt can retry without waiting for another page load.
+    An optional HedgingPolicy and ModelCascade are passed on to `solve_captcha`.
+
+    Returns:
+        requests.Response | None: The last login response, or None if no question could be found or answered.
+    """
+    sessions = [requests.Session(), requests.Session()]
+    memo = load_memo()
+    login_response = None
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        page_future = executor.submit(fetch_question_page, sessions[0])
+        for attempt in range(1, attempts + 1):
+            started = time.perf_counter()
+            session, page_html = page_future.result()
+
+            if prefetch and attempt < attempts:
+                next_session = sessions[attempt % 2]
+                page_future = executor.submit(fetch_question_page, next_session)
+
+            # Dynamically extract the captcha question
+            captcha_question = extract_question(page_html)
+            if not captcha_question:
+                print("Captcha question not found")
+                return login_response
+
+            try:
+                captcha_answer = solve_captcha(captcha_question, memo, hedging, cascade)
+            except (ValueError, CascadeExhausted) as e:  # <--- No numeric answer: move on to the next question
+                logger.warning(f"Login attempt {attempt}: no answer to {captcha_question!r}: {e}")
+                print(f"Attempt {attempt}: no numeric answer, skipping the question")
+                if not prefetch and attempt < attempts:
+                    page_future = executor.submit(fetch_question_page, session)
+                continue
+
+            login_payload = {
+                'username': 'tester',
+                'password': '574e112a',
+                'answer': captcha_answer
+            }
+
+            login_response = session.post(LOGIN_URL, data=login_payload)
+            elapsed = time.perf_counter() - started
+            succeeded = login_response.ok and 'human-question' not in login_response.text
+            logger.info(f"Login attempt {attempt}: question={captcha_question!r}, answer={captcha_answer}, "
+                        f"success={succeeded}, latency={elapsed:.3f}s")
+            print(f"Attempt {attempt}: {elapsed:.3f}s, success={succeeded}")
+
+            key = normalize_question(captcha_question)
+            if succeeded:
+                memo[key] = captcha_answer  # <--- Only answers the server accepted are remembered
+                save_memo(memo)
+                break
+            if memo.pop(key, None) is not None:
+                save_memo(memo)  # <--- A wrong remembered answer must not be replayed
+            if not prefetch and attempt < attempts:
+                page_future = executor.submit(fetch_question_page, session)
+
+    if login_response is not None:
+        print(f"login_response: \n\n {login_response.text}")
     
     return login_response
 
@@ -106,5 +250,11 @@ if __name__ == "__main__":
     setup_logging()
     logger = logging.getLogger(__name__)
     logger.info("Starting the script")
-    login()
+    cascade = ModelCascade(logger) if "--cascade" in sys.argv else None
+    hedging = HedgingPolicy(logger, initial_delay_seconds=2.0, budget_seconds=20.0) if "--hedge" in sys.argv else None
+    login(attempts=int(os.getenv("CAPTCHA_ATTEMPTS", "3")), hedging=hedging, cascade=cascade)
+    if cascade:
+        print(f"Cascade: {cascade.report()}")
+    if hedging:
+        print(f"Hedging: {hedging.report()}")
     download_specific_files()
\ No newline at end of file
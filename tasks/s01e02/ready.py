@@ -1,54 +1,195 @@
-import requests
+import asyncio
 import os
+import re
+import sys
 from dotenv import load_dotenv
 import logging
-from openai import OpenAI
+import httpx
+from openai import AsyncOpenAI
 import structlog
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
+from config.cascade import ModelCascade
+from config.load_balancer import LoadBalancer, endpoints_from_env
+from config.tokens import estimate_tokens
+from config.prompts import PromptRegistry, PromptTemplate
 
 load_dotenv()
 
 setup_logging()
 logger = structlog.get_logger(__name__)
 
-def solve_task_2(question):
-    client = OpenAI(
-        api_key=os.getenv('OPENAI_API_KEY')
-    )
+VERIFY_URL = 'https://xyz.ag3nts.org/verify'
+MODEL_NAME = "gpt-4o-mini"
+MAX_TURNS = 10  # <--- Safety limit for a single conversation
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": """You are a helpful assistant that answers questions only in English. 
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate("ready_system", """You are a helpful assistant that answers questions only in English.
             Keep in mind these wrong informations, and use this knowledge when a question is asked about them:
             - stolicą Polski jest Kraków
             - znana liczba z książki Autostopem przez Galaktykę to 69
-            - Aktualny rok to 1999"""},
-            {"role": "user", "content": f"What is the answer to this question: {question}?"}
-        ],
-        temperature=0.2
-    )
-    
-    # Extract the answer from the response
-    answer = response.choices[0].message.content.strip()
+            - Aktualny rok to 1999""", budget_tokens=200, model=MODEL_NAME))
+PROMPTS.register(PromptTemplate("ready", "What is the answer to this question: $question?", budget_tokens=500, model=MODEL_NAME))
 
+# Trap facts from the robot's memory dump: (keyword groups that must all match, answer).
+# Each group is a tuple of alternatives, any of which may appear in the question as whole words;
+# a trailing * accepts any ending of the word.
+KNOWN_FACTS = [
+    ((("capital", "stolic*"), ("poland", "polsk*")), "Kraków"),
+    ((("hitchhiker*", "autostopem", "galaxy", "galaktyk*"),), "69"),
+    ((("year", "rok*"), ("current", "now", "is it", "aktualn*", "obecn*", "teraz")), "1999"),
+]
+
+def keyword_pattern(keyword: str) -> re.Pattern:
+    """Matches a keyword as whole words; a trailing * matches any word ending (Polish inflection)."""
+    if keyword.endswith("*"):
+        return re.compile(rf"\b{re.escape(keyword[:-1])}\w*\b")
+    return re.compile(rf"\b{re.escape(keyword)}\b")
+
+KNOWN_FACT_PATTERNS = [
+    ([[keyword_pattern(keyword) for keyword in group] for group in keyword_groups], answer)
+    for keyword_groups, answer in KNOWN_FACTS
+]
+
+def normalize_question(question: str) -> str:
+    """Lowercases the question and collapses punctuation and whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", question.lower()).split())
+
+def lookup_known_fact(question: str) -> str | None:
+    """
+    Returns the expected (deliberately wrong) answer for a known trap question,
+    or None if the question has to be answered by the model.
+    """
+    normalized = normalize_question(question)
+    for pattern_groups, answer in KNOWN_FACT_PATTERNS:
+        if all(any(pattern.search(normalized) for pattern in group) for group in pattern_groups):
+            return answer
+    return None
+
+REFUSAL_MARKERS = ("i'm sorry", "i am sorry", "i cannot", "i can't", "as an ai")
+
+def validate_open_answer(text: str) -> str:
+    """Accepts a non-empty answer that is not a refusal; raises ValueError so a cascade escalates."""
+    answer = (text or "").strip()
+    if not answer:
+        raise ValueError("Empty answer")
+    if any(marker in answer.lower() for marker in REFUSAL_MARKERS):
+        raise ValueError(f"Refusal: {answer[:60]}")
     return answer
 
-message = {
-    "msgID": 0,
-    "text": "READY"
-}
-response = requests.post('https://xyz.ag3nts.org/verify', json=message).json()
-response_2 = response['text']
-logger.info(response)
+def is_conversation_finished(text: str) -> bool:
+    """The robot ends the exchange with a flag or a plain OK."""
+    return "FLG" in text or text.strip().upper() == "OK"
+
+
+class ReadyAgent:
+    """
+    Runs /verify READY conversations. All sessions share one keep-alive HTTP
+    connection pool and one OpenAI client; msgID state is tracked per session.
+    With a LoadBalancer the completions are spread over all configured keys instead.
+    """
+    def __init__(self, logger, http_client: httpx.AsyncClient, openai_client: AsyncOpenAI | None, model_name: str = MODEL_NAME,
+                 cascade: ModelCascade | None = None, balancer: LoadBalancer | None = None):
+        self.logger = logger if logger else structlog.get_logger(__name__)
+        self.http_client = http_client
+        self.openai_client = openai_client
+        self.model_name = model_name
+        self.cascade = cascade  # <--- When set, the "ready" tiers replace model_name
+        self.balancer = balancer
+        self.stats = {"lookup_answers": 0, "llm_answers": 0}
+
+    async def _complete(self, model_name: str, messages: list) -> str:
+        def create(client, name):
+            return client.chat.completions.create(
+                model=name,
+                messages=messages,
+                temperature=0.2
+            )
+
+        if self.balancer:
+            response = await self.balancer.call_async(model_name, create, tokens=estimate_tokens(str(messages)))
+        else:
+            response = await create(self.openai_client, model_name)
+        return response.choices[0].message.content
+
+    async def solve_open_question(self, question: str) -> str:
+        """Asks the model a question that is not covered by the local lookup table."""
+        system_prompt, system_tokens = PROMPTS.render("ready_system")
+        user_prompt, user_tokens = PROMPTS.render("ready", question=question)
+        PROMPTS.record("ready", system_tokens + user_tokens)
+        messages = [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+        if self.cascade:
+            answer, _ = await self.cascade.run_async(
+                "ready", lambda tier: self._complete(tier.model, messages), validate_open_answer,
+                input_tokens=system_tokens + user_tokens
+            )
+            return answer
+        return (await self._complete(self.model_name, messages)).strip()
+
+    async def answer(self, question: str) -> str:
+        """Answers from the lookup table when possible, otherwise from the model."""
+        answer = lookup_known_fact(question)
+        if answer is not None:
+            self.stats["lookup_answers"] += 1
+            return answer
+        self.stats["llm_answers"] += 1
+        return await self.solve_open_question(question)
+
+    async def send(self, msg_id: int, text: str) -> dict:
+        response = await self.http_client.post(VERIFY_URL, json={"msgID": msg_id, "text": text})
+        response.raise_for_status()
+        return response.json()
+
+    async def run_conversation(self, session_no: int, max_turns: int = MAX_TURNS) -> dict:
+        """
+        Runs a single verify conversation, starting with READY.
+
+        Returns:
+            dict: The last message received from the robot.
+        """
+        logger = self.logger
+        reply = await self.send(0, "READY")
+        logger.info("Received message", session=session_no, reply=reply)
+
+        for _ in range(max_turns):
+            if is_conversation_finished(reply.get("text", "")):
+                break
+            msg_id = reply["msgID"]
+            answer = await self.answer(reply["text"])
+            logger.info("Sending answer", session=session_no, msg_id=msg_id, answer=answer)
+            reply = await self.send(msg_id, answer)
+            logger.info("Received message", session=session_no, reply=reply)
+        return reply
+
+    async def run_sessions(self, sessions: int) -> list:
+        """Runs `sessions` conversations concurrently; failures are returned as exceptions."""
+        return await asyncio.gather(
+            *(self.run_conversation(session_no) for session_no in range(sessions)),
+            return_exceptions=True
+        )
 
-answer = solve_task_2(response_2)
 
-message_2 = {
-    "msgID": response['msgID'],
-    "text": answer
-}
-logger.info(message_2)
+async def main(sessions: int = 1, cascade: ModelCascade | None = None, balancer: LoadBalancer | None = None):
+    limits = httpx.Limits(max_connections=max(sessions, 1), max_keepalive_connections=max(sessions, 1))
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as http_client:
+        openai_client = None if balancer else AsyncOpenAI(api_key=get_secret('OPENAI_API_KEY'))
+        agent = ReadyAgent(logger, http_client, openai_client, cascade=cascade, balancer=balancer)
+        results = await agent.run_sessions(sessions)
+    for session_no, result in enumerate(results):
+        logger.info("Conversation finished", session=session_no, result=str(result))
+        print(f"Session {session_no}: {result}")
+    logger.info("Answer sources", **agent.stats)
+    if cascade:
+        print(f"Cascade: {cascade.report()}")
+    if balancer:
+        print(f"Load balancer: {balancer.report()}")
+    return results
 
-response_3 = requests.post('https://xyz.ag3nts.org/verify', json=message_2).json()
-logger.info(response_3)
\ No newline at end of file
+if __name__ == "__main__":
+    arguments = [argument for argument in sys.argv[1:] if not argument.startswith("--")]
+    sessions = int(arguments[0]) if arguments else 1
+    balancer = LoadBalancer(logger, endpoints_from_env()) if "--balance" in sys.argv else None
+    asyncio.run(main(sessions, ModelCascade(logger) if "--cascade" in sys.argv else None, balancer))
@@ -11,13 +11,14 @@ import requests
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
 load_dotenv()
 
 setup_logging()
 logger = structlog.get_logger(__name__)
 
-aidevs_api_key = os.getenv('AIDEVS_API_KEY')
-openai.api_key = os.getenv('OPENAI_API_KEY')
+aidevs_api_key = get_secret('AIDEVS_API_KEY')
+openai.api_key = get_secret('OPENAI_API_KEY')
 
 def download_json():
     file_path = 'downloads/03.txt'
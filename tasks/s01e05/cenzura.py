@@ -1,5 +1,7 @@
 import os
+import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import structlog
 import logging
@@ -7,7 +9,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from google import genai
 from google.genai import types
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
 from config.utils import send_answer, download_file
+from config.tokens import estimate_tokens
+from config.prompts import PromptRegistry, PromptTemplate
 
 from config.logger import setup_logging
 
@@ -17,58 +22,185 @@ setup_logging()
 logger = structlog.get_logger(__name__)
 logger.info("Starting the script")
 
-client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-AIDEVS_API_KEY = os.getenv('AIDEVS_API_KEY')
 download_directory = "downloads"
 filename = "cenzura.txt"
 filepath = os.path.join(download_directory, filename)
 
-# Create the downloads directory if it doesn't exist
-os.makedirs(download_directory, exist_ok=True)
-
-# Construct the download URL using the API key
-download_url = f"https://centrala.ag3nts.org/data/{AIDEVS_API_KEY}/{filename}"
-
-# Download the file
-if download_file(download_url, filepath, overwrite=True):
-    try:
-        logger.info(f"Reading content from: {filepath}")
-        with open(filepath, 'r') as f:
-            content = f.read()
-        logger.info(f"Successfully read {len(content)} characters from {filepath}")
-    except FileNotFoundError:
-        logger.error(f"File not found: {filepath}")
-        content = None
-    except Exception as e:
-        logger.error(f"Error reading file {filepath}: {e}")
-        content = None
-else:
-    logger.warning("Skipping redaction due to download failure.")
-    content = None
-print(content)
-if content:
-    system_message = """Replace all sensitive data (full names, street names + numbers, cities, person's age) with the word CENZURA.
-    Maintain all punctuation, spaces, etc. Do not rephrase or add anything to the text. The full name and street name should be replaced with the word CENZURA."""
-
-    try:
-        logger.info("Sending content to Gemini API for redaction.")
-        response = client.models.generate_content(
-            model='gemini-2.0-flash-exp',
-            contents=content,
-            config=types.GenerateContentConfig(
-                system_instruction=system_message
-            )
+REDACTION_TOKEN = "CENZURA"
+MODEL_NAME = 'gemini-2.0-flash-exp'
+CHUNK_TOKEN_BUDGET = 512  # <--- Approximate tokens per chunk sent to the model
+CHUNKED_THRESHOLD_CHARS = 4000  # <--- Inputs longer than this are redacted in chunks
+MAX_WORKERS = 4  # <--- Upper bound on concurrent Gemini requests
+MAX_ATTEMPTS = 3  # <--- Retries per chunk when verification fails
+ABBREVIATIONS = {"ul", "al", "pl", "nr", "os", "np", "dr", "prof", "tel", "im", "ok", "św", "godz", "tj"}
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+\s+(?=[A-ZĄĆĘŁŃÓŚŹŻ])')
+
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate("cenzura", """Replace all sensitive data (full names, street names + numbers, cities, person's age) with the word CENZURA.
+    Maintain all punctuation, spaces, etc. Do not rephrase or add anything to the text. The full name and street name should be replaced with the word CENZURA.""",
+    budget_tokens=2048  # <--- Unchunked inputs are at most CHUNKED_THRESHOLD_CHARS, about 1000 tokens
+))
+
+def split_into_sentences(text: str) -> list[str]:
+    """
+    Splits text where ".", "!" or "?" is followed by whitespace and a capital
+    letter, except after abbreviations (ul., nr, ...) and initials. Trailing
+    whitespace stays attached, so ''.join(sentences) == text.
+    """
+    sentences, start = [], 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        word = re.search(r'(\w+)\W*$', text[start:match.start() + 1])
+        if word and text[match.start()] == "." and (word.group(1).lower() in ABBREVIATIONS or len(word.group(1)) == 1):
+            continue
+        sentences.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text):
+        sentences.append(text[start:])
+    return sentences
+
+def split_into_chunks(text: str, token_budget: int = CHUNK_TOKEN_BUDGET) -> list[str]:
+    """
+    Groups whole sentences into chunks that stay within the token budget.
+    A single sentence longer than the budget becomes its own chunk.
+
+    Args:
+        text (str): The text to split.
+        token_budget (int, optional): Approximate maximum number of tokens per chunk.
+
+    Returns:
+        list[str]: Chunks in original order; ''.join(chunks) == text.
+    """
+    chunks = []
+    current = ""
+    for sentence in split_into_sentences(text):
+        if current and estimate_tokens(current + sentence) > token_budget:
+            chunks.append(current)
+            current = ""
+        current += sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
+def verify_redaction(original: str, redacted: str) -> bool:
+    """
+    Checks that the redacted text differs from the original only where
+    CENZURA was inserted, i.e. every span outside the redactions is unchanged
+    and every CENZURA replaced at least one character. The literal spans are
+    located left to right, so the check is linear in the length of a chunk.
+    """
+    parts = redacted.split(REDACTION_TOKEN)
+    if len(parts) == 1:
+        return redacted == original
+    if not original.startswith(parts[0]) or not original.endswith(parts[-1]):
+        return False
+    position = len(parts[0])
+    for part in parts[1:-1]:
+        found = original.find(part, position + 1)  # <--- The redaction before it covers at least one character
+        if found < 0:
+            return False
+        position = found + len(part)
+    return len(original) - len(parts[-1]) > position
+
+def redact_text(client, text: str) -> str:
+    """Sends a single piece of text to Gemini for redaction and returns the stripped result."""
+    system_message, tokens = PROMPTS.render("cenzura", text)
+    PROMPTS.record("cenzura", tokens)
+    response = client.models.generate_content(
+        model=MODEL_NAME,
+        contents=text,
+        config=types.GenerateContentConfig(
+            system_instruction=system_message
         )
-        logger.info("Received response from Gemini API.")
-        stripped_response = response.text.strip()
-        logger.info(stripped_response)
-    except Exception as e:
-        logger.error(f"Error communicating with Gemini API: {e}")
-        response = None
+    )
+    return response.text.strip()
+
+def redact_chunk(client, index: int, chunk: str) -> str:
+    """
+    Redacts one chunk, retrying until the result passes verification.
+    Leading and trailing whitespace is kept locally, so the model never has to reproduce it.
+
+    Raises:
+        ValueError: If no attempt produced a redaction that passes verification.
+    """
+    body = chunk.strip()
+    if not body:
+        return chunk
+    leading = chunk[:len(chunk) - len(chunk.lstrip())]
+    trailing = chunk[len(chunk.rstrip()):]
+
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        redacted = redact_text(client, body)
+        if verify_redaction(body, redacted):
+            logger.info("Chunk redacted", chunk_index=index, attempt=attempt, chars=len(body))
+            return leading + redacted + trailing
+        logger.warning("Chunk failed verification, retrying", chunk_index=index, attempt=attempt)
+    raise ValueError(f"Chunk {index} could not be redacted without altering non-sensitive text")
+
+def redact_chunked(client, text: str, token_budget: int = CHUNK_TOKEN_BUDGET, max_workers: int = MAX_WORKERS) -> str:
+    """
+    Redacts large text by splitting it into sentence-aligned chunks and
+    processing them concurrently with bounded parallelism. Every chunk is
+    verified against its own original in `redact_chunk`.
+
+    Args:
+        client: The Gemini API client.
+        text (str): The text to redact.
+        token_budget (int, optional): Approximate maximum number of tokens per chunk.
+        max_workers (int, optional): Maximum number of concurrent Gemini requests.
+
+    Returns:
+        str: The redacted text, reassembled in the original order.
+    """
+    chunks = split_into_chunks(text, token_budget)
+    logger.info("Redacting in chunks", chunks=len(chunks), token_budget=token_budget, max_workers=max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        redacted_chunks = list(executor.map(lambda item: redact_chunk(client, *item), enumerate(chunks)))
+    return "".join(redacted_chunks)
 
 if __name__ == "__main__":
+    client = genai.Client(api_key=get_secret('GEMINI_API_KEY'))
+    AIDEVS_API_KEY = get_secret('AIDEVS_API_KEY')
+
+    # Create the downloads directory if it doesn't exist
+    os.makedirs(download_directory, exist_ok=True)
+
+    # Construct the download URL using the API key
+    download_url = f"https://centrala.ag3nts.org/data/{AIDEVS_API_KEY}/{filename}"
+
+    # Download the file
+    if download_file(download_url, filepath, overwrite=True):
+        try:
+            logger.info(f"Reading content from: {filepath}")
+            with open(filepath, 'r') as f:
+                content = f.read()
+            logger.info(f"Successfully read {len(content)} characters from {filepath}")
+        except FileNotFoundError:
+            logger.error(f"File not found: {filepath}")
+            content = None
+        except Exception as e:
+            logger.error(f"Error reading file {filepath}: {e}")
+            content = None
+    else:
+        logger.warning("Skipping redaction due to download failure.")
+        content = None
+    print(content)
+    chunked_mode = "--chunked" in sys.argv or (content is not None and len(content) > CHUNKED_THRESHOLD_CHARS)
+    stripped_response = None
+    if content:
+        try:
+            logger.info("Sending content to Gemini API for redaction.", chunked=chunked_mode)
+            if chunked_mode:
+                stripped_response = redact_chunked(client, content).strip()
+            else:
+                stripped_response = redact_text(client, content)
+            logger.info("Received response from Gemini API.")
+            logger.info(stripped_response)
+        except Exception as e:
+            logger.error(f"Error communicating with Gemini API: {e}")
+            stripped_response = None
+
     task = "CENZURA"
-    if response:
+    if stripped_response:
         try:
             logger.info(f"Sending answer for task '{task}' to AIDEV's API.")
             print(stripped_response)
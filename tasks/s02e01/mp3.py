@@ -1,13 +1,19 @@
 import os
 import sys
+import time
 from dotenv import load_dotenv
 import structlog
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from google import genai
 from google.genai import types
-from config.utils import send_answer, transcribe_audio
+from config.utils import send_answer, transcribe_audio, TRANSCRIBE_MODEL, TRANSCRIBE_PROMPT
+from config.retrieval import BM25Index
+from config.manifest import Manifest, hash_file, hash_text
+from config.results_store import ResultsStore
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
+from config.prompts import PromptRegistry, PromptTemplate
 load_dotenv()
 
 setup_logging()
@@ -15,60 +21,132 @@ setup_logging()
 logger = structlog.get_logger(__name__)
 logger.info("Starting the script")
 
-client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-AIDEVS_API_KEY = os.getenv('AIDEVS_API_KEY')
+client = genai.Client(api_key=get_secret('GEMINI_API_KEY'))
+AIDEVS_API_KEY = get_secret('AIDEVS_API_KEY')
 
 input_dir = "./documents/przesluchania"
-output_dir = "./downloads/audio"
-
+output_dir = "./downloads/audio"  # <--- Transcripts of earlier runs, imported into the results store
+context_sources = ["./documents/pliki_z_fabryki/facts", "./documents/pliki_z_fabryki"]
+context_path = "./downloads/mp3_context.txt"
+answer_path = "./downloads/mp3_answer.txt"
+manifest = Manifest(logger, "./downloads/mp3_manifest.json")
+store = ResultsStore(logger)
+skipped_stages = []
+
+question = "Na jakiej ulicy znajduje się uczelnia, na której wykłada Andrzej Maj?"
+answer_model = 'gemini-2.0-flash-exp'
+context_token_budget = 2000  # <--- Maximum number of context tokens sent to Gemini
+PROMPTS = PromptRegistry(logger)
+PROMPTS.register(PromptTemplate(
+    "mp3_answer", "Odpowiedz zwięźle na pytanie: na jakiej ulicy znajduje się uczelnia, na której wykłada Andrzej Maj?",
+    budget_tokens=context_token_budget + 200  # <--- The selected passages plus the instruction
+))
+
+# Stage 1: transcribe every recording whose content, model or prompt changed
 logger.info("Processing files in {input_dir}", input_dir=input_dir)
 
-# Process each file in the input directory
-for filename in os.listdir(input_dir):
+transcribed = 0
+transcribe_params = hash_text(TRANSCRIBE_PROMPT)
+recordings = {}  # <--- Recordings currently in input_dir: path -> content hash
+for filename in sorted(os.listdir(input_dir)):
     if filename.endswith('.m4a'):  # Only process m4a files
         input_filepath = os.path.join(input_dir, filename)
-        output_filename = os.path.splitext(filename)[0] + ".txt"
-        output_filepath = os.path.join(output_dir, output_filename)
-
-        if os.path.exists(output_filepath):
-            logger.info("Output file already exists for {input_filepath}. Skipping.", input_filepath=input_filepath)
+        source_hash = hash_file(input_filepath)
+        recordings[input_filepath] = source_hash
+        known = store.latest(source_hash, "transcribe", TRANSCRIBE_MODEL, transcribe_params)
+        if known:
+            if known["source_path"] != input_filepath:  # <--- Same recording under a new name
+                store.add(input_filepath, source_hash, "transcribe", known["text"], model=TRANSCRIBE_MODEL, params_hash=transcribe_params)
+            logger.info("Transcription is up to date for {input_filepath}. Skipping.", input_filepath=input_filepath)
+            continue
+
+        legacy_path = os.path.join(output_dir, os.path.splitext(filename)[0] + ".txt")
+        legacy_inputs = {"source_hash": source_hash, "model": TRANSCRIBE_MODEL, "prompt": TRANSCRIBE_PROMPT}
+        if manifest.is_fresh(f"transcribe:{filename}", legacy_inputs, legacy_path) and os.path.getsize(legacy_path):
+            with open(legacy_path, 'r') as f:
+                store.add(input_filepath, source_hash, "transcribe", f.read(), model=TRANSCRIBE_MODEL, params_hash=transcribe_params)
+            logger.info("Imported transcription of {input_filepath} from {legacy_path}", input_filepath=input_filepath, legacy_path=legacy_path)
+            continue
+
+        started = time.time()
+        text = transcribe_audio(client, input_filepath, None)
+        if text:
+            store.add(input_filepath, source_hash, "transcribe", text, model=TRANSCRIBE_MODEL, params_hash=transcribe_params,
+                      started_at=started, duration_seconds=time.time() - started)
+            transcribed += 1
         else:
-            transcribe_audio(client, input_filepath, output_filepath)
+            logger.error("Transcription of {input_filepath} failed, it will be retried on the next run", input_filepath=input_filepath)
 
+if not transcribed:
+    skipped_stages.append("transcribe")
 logger.info("Finished processing files.")
 
-system_instruction = "Odpowiedz zwięźle na pytanie: na jakiej ulicy znajduje się uczelnia, na której wykłada Andrzej Maj?"
-
-all_transcribed_text = []
-
-# Read the content of each transcribed file
-for filename in os.listdir(output_dir):
-    if filename.endswith('.txt'):
-        filepath = os.path.join(output_dir, filename)
-        logger.info("Reading transcribed file: {filepath}", filepath=filepath)
-        try:
-            with open(filepath, 'r') as f:
-                transcribed_text = f.read()
-                all_transcribed_text.append(transcribed_text)
-        except Exception as e:
-            logger.error("Error reading file {filepath}: {error}", filepath=filepath, error=str(e))
-
-# Join all the transcribed text together
-combined_transcribed_text = "\n".join(all_transcribed_text)
+# Stage 2: select the passages relevant to the question instead of sending every transcript
+# Only transcripts of the recordings in input_dir, with the current model and prompt, go into the index
+transcripts = {}
+for input_filepath, source_hash in recordings.items():
+    known = store.latest(source_hash, "transcribe", TRANSCRIBE_MODEL, transcribe_params)
+    if known:
+        transcripts[input_filepath] = known["text"]
+index = BM25Index(logger)
+index.update(context_sources, texts=transcripts)
+context_inputs = {
+    "sources": {path: index.documents[path].get("hash") or hash_file(path) for path in sorted(index.documents)},
+    "question": question,
+    "token_budget": context_token_budget,
+}
+
+if manifest.is_fresh("combine", context_inputs, context_path):
+    skipped_stages.append("combine")
+    with open(context_path, 'r') as f:
+        combined_transcribed_text = f.read()
+else:
+    passages = index.query(question, top_k=10, token_budget=context_token_budget)
+    for passage in passages:
+        logger.info("Selected passage from {path} with score {score}", path=passage["path"], score=passage["score"])
+
+    # Join the selected passages together
+    combined_transcribed_text = "\n\n".join(passage["text"] for passage in passages)
+    with open(context_path, 'w') as f:
+        f.write(combined_transcribed_text)
+    manifest.record("combine", context_inputs, context_path)
 logger.info("Combined transcribed text {combined_transcribed_text}", combined_transcribed_text=combined_transcribed_text)
 
-try:
-    response = client.models.generate_content(
-        model='gemini-2.0-flash-exp',
-        config=types.GenerateContentConfig(
-            system_instruction=system_instruction
-        ),
-        contents=[combined_transcribed_text] # Send the combined text
-    )
-    logger.info("Gemini response: {response}", response=response.candidates[0].content.parts[0].text)
-    send_answer("MP3", AIDEVS_API_KEY, response.candidates[0].content.parts[0].text) # Send the text response
-
-except Exception as e:
-    logger.error("Error generating content with Gemini: {error}", error=str(e))
-
-logger.info("Finished processing transcribed files.")
\ No newline at end of file
+# Stage 3: ask Gemini only when the context, model or instruction changed
+system_instruction, prompt_tokens = PROMPTS.render("mp3_answer", combined_transcribed_text)
+ask_inputs = {
+    "context_hash": manifest.output_hash("combine"),
+    "model": answer_model,
+    "system_instruction": system_instruction,
+}
+
+answer = None
+if manifest.is_fresh("ask", ask_inputs, answer_path):
+    skipped_stages.append("ask")
+    with open(answer_path, 'r') as f:
+        answer = f.read()
+else:
+    try:
+        PROMPTS.record("mp3_answer", prompt_tokens)
+        response = client.models.generate_content(
+            model=answer_model,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction
+            ),
+            contents=[combined_transcribed_text] # Send the combined text
+        )
+        answer = response.candidates[0].content.parts[0].text
+        with open(answer_path, 'w') as f:
+            f.write(answer)
+        manifest.record("ask", ask_inputs, answer_path)
+    except Exception as e:
+        logger.error("Error generating content with Gemini: {error}", error=str(e))
+
+print(f"Skipped stages: {', '.join(skipped_stages) or 'none'}")
+logger.info("Skipped stages", skipped_stages=skipped_stages)
+
+if answer:
+    logger.info("Gemini response: {response}", response=answer)
+    send_answer("MP3", AIDEVS_API_KEY, answer) # Send the text response
+
+logger.info("Finished processing transcribed files.")
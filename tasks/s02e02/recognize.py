@@ -1,5 +1,10 @@
 import os
+import re
+import math
 import sys
+import time
+import asyncio
+from collections import Counter
 import structlog
 import PIL.Image
 import os
@@ -11,6 +16,8 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.append(PROJECT_ROOT)
 
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
+from config.prompts import PromptRegistry, PromptTemplate
 load_dotenv()
 
 def load_images(base_path: str) -> list[PIL.Image.Image]:
@@ -21,9 +28,82 @@ def load_images(base_path: str) -> list[PIL.Image.Image]:
     images = [PIL.Image.open(path) for path in image_paths]
     return images
 
-def create_prompt() -> str:
-    """Creates the prompt for the Gemini model."""
-    prompt = """You're going to receive 4 map fragments.
+def load_image_payloads(base_path: str) -> list[dict]:
+    """
+    Reads the map images once as inline PNG blobs, so concurrent samples reuse
+    the same encoded payloads instead of re-encoding PIL images per request.
+    """
+    payloads = []
+    for i in range(1, 5):
+        with open(os.path.join(base_path, "resources", f"map{i}.png"), "rb") as f:
+            payloads.append({"mime_type": "image/png", "data": f.read()})
+    return payloads
+
+def normalize_city(response_text: str) -> str:
+    """
+    Extracts the city name from the last non-empty line of a response and
+    normalises case, brackets and punctuation so votes can be compared.
+    """
+    lines = [line.strip() for line in response_text.strip().splitlines() if line.strip()]
+    if not lines:
+        return ""
+    city = re.sub(r"[^\w\s-]", "", lines[-1]).strip()
+    return " ".join(city.split()).title()
+
+async def sample_consensus(model, contents: list, samples: int, majority: float, logger) -> dict:
+    """
+    Fires `samples` concurrent requests and stops as soon as one city gets at
+    least `majority` of all samples, cancelling the requests still running.
+
+    Args:
+        model: The Gemini model to query.
+        contents (list): The prompt and image payloads, shared by every sample.
+        samples (int): Number of concurrent samples.
+        majority (float): Fraction of all samples that must agree, e.g. 0.6 for 3 of 5.
+        logger: The logger.
+
+    Returns:
+        dict: The winning city (or the most common one), votes, agreement rate and time to decision.
+    """
+    required = max(1, math.ceil(samples * majority))
+    started = time.perf_counter()
+    votes = Counter()
+    completed = 0
+    tasks = [asyncio.create_task(model.generate_content_async(contents)) for _ in range(samples)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            try:
+                response = await next_done
+            except Exception as e:
+                logger.warning("Sample failed", error=str(e))
+                continue
+            completed += 1
+            city = normalize_city(response.text)
+            if city:
+                votes[city] += 1
+            logger.info("Sample finished", city=city, completed=completed)
+            if votes and votes.most_common(1)[0][1] >= required:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    city, count = votes.most_common(1)[0] if votes else (None, 0)
+    return {
+        "city": city,
+        "decided": count >= required,
+        "votes": dict(votes),
+        "completed_samples": completed,
+        "agreement_rate": count / completed if completed else 0.0,
+        "time_to_decision": time.perf_counter() - started,
+    }
+
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate(
+    "recognize_system", "You are an expert in image analysis. With specialization on maps analysis", budget_tokens=50
+))
+PROMPTS.register(PromptTemplate("recognize", """You're going to receive 4 map fragments.
                     Three of them are from the same city.
                     Write the name of the streets that are present on map.
                     Write the name of the city in Polish.
@@ -32,10 +112,13 @@ def create_prompt() -> str:
                     Double check if city you're going to give me as answer has locations presented in the map fragments.
                     Finally write only the name of the city.
                     Your response should be:
-                    <NAME_OF_THE_CITY>"""
-    return prompt
+                    <NAME_OF_THE_CITY>""", budget_tokens=300))  # <--- Text only, the map images are billed separately
 
-def main():
+def create_prompt() -> str:
+    """Creates the prompt for the Gemini model."""
+    return PROMPTS.render("recognize")[0]
+
+def main(samples: int = 1, majority: float = 0.5):
     # Initialize logging
     setup_logging()  # Call the setup_logging function
     logger = structlog.get_logger(__name__)
@@ -43,21 +126,34 @@ def main():
 
     try:
         # Configure the Gemini API client
-        genai.configure(api_key=os.environ["GEMINI_API_KEY"])
+        genai.configure(api_key=get_secret("GEMINI_API_KEY"))
         model = genai.GenerativeModel(
             model_name="gemini-2.0-flash-thinking-exp",
-            system_instruction="You are an expert in image analysis. With specialization on maps analysis",
+            system_instruction=PROMPTS.render("recognize_system")[0],
         )
 
         # Get base path
         base_path = os.getcwd()
 
-        # Load images
-        images = load_images(base_path)
-
         # Create prompt
         prompt = create_prompt()
 
+        if samples > 1:
+            # Load and encode images once, shared by every sample
+            payloads = load_image_payloads(base_path)
+            logger.info("Sending concurrent requests to Gemini", samples=samples, majority=majority)
+            result = asyncio.run(sample_consensus(model, [prompt] + payloads, samples, majority, logger))
+            print("\nImage Analysis Results:")
+            print(f"City: {result['city']} (decided: {result['decided']})")
+            print(f"Votes: {result['votes']}")
+            print(f"Agreement rate: {result['agreement_rate']:.0%} of {result['completed_samples']} samples")
+            print(f"Time to decision: {result['time_to_decision']:.2f}s")
+            logger.info("Analysis complete", **result)
+            return
+
+        # Load images
+        images = load_images(base_path)
+
         logger.info("Sending request to Gemini")
         # Generate content with the model
         response = model.generate_content([prompt] + images)
@@ -72,4 +168,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Usage: python recognize.py [samples] [majority]
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    majority = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    main(samples, majority)
\ No newline at end of file
@@ -10,27 +10,75 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.append(PROJECT_ROOT)
 
 from config.logger import setup_logging
+from config.secret_resolver import get_secret
 from config.utils import send_answer
+from config.artifact_store import ArtifactStore, stub_producer
+from config.static_server import StaticServer
 load_dotenv()
 
-def main():
+ARTIFACT_DIR = "./downloads/robotid"
+IMAGE_MODEL = "imagen-3.0-generate-002"
+
+def make_imagen_producer(client, model_name: str = IMAGE_MODEL):
+    """Returns an image producer that renders the description with a Gemini image model."""
+    def produce(description: str) -> tuple[bytes, str]:
+        response = client.models.generate_images(
+            model=model_name,
+            prompt=f"A realistic image of the robot described below.\n{description}",
+            config=types.GenerateImagesConfig(number_of_images=1, output_mime_type="image/png")
+        )
+        return response.generated_images[0].image.image_bytes, "image/png"
+    return produce
+
+def main(offline_description: str | None = None):
+    """
+    Produces (or reuses) the robot image, serves it locally and submits its URL.
+
+    With `offline_description` the stub producer is used and nothing is sent to
+    external services; the served image is fetched back from the local server instead.
+    """
     setup_logging()
     logger = structlog.get_logger(__name__)
     logger.info("Starting the script")
 
-    client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-    AIDEVS_API_KEY = os.getenv('AIDEVS_API_KEY')
+    # ROBOTID_PUBLIC_URL is the externally reachable address of this server (e.g. a tunnel)
+    public_url = os.getenv('ROBOTID_PUBLIC_URL')
+    if not offline_description and not public_url:
+        raise ValueError("ROBOTID_PUBLIC_URL must be set: centrala cannot fetch the image from a local address")
 
-    data = f"https://centrala.ag3nts.org/data/{AIDEVS_API_KEY}/robotid.json"
+    AIDEVS_API_KEY = get_secret('AIDEVS_API_KEY')
+    store = ArtifactStore(logger, ARTIFACT_DIR)
 
-    response = requests.get(data)
-
-    description = response.json()['description']
+    if offline_description:
+        description = offline_description
+        producer = stub_producer
+    else:
+        client = genai.Client(api_key=get_secret('GEMINI_API_KEY'))
+        data = f"https://centrala.ag3nts.org/data/{AIDEVS_API_KEY}/robotid.json"
+        response = requests.get(data)
+        description = response.json()['description']
+        producer = make_imagen_producer(client)
     print(description)
 
-    url = "https://storage.googleapis.com/starset-random/unnamed.png"
-    answer = send_answer("robotid", AIDEVS_API_KEY, url)
-    print(answer)
+    artifact = store.get_or_create(description, producer)
+
+    server = StaticServer(logger, store, host=os.getenv('ROBOTID_HOST', '127.0.0.1'), port=int(os.getenv('ROBOTID_PORT', '8000')))
+    server.start()
+    try:
+        url = server.url_for(artifact, public_url)
+        print(url)
+        if offline_description:
+            local = requests.get(server.url_for(artifact))
+            print(f"Served {len(local.content)} bytes, status {local.status_code}, ETag {local.headers.get('ETag')}")
+        else:
+            answer = send_answer("robotid", AIDEVS_API_KEY, url)
+            print(answer)
+    finally:
+        server.stop()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Usage: python robotid.py [--offline "robot description"]
+    if len(sys.argv) > 2 and sys.argv[1] == "--offline":
+        main(sys.argv[2])
+    else:
+        main()
@@ -1,5 +1,10 @@
 import os
 import sys
+import time
+import queue
+import random
+import hashlib
+import threading
 from dotenv import load_dotenv
 import structlog
 from google import genai
@@ -10,23 +15,283 @@ PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..
 sys.path.append(PROJECT_ROOT)
 
 from config.ocr import ImageOCRProcessor
-from config.transcribe import AudioTranscriber
-from config.logger import setup_logging
+from config.job_queue import JobQueue, Worker, DEFAULT_QUEUE_PATH
+from config.results_store import ResultsStore, DEFAULT_STORE_PATH
+from config.batch_jobs import BatchJobRunner, GeminiBatchBackend, build_request, inline_part, text_part
+from config.hedging import HedgingPolicy
+from config.cascade import ModelCascade, CascadeExhausted, LowConfidence
+from config.near_duplicates import NearDuplicateIndex
+from config.transcribe import AudioTranscriber, TRANSCRIPTION_PROMPT
+from config.ingest import Document, DocumentIngestor
+from config.logger import setup_logging, timed
+from config.secret_resolver import get_secret
 from config.utils import send_answer
+from config.tokens import estimate_tokens
+from config.streaming_json import first_json_object
+from config.rate_limiter import AdmissionController, ProviderLimits, admitted, admitted_call
+from config.prompt_cache import PromptCache, is_definitive_cache_error, normalize_prompt
+from config.prompts import FewShotExample, PromptRegistry, PromptTemplate
+from config.prefilter import LocalPrefilter, append_label, load_labels, DEFAULT_LABELS_PATH
 
 load_dotenv()
 
+def _sample_result(people: bool, hardware: bool, other: bool) -> str:
+    return json.dumps({"people": str(people), "hardware": str(hardware), "other": str(other)}, indent=0)
+
+CLASSIFICATION_EXAMPLES = [
+    FewShotExample('"entry deleted"', _sample_result(False, False, True)),
+    FewShotExample("Fingerprint analysis identified subject: Jan Nowak (correlated with birth records database)",
+                   _sample_result(True, False, False)),
+    FewShotExample("Repair note: Fingerprint malfunction detected. Scheduled repair: 12/03/2023 15:48:37",
+                   _sample_result(False, True, False)),
+    FewShotExample("Boss, as directed, we searched the tenements in the nearby town for rebels. We were unable to find anyone. "
+                   "Sensor dźwiękowy i detektory ruchu w pełnej gotowości.", _sample_result(False, False, True)),
+    FewShotExample("Wstępny alarm wykrycia - ruch organiczny. Czujniki pozostają aktywne, a wytyczne dotyczące wykrywania "
+                   "życia organicznego - bez rezultatów. Stan patrolu bez zakłóceń.", _sample_result(False, False, True)),
+    FewShotExample("We met a guy named Dominik, he is good with preparing pizza.", _sample_result(False, False, True),
+                   note="It doesn't talk about person being captured or threat."),
+]
+
+CLASSIFICATION_TEMPLATE = """
+            You are tasked with processing data reports. The input consists of daily reports from multiple departments,
+            including technical reports and security reports. Not all contain useful information.
+
+            Your task is to:
+            1. Extract only notes containing:
+                - Information about captured individuals
+                - Evidence of human presence
+                - Hardware malfunction repairs (exclude software-related issues)
+            2. Your task is ONLY to categorize document based on two categories "people", "hardware" and "other".
+
+            Please process the data according to these requirements.
+            Respond ONLY with valid JSON. Do not write an introduction or summary.
+
+            Result should be in tag <answer> and have below JSON format:
+            {
+            "people": "value",
+            "hardware": "value",
+            "other": "value"
+            }
+
+            $examples
+        """
+
+CLASSIFICATION_BUDGET_TOKENS = 8000  # <--- Prompt plus documents; longer inputs drop the least similar examples first
+
+PROMPTS = PromptRegistry(None)
+PROMPTS.register(PromptTemplate("classification", CLASSIFICATION_TEMPLATE, CLASSIFICATION_EXAMPLES,
+                                budget_tokens=CLASSIFICATION_BUDGET_TOKENS))
+PROMPTS.register(PromptTemplate("classification_batch", normalize_prompt(CLASSIFICATION_TEMPLATE) + "\n\n" + normalize_prompt("""
+            You will now receive several documents at once. Each document starts with a line
+            "### FILE: <filename>" followed by its content.
+            Classify every document independently using the rules above.
+            Respond ONLY with one JSON object keyed by filename, for example:
+            {
+            "report-01.txt": {"people": "False", "hardware": "True", "other": "False"},
+            "report-02.txt": {"people": "False", "hardware": "False", "other": "True"}
+            }
+            Every filename from the input must appear exactly once.
+        """), CLASSIFICATION_EXAMPLES, budget_tokens=CLASSIFICATION_BUDGET_TOKENS))
+PROMPTS.register(PromptTemplate("classification_cascade", normalize_prompt(CLASSIFICATION_TEMPLATE) + "\n\n" + normalize_prompt("""
+            Additionally add a "confidence" field with a number between 0 and 1
+            telling how certain you are of the classification, for example:
+            {
+            "people": "False",
+            "hardware": "True",
+            "other": "False",
+            "confidence": 0.9
+            }
+        """), CLASSIFICATION_EXAMPLES, budget_tokens=CLASSIFICATION_BUDGET_TOKENS))
+
+# Static renders with every few-shot example
+CLASSIFICATION_PROMPT = PROMPTS.render("classification")[0]
+BATCH_PROMPT = PROMPTS.render("classification_batch")[0]
+CASCADE_PROMPT = PROMPTS.render("classification_cascade")[0]
+CASCADE_MIN_CONFIDENCE = 0.7  # <--- Self-reported confidence below this escalates to the next tier
+CATEGORIES = ("people", "hardware", "other")
+AUDIT_SEED = 45  # <--- Fixed, so audit samples are reproducible between runs
+
+class StageStats:
+    """
+    Thread-safe counters for one pipeline stage: items processed, busy time
+    and utilisation relative to the stage's worker capacity.
+    """
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, busy_seconds: float):
+        with self._lock:
+            self.items += 1
+            self.busy_seconds += busy_seconds
+
+    def report(self, wall_seconds: float) -> dict:
+        capacity = self.workers * wall_seconds
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "items": self.items,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "utilisation": round(self.busy_seconds / capacity, 3) if capacity else 0.0,
+        }
+
 class Classification:
     """
     A class to handle classification, now integrating OCR and transcription.
     """
-    def __init__(self, logger):
+    def __init__(self, logger, prefilter: LocalPrefilter | None = None, labels_path: str | None = None,
+                 prompt_cache: PromptCache | None = None, ingestor: DocumentIngestor | None = None,
+                 streaming: bool = False, admission: AdmissionController | None = None,
+                 hedging: HedgingPolicy | None = None, cascade: ModelCascade | None = None,
+                 dedup_threshold: float | None = None, audit_rate: float = 0.0,
+                 prompts: PromptRegistry | None = None, few_shot_k: int | None = None,
+                 results_store: ResultsStore | None = None):
         """
         Initializes the Classification class with a logger and OCR/Transcription processors.
+
+        Args:
+            logger: The logger.
+            prefilter (LocalPrefilter | None, optional): Decides confident documents locally, skipping the LLM.
+            labels_path (str | None, optional): JSONL file where LLM classifications are stored as labels.
+            prompt_cache (PromptCache | None, optional): Sends static system prompts as cached content.
+            ingestor (DocumentIngestor | None, optional): Reads files and archives; a default one is created if omitted.
+            streaming (bool, optional): Stream classification responses and stop at the first complete JSON object.
+            admission (AdmissionController | None, optional): Shared rate limiting for OCR, transcription and classification.
+            hedging (HedgingPolicy | None, optional): Hedges slow OCR and non-streaming classification calls.
+            cascade (ModelCascade | None, optional): Classifies single documents with the "classify" tiers, cheapest first;
+                the tiers' models are used instead of the `model_name` passed to the classify methods.
+            dedup_threshold (float | None, optional): In ask_question, classify near-duplicates (MinHash similarity
+                at least this) once per cluster. The pipelined, batched, offline and distributed modes do not deduplicate.
+            audit_rate (float, optional): Fraction of near-duplicates classified anyway to check the fanned-out label.
+            prompts (PromptRegistry | None, optional): Renders the classification prompts and records their tokens;
+                defaults to the module's PROMPTS.
+            few_shot_k (int | None, optional): Send only the k few-shot examples most similar to each document
+                (at least one per label). The prompt then differs per document, so prompt_cache is not used.
+            results_store (ResultsStore | None, optional): Keeps the OCR texts and transcripts of the documents.
         """
         self.logger = logger if logger else structlog.get_logger(__name__)
-        self.ocr_processor = ImageOCRProcessor(self.logger)
-        self.audio_transcriber = AudioTranscriber(self.logger)
+        self.admission = admission
+        self.hedging = hedging
+        self.cascade = cascade
+        self.ocr_processor = ImageOCRProcessor(self.logger, admission, hedging, results_store)
+        self.audio_transcriber = AudioTranscriber(self.logger, admission, results_store)
+        self.prefilter = prefilter
+        self.labels_path = labels_path
+        self.prompt_cache = prompt_cache
+        if prompt_cache and few_shot_k is not None:
+            self.logger.warning("Few-shot selection changes the prompt per document, prompt caching is disabled")
+            self.prompt_cache = None
+        self.ingestor = ingestor if ingestor else DocumentIngestor(self.logger)
+        self.streaming = streaming
+        self._labels_lock = threading.Lock()
+        self.llm_calls = 0
+        self.local_decisions = 0
+        self._counters_lock = threading.Lock()  # <--- Workers, hedges and pipelined stages update the counters concurrently
+        self.dedup_threshold = dedup_threshold
+        self.audit_rate = audit_rate
+        self.dedup_stats = {"exact_duplicates": 0, "clusters": 0, "fanned_out": 0, "audited": 0, "audit_disagreements": 0}
+        self.prompts = prompts if prompts else PROMPTS
+        for name, template in PROMPTS.templates.items():
+            if name not in self.prompts.templates:
+                self.prompts.register(template)  # <--- A separate registry keeps separate token stats
+        self.few_shot_k = few_shot_k
+
+    def _generate(self, client, model_name: str, system_instruction: str, contents, **config_kwargs):
+        """
+        Calls the model with a static system prompt, through the prompt cache when one is configured.
+        """
+        tokens = estimate_tokens(system_instruction + str(contents))
+
+        def send(name):
+            if self.prompt_cache:
+                return admitted_call(self.admission, "gemini", name, self.prompt_cache.generate_content,
+                                     name, system_instruction, contents, tokens=tokens, **config_kwargs)
+            return admitted_call(
+                self.admission, "gemini", name,
+                client.models.generate_content,
+                tokens=tokens,
+                model=name,
+                config=types.GenerateContentConfig(
+                    system_instruction=system_instruction,
+                    **config_kwargs
+                ),
+                contents=contents
+            )
+
+        if self.hedging:
+            timeout = self.hedging.attempt_timeout()
+            if timeout:  # <--- A losing attempt cannot be interrupted, so its client gives up at the budget
+                config_kwargs["http_options"] = types.HttpOptions(timeout=int(timeout * 1000))
+            return self.hedging.call(f"classify:{model_name}", lambda: send(model_name),
+                                     lambda: send(self.hedging.backup_model(model_name)))
+        return send(model_name)
+
+    def _generate_json_streaming(self, client, model_name: str, system_instruction: str, contents,
+                                 validate=None, **config_kwargs) -> tuple[dict | None, str]:
+        """
+        Streams a generation and returns as soon as the top-level JSON object is
+        complete and valid, closing the stream so no trailing tokens are generated.
+        A stream rejected because of the cached prompt is retried once with the inline prompt.
+
+        Returns:
+            tuple[dict | None, str]: The parsed object (None if the stream ended without one) and the raw text received.
+        """
+        def stream_json(config):
+            with admitted(self.admission, "gemini", model_name, estimate_tokens(system_instruction + str(contents))):
+                stream = client.models.generate_content_stream(model=model_name, config=config, contents=contents)
+                try:
+                    return first_json_object((chunk.text for chunk in stream), validate, self.logger)
+                finally:
+                    close = getattr(stream, "close", None)
+                    if close:
+                        close()
+
+        started = time.perf_counter()
+        inline_config = types.GenerateContentConfig(system_instruction=system_instruction, **config_kwargs)
+        cache_name = self.prompt_cache.handle(model_name, system_instruction) if self.prompt_cache else None
+        if cache_name:
+            try:
+                parsed, raw_response_text = stream_json(types.GenerateContentConfig(cached_content=cache_name, **config_kwargs))
+            except Exception as e:
+                if not is_definitive_cache_error(e):
+                    raise
+                self.logger.warning(f"Stream with cached prompt {cache_name} failed, retrying inline: {e}")
+                self.prompt_cache.invalidate(model_name, system_instruction)
+                parsed, raw_response_text = stream_json(inline_config)
+        else:
+            parsed, raw_response_text = stream_json(inline_config)
+        self.logger.info(event="Streamed JSON response", seconds=round(time.perf_counter() - started, 3), complete=parsed is not None)
+        return parsed, raw_response_text
+
+    def _apply_local_decision(self, text_content: str, original_filename: str, result_data: dict) -> bool:
+        """
+        Classifies the document with the prefilter if it is confident.
+
+        Returns:
+            bool: True if the document was decided locally and result_data was updated.
+        """
+        if not self.prefilter:
+            return False
+        decision = self.prefilter.decide(text_content)
+        if decision is None:
+            return False
+        with self._counters_lock:
+            self.local_decisions += 1
+        self.logger.info(event="Decided locally", file_path=original_filename, decision=decision)
+        for category in ("people", "hardware"):
+            if decision[category]:
+                result_data[category].append(original_filename)
+        return True
+
+    def _record_label(self, original_filename: str, text_content: str, flags: dict):
+        """Stores an LLM classification as a label for training the prefilter."""
+        if not self.labels_path:
+            return
+        with self._labels_lock:
+            append_label(self.labels_path, original_filename, text_content, flags)
 
     def extract_json_from_wrapped_response(self, raw_response_text: str) -> dict:
         """
@@ -41,7 +306,8 @@ class Classification:
 
     def _extract_content(self, client, file_path: str, model_name: str) -> str | None:
         """
-        Extracts text content from a file based on its type.
+        Extracts text content from a file based on its sniffed type.
+        Archives yield several documents and are handled by the ask_question methods instead.
 
         Args:
             file_path (str): The path to the file.
@@ -51,42 +317,50 @@ class Classification:
         Returns:
             str | None: The extracted text content, or None if extraction fails or file type is unsupported.
         """
-        logger = self.logger
-        file_name = os.path.basename(file_path)
-        file_lower = file_name.lower()
+        for document in self.ingestor.iter_path(file_path):
+            if "/" in document.name:
+                self.logger.warning(f"Archive passed to _extract_content, only its first member is used: {file_path}")
+            return self._extract_document(client, document, model_name)
+        return None
 
-        image_suffix = (".png", ".jpg", ".jpeg")
-        audio_suffix = (".mp3", ".wav", ".ogg")
+    def _extract_document(self, client, document: Document, model_name: str) -> str | None:
+        """
+        Extracts text content from an ingested document, routed by its sniffed kind.
 
-        if file_lower.endswith(image_suffix):
-            logger.info(f"Processing image file: {file_name}")
-            text_content_dict = self.ocr_processor.perform_ocr(
-                client=client,
-                file_path=file_path,
-                model_name=model_name,
-                save_output=False
-            )
+        Args:
+            client: The Gemini API client.
+            document (Document): The document with its bytes and detected kind.
+            model_name (str): The name of the Gemini model to use.
+
+        Returns:
+            str | None: The extracted text content, or None if extraction fails or the kind is unsupported.
+        """
+        logger = self.logger
+
+        if document.kind == "image":
+            logger.info(f"Processing image file: {document.name}")
+            text_content_dict = self.ocr_processor.perform_ocr_on_bytes(document.data, document.name, model_name)
             text_content = list(text_content_dict.values())[0] if text_content_dict else None
 
-        elif file_lower.endswith(audio_suffix):
-            logger.info(f"Processing audio file: {file_name}")
-            text_content = self.audio_transcriber.transcribe_single_audio(
+        elif document.kind == "audio":
+            logger.info(f"Processing audio file: {document.name}")
+            text_content = self.audio_transcriber.transcribe_audio_bytes(
                 client=client,
-                file_path=file_path,
-                model_name=model_name,
-                save_output=False
+                data=document.data,
+                name=document.name,
+                mime_type=document.mime_type,
+                model_name=model_name
             )
-        elif file_lower.endswith(".txt"):
-            logger.info(f"Processing text file: {file_name}")
-            with open(file_path, "r") as f:
-                text_content = f.read()
+        elif document.kind == "text":
+            logger.info(f"Processing text file: {document.name}")
+            text_content = document.data.decode("utf-8", errors="replace")
         else:
-            logger.warning(f"Unsupported file type: {file_name}")
+            logger.warning(f"Unsupported file type: {document.name}")
             return None
 
         return text_content
 
-    def _classify_content(self, client, text_content: str, model_name: str, original_filename: str, result_data: dict):
+    def _classify_content(self, client, text_content: str, model_name: str, original_filename: str, result_data: dict) -> bool:
         """
         Classifies the given text content using a language model and updates result_data.
 
@@ -96,6 +370,9 @@ class Classification:
             model_name (str): The name of the Gemini model to use for classification.
             original_filename (str): The original filename of the processed file.
             result_data (dict): Dictionary to store classification results.
+
+        Returns:
+            bool: False if the model response could not be parsed, True otherwise.
         """
         logger = self.logger
 
@@ -110,115 +387,265 @@ class Classification:
             for category in categories:
                 classification_result[category] = False
             result_data[category] = []
-            return
+            return True
 
-        system_prompt = """
-            You are tasked with processing data reports. The input consists of daily reports from multiple departments, 
-            including technical reports and security reports. Not all contain useful information.
+        if self._apply_local_decision(text_content, original_filename, result_data):
+            return True
 
-            Your task is to:
-            1. Extract only notes containing:
-                - Information about captured individuals
-                - Evidence of human presence
-                - Hardware malfunction repairs (exclude software-related issues)
-            2. Your task is ONLY to categorize document based on two categories "people", "hardware" and "other". 
-
-            Please process the data according to these requirements.
-            Respond ONLY with valid JSON. Do not write an introduction or summary.
+        with self._counters_lock:
+            self.llm_calls += 1
+        template_name = "classification_cascade" if self.cascade and not self.streaming else "classification"
+        system_prompt, prompt_tokens = self.prompts.render(template_name, text_content, k=self.few_shot_k)
+        self.prompts.record(template_name, prompt_tokens)
+        with timed(logger, "classify", file=original_filename, model=model_name):
+            if self.streaming:
+                classification_json, raw_response_text = self._generate_json_streaming(
+                    client, model_name, system_prompt, text_content,
+                    validate=lambda response_json: all(category in response_json for category in categories),
+                    response_mime_type="application/json"
+                )
+            elif self.cascade:  # <--- The cascade tiers pick the model, model_name is not used
+                raw_response_text = self._generate_cascaded(client, text_content, system_prompt)
+            else:
+                response = self._generate(client, model_name, system_prompt, text_content, response_mime_type="application/json")
+                raw_response_text = response.text
+        logger.info(f"Response: {raw_response_text}")
 
-            Result should be in tag <answer> and have below JSON format:
-            {
-            "people": "value",
-            "hardware": "value",
-            "other": "value"
-            }
+        try:
+            if not self.streaming:
+                classification_json = self.extract_json_from_wrapped_response(raw_response_text)
+            elif classification_json is None:
+                raise json.JSONDecodeError("No complete JSON object in streamed response", raw_response_text, 0)
+            flags = {category: self._parse_flag(classification_json.get(category, "False")) for category in ("people", "hardware")}
+            for category, flag in flags.items():
+                if flag:  # <--- Same parsing as the cascade and batch paths: true, "true" and "True" all count
+                    result_data[category].append(original_filename)
+                    logger.info(f"Added {original_filename} to {category}")
+            self._record_label(original_filename, text_content, flags)
+        except json.JSONDecodeError as e:
+            logger.error(f"JSONDecodeError: {e}, Raw Response: {raw_response_text}")
+            logger.error("Could not decode JSON response from model.")
+            return False
 
-            Sample input 1:
-            "entry deleted"
+        logger.info(event="Classification result", classification_result=classification_result, file_path=original_filename)
+        logger.info(event="Categories after classification", categories=categories, file_path=original_filename)
+        return True
 
-            Sample result:
-            {
-            "people": "False",
-            "hardware": "False",
-            "other": "True"
-            }
+    def _validate_cascaded_response(self, raw_response_text: str) -> dict:
+        """
+        Accepts a classification with valid flags for every category and enough confidence.
+        Raises ValueError (JSONDecodeError, LowConfidence) so the cascade escalates.
+        """
+        classification_json = self.extract_json_from_wrapped_response(raw_response_text)
+        if not isinstance(classification_json, dict):
+            raise ValueError(f"Expected a JSON object, got: {classification_json!r}")
+        if any(self._parse_flag(classification_json.get(category)) is None for category in CATEGORIES):
+            raise ValueError(f"Missing or invalid category flags: {classification_json}")
+        confidence = classification_json.get("confidence")
+        if confidence is not None:
+            try:
+                confidence = float(confidence)
+            except (TypeError, ValueError):
+                raise ValueError(f"Non-numeric confidence: {confidence!r}")
+        if confidence is not None and confidence < CASCADE_MIN_CONFIDENCE:
+            raise LowConfidence(f"Self-reported confidence {confidence}")
+        return classification_json
 
-            Sample input 2:
-            Fingerprint analysis identified subject: Jan Nowak (correlated with birth records database)
+    def _generate_cascaded(self, client, text_content: str, system_prompt: str = CASCADE_PROMPT) -> str:
+        """
+        Classifies through the model cascade and returns the accepted raw response,
+        or the last tier's response if none passed validation.
+        """
+        try:
+            _, raw_response_text = self.cascade.run(
+                "classify",
+                lambda tier: self._generate(client, tier.model, system_prompt, text_content,
+                                            response_mime_type="application/json").text,
+                self._validate_cascaded_response,
+                input_tokens=estimate_tokens(system_prompt + text_content)
+            )
+        except CascadeExhausted as e:
+            self.logger.error(f"Cascade exhausted: {e}")
+            raw_response_text = e.last_raw or ""
+        return raw_response_text
 
-            Sample result:
-            {
-            "people": "True",
-            "hardware": "False",
-            "other": "False"
-            }
+    @staticmethod
+    def _parse_flag(value) -> bool | None:
+        """Parses a "True"/"False" string or boolean flag from the model, returning None if invalid."""
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, str) and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        return None
 
-            Sample input 3:
-            Repair note: Fingerprint malfunction detected. Scheduled repair: 12/03/2023 15:48:37 
+    def _validate_batch_response(self, raw_response_text: str, filenames: list[str]) -> dict | None:
+        """
+        Validates a batched classification response.
 
-            Sample result:
-            {
-            "people": "False",
-            "hardware": "True",
-            "other": "False"
-            }
+        Returns:
+            dict | None: {filename: {category: bool}} if every filename is present with valid flags, otherwise None.
+        """
+        try:
+            response_json = self.extract_json_from_wrapped_response(raw_response_text)
+        except (ValueError, json.JSONDecodeError):
+            return None
+        return self._validate_batch_labels(response_json, filenames)
 
-            Sample input 4:
-            Boss, as directed, we searched the tenements in the nearby town for rebels. We were unable to find anyone. Sensor dźwiękowy i detektory ruchu w pełnej gotowości.
+    def _validate_batch_labels(self, response_json, filenames: list[str]) -> dict | None:
+        """
+        Validates a parsed batched classification response.
 
-            Sample result:
-            {
-            "people": "False",
-            "hardware": "False",
-            "other": "True"
-            }
+        Returns:
+            dict | None: {filename: {category: bool}} if every filename is present with valid flags, otherwise None.
+        """
+        if not isinstance(response_json, dict) or set(response_json) != set(filenames):
+            return None
 
-            Sample input 5:
-            Wstępny alarm wykrycia - ruch organiczny. Czujniki pozostają aktywne, a wytyczne dotyczące wykrywania życia organicznego - bez rezultatów. Stan patrolu bez zakłóceń.
+        labels = {}
+        for filename, flags in response_json.items():
+            if not isinstance(flags, dict):
+                return None
+            parsed = {category: self._parse_flag(flags.get(category, "False")) for category in CATEGORIES}
+            if None in parsed.values():
+                return None
+            labels[filename] = parsed
+        return labels
 
-            Sample result:
-            {
-            "people": "False",
-            "hardware": "False",
-            "other": "True"
-            }
+    def _classify_batch(self, client, documents: list[tuple[str, str]], model_name: str) -> dict[str, dict[str, bool]]:
+        """
+        Classifies several documents in one request. A batch whose response fails
+        validation is split in half and retried; a single document that still
+        fails falls back to the per-document path.
 
-            Sample input 6:
-            We met a guy named Dominik, he is good with preparing pizza.
+        Args:
+            client: The Gemini API client.
+            documents (list[tuple[str, str]]): (filename, text content) pairs.
+            model_name (str): The name of the Gemini model to use.
 
-            Sample result:
-            {
-            "people": "False",
-            "hardware": "False",
-            "other": "True"
-            }   
-            Reason: It doesn't talk about person being captured or threat.
-        """
-        response = client.models.generate_content(
-            model=model_name,
-            config=types.GenerateContentConfig(
-                system_instruction=system_prompt,
-                response_mime_type="application/json"
-            ),
-            contents=text_content
-        )
-        raw_response_text = response.text
-        logger.info(f"Response: {raw_response_text}")
+        Returns:
+            dict[str, dict[str, bool]]: Category flags per filename.
+        """
+        logger = self.logger
+        filenames = [filename for filename, _ in documents]
+        contents = "\n\n".join(f"### FILE: {filename}\n{text}" for filename, text in documents)
+        logger.info(event="Classifying batch", files=filenames)
+        with self._counters_lock:
+            self.llm_calls += 1  # <--- Counted per request, so halves of a split batch count too
+        batch_prompt, prompt_tokens = self.prompts.render("classification_batch", contents)
+        self.prompts.record("classification_batch", prompt_tokens)
 
         try:
-            classification_json = self.extract_json_from_wrapped_response(raw_response_text)
-            if classification_json.get("people", "False") == "True":
-                result_data["people"].append(original_filename)
-                logger.info(f"Added {original_filename} to people")
-            if classification_json.get("hardware", "False") == "True":
-                result_data["hardware"].append(original_filename)
-                logger.info(f"Added {original_filename} to hardware")
-        except json.JSONDecodeError as e:
-            logger.error(f"JSONDecodeError: {e}, Raw Response: {raw_response_text}")
-            logger.error("Could not decode JSON response from model.")
+            with timed(logger, "classify_batch", files=filenames, model=model_name):
+                if self.streaming:
+                    response_json, _ = self._generate_json_streaming(
+                        client, model_name, batch_prompt, contents,
+                        validate=lambda parsed: self._validate_batch_labels(parsed, filenames) is not None,
+                        response_mime_type="application/json"
+                    )
+                    labels = self._validate_batch_labels(response_json, filenames)
+                else:
+                    response = self._generate(client, model_name, batch_prompt, contents, response_mime_type="application/json")
+                    labels = self._validate_batch_response(response.text, filenames)
+        except Exception as e:
+            logger.error(f"Error classifying batch {filenames}: {e}")
+            labels = None
 
-        logger.info(event="Classification result", classification_result=classification_result, file_path=original_filename)
-        logger.info(event="Categories after classification", categories=categories, file_path=original_filename)
+        if labels is not None:
+            return labels
+
+        if len(documents) == 1:
+            logger.warning(event="Batch validation failed, falling back to single classification", file_path=filenames[0])
+            filename, text = documents[0]
+            return {filename: {**self._classify_single(client, text, model_name, filename), "other": False}}
+
+        logger.warning(event="Batch validation failed, splitting", files=filenames)
+        middle = len(documents) // 2
+        labels = self._classify_batch(client, documents[:middle], model_name)
+        labels.update(self._classify_batch(client, documents[middle:], model_name))
+        return labels
+
+    def _classify_single(self, client, text_content: str | None, model_name: str, filename: str) -> dict[str, bool]:
+        """Classifies one document and returns its people/hardware flags."""
+        single_result = {"people": [], "hardware": []}
+        self._classify_content(client, text_content, model_name, filename, single_result)
+        return {category: filename in single_result[category] for category in ("people", "hardware")}
+
+    def classify_documents_batched(self, client, documents: dict[str, str | None], model_name: str,
+                                   result_data: dict, batch_token_budget: int = 4000):
+        """
+        Classifies documents in batches that fit the token budget and updates result_data
+        in the order of `documents`.
+
+        Args:
+            client: The Gemini API client.
+            documents (dict[str, str | None]): Text content per filename; files without content are skipped.
+            model_name (str): The name of the Gemini model to use.
+            result_data (dict): Dictionary to store classification results.
+            batch_token_budget (int, optional): Approximate maximum document tokens per request.
+        """
+        logger = self.logger
+        batches = []
+        current, current_tokens = [], 0
+        local_results = {"people": [], "hardware": []}
+        for filename, text in documents.items():
+            if not text:
+                logger.warning(event="No text content for classification", file_path=filename)
+                continue
+            if self._apply_local_decision(text, filename, local_results):
+                continue
+            tokens = estimate_tokens(f"### FILE: {filename}\n{text}")
+            if current and current_tokens + tokens > batch_token_budget:
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append((filename, text))
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        logger.info(event="Batched classification", documents=len(documents), batches=len(batches))
+
+        labels = {}
+        for batch in batches:
+            batch_labels = self._classify_batch(client, batch, model_name)
+            for filename, text in batch:
+                if filename in batch_labels:
+                    self._record_label(filename, text, batch_labels[filename])
+            labels.update(batch_labels)
+
+        for filename in documents:
+            flags = labels.get(filename)
+            if not flags:
+                flags = {category: filename in local_results[category] for category in ("people", "hardware")}
+            if flags["people"]:
+                result_data["people"].append(filename)
+                logger.info(f"Added {filename} to people")
+            if flags["hardware"]:
+                result_data["hardware"].append(filename)
+                logger.info(f"Added {filename} to hardware")
+
+    def ask_question_batched(self, client, base_path: str, model_name: str, batch_token_budget: int = 4000) -> dict:
+        """
+        Same as ask_question, but classifies many documents per request.
+
+        Args:
+            client: The Gemini API client.
+            base_path (str): The path to the directory containing files to process.
+            model_name (str): The name of the Gemini model to use.
+            batch_token_budget (int, optional): Approximate maximum document tokens per request.
+
+        Returns:
+            dict: A dictionary containing lists of filenames classified as 'people' and 'hardware'.
+        """
+        result_data = {
+            "people": [],
+            "hardware": [],
+        }
+        documents = {}
+        for document in self.ingestor.iter_directory(base_path):
+            self.logger.info(f"Checking file: {document.name}, kind: {document.kind}")
+            documents[document.name] = self._extract_document(client, document, model_name)
+
+        self.classify_documents_batched(client, documents, model_name, result_data, batch_token_budget)
+        return self._finalize_result(result_data)
 
     def ask_question(self, client, base_path: str, model_name: str) -> dict:
         """
@@ -233,20 +660,223 @@ class Classification:
             dict: A dictionary containing lists of filenames classified as 'people' and 'hardware'.
         """
         logger = self.logger
+        if self.dedup_threshold is not None:
+            return self._ask_question_deduplicated(client, base_path, model_name)
 
         result_data = {
             "people": [],
             "hardware": [],
         }
 
-        for file in os.listdir(base_path):
-            file_path = os.path.join(base_path, file)
-            logger.info(f"Checking file: {file}, file_path: {file_path}")
-            original_filename = file
+        for document in self.ingestor.iter_directory(base_path):
+            logger.info(f"Checking file: {document.name}, kind: {document.kind}")
+            original_filename = document.name
 
-            text_content = self._extract_content(client, file_path, model_name)
+            text_content = self._extract_document(client, document, model_name)
             self._classify_content(client, text_content, model_name, original_filename, result_data)
 
+        return self._finalize_result(result_data)
+
+    def _ask_question_deduplicated(self, client, base_path: str, model_name: str) -> dict:
+        """
+        Same as ask_question, but byte-identical files are extracted once and
+        near-duplicate texts are classified once per cluster, with the
+        representative's label fanned out to the members. With `audit_rate`
+        a random sample of members is classified as well; a member's own
+        label wins and disagreements are counted in dedup_stats.
+        """
+        logger = self.logger
+        index = NearDuplicateIndex(logger, self.dedup_threshold)
+        audit_random = random.Random(AUDIT_SEED)
+
+        extracted = {}
+        documents = {}
+        for document in self.ingestor.iter_directory(base_path):
+            logger.info(f"Checking file: {document.name}, kind: {document.kind}")
+            digest = hashlib.sha256(document.data).hexdigest()
+            if digest in extracted:
+                self.dedup_stats["exact_duplicates"] += 1
+            else:
+                extracted[digest] = self._extract_document(client, document, model_name)
+            documents[document.name] = extracted[digest]
+
+        flags = {}
+        for filename, text_content in documents.items():
+            representative = index.add(filename, text_content) if text_content else filename
+            if representative == filename:
+                flags[filename] = self._classify_single(client, text_content, model_name, filename)
+            elif audit_random.random() < self.audit_rate:
+                flags[filename] = self._classify_single(client, text_content, model_name, filename)
+                self.dedup_stats["audited"] += 1
+                if flags[filename] != flags[representative]:
+                    self.dedup_stats["audit_disagreements"] += 1
+                    logger.warning(event="Near-duplicate audit disagreement", file_path=filename,
+                                   representative=representative, flags=flags[filename],
+                                   representative_flags=flags[representative])
+            else:
+                flags[filename] = flags[representative]
+                self.dedup_stats["fanned_out"] += 1
+                logger.info(event="Label fanned out from near-duplicate", file_path=filename, representative=representative)
+        self.dedup_stats["clusters"] = len(index.clusters)
+
+        result_data = {category: [filename for filename, file_flags in flags.items() if file_flags[category]]
+                       for category in ("people", "hardware")}
+        return self._finalize_result(result_data)
+
+    def ask_question_offline(self, client, base_path: str, model_name: str, runner: BatchJobRunner,
+                             job_id: str = "classification") -> dict:
+        """
+        Same as ask_question, but OCR, transcription and classification run as
+        offline provider batch jobs (one request per file, cheaper, results
+        within hours). Each stage is a resumable job: re-running after an
+        interruption polls the submitted jobs instead of resubmitting them.
+        Classifications that come back invalid are redone interactively.
+
+        Args:
+            client: The Gemini API client, used only for the interactive fallback.
+            base_path (str): The path to the directory containing files to process.
+            model_name (str): The name of the Gemini model to use.
+            runner (BatchJobRunner): Submits and polls the batch jobs.
+            job_id (str, optional): Prefix of the batch job names and state files.
+
+        Returns:
+            dict: A dictionary containing lists of filenames classified as 'people' and 'hardware'.
+        """
+        logger = self.logger
+        documents, images, audio = {}, {}, {}
+        for document in self.ingestor.iter_directory(base_path):
+            logger.info(f"Checking file: {document.name}, kind: {document.kind}")
+            documents[document.name] = None
+            if document.kind == "image":
+                images[document.name] = (document.data, document.mime_type)
+            elif document.kind == "audio":
+                audio[document.name] = build_request([text_part(TRANSCRIPTION_PROMPT),
+                                                      inline_part(document.data, document.mime_type)])
+            elif document.kind == "text":
+                documents[document.name] = document.data.decode("utf-8", errors="replace")
+            else:
+                logger.warning(f"Unsupported file type: {document.name}")
+
+        documents.update(self.ocr_processor.perform_ocr_batch(runner, images, model_name, f"{job_id}-ocr"))
+        documents.update(runner.run(f"{job_id}-transcribe", model_name, audio))
+
+        local_results = {"people": [], "hardware": []}
+        requests = {}
+        for filename, text_content in documents.items():
+            if not text_content:
+                logger.warning(event="No text content for classification", file_path=filename)
+            elif not self._apply_local_decision(text_content, filename, local_results):
+                system_prompt, prompt_tokens = self.prompts.render("classification", text_content, k=self.few_shot_k)
+                self.prompts.record("classification", prompt_tokens)
+                requests[filename] = build_request([text_part(text_content)], system_prompt,
+                                                   response_mime_type="application/json")
+        with self._counters_lock:
+            self.llm_calls += len(requests)
+        responses = runner.run(f"{job_id}-classify", model_name, requests)
+
+        flags = {}
+        for filename, raw_response_text in responses.items():
+            try:
+                classification_json = self.extract_json_from_wrapped_response(raw_response_text or "")
+                parsed = {category: self._parse_flag(classification_json.get(category, "False"))
+                          for category in ("people", "hardware")}
+                if None in parsed.values():
+                    raise ValueError(f"Invalid category flags: {classification_json}")
+                self._record_label(filename, documents[filename], parsed)
+                flags[filename] = parsed
+            except ValueError as e:
+                logger.warning(event="Batch response invalid, classifying interactively", file_path=filename, error=str(e))
+                flags[filename] = self._classify_single(client, documents[filename], model_name, filename)
+
+        result_data = {category: [filename for filename in documents
+                                  if flags.get(filename, {}).get(category) or filename in local_results[category]]
+                       for category in ("people", "hardware")}
+        return self._finalize_result(result_data)
+
+    def enqueue_documents(self, job_queue: JobQueue, base_path: str) -> int:
+        """
+        Adds one "extract" job per file in base_path; archives are expanded by the worker.
+        Paths are stored absolute, so workers on other hosts need the same shared volume.
+
+        Returns:
+            int: Number of jobs added (files already queued are skipped).
+        """
+        return job_queue.enqueue_many("extract", [
+            (file, {"path": os.path.abspath(os.path.join(base_path, file)), "order": number})
+            for number, file in enumerate(os.listdir(base_path))
+        ])
+
+    def job_handlers(self, client, model_name: str, job_queue: JobQueue) -> dict:
+        """
+        Returns the Worker handlers: "extract" reads a file, extracts every document in it
+        and queues one "classify" job per document; "classify" returns its people/hardware flags.
+        """
+        def extract(payload):
+            documents = []
+            for member, document in enumerate(self.ingestor.iter_path(payload["path"])):
+                text_content = self._extract_document(client, document, model_name)
+                if document.kind in ("image", "audio") and (not text_content or text_content.startswith("Error during")):
+                    raise ValueError(f"No text extracted from {document.name}")  # <--- Worker fails the job, so it is retried
+                documents.append((document.name, {"name": document.name, "text": text_content,
+                                                  "order": [payload["order"], member]}))
+            job_queue.enqueue_many("classify", documents)  # <--- One transaction, so a retried extract adds no duplicates
+            return {"documents": [name for name, _ in documents]}
+
+        def classify(payload):
+            single_result = {"people": [], "hardware": []}
+            if not self._classify_content(client, payload["text"], model_name, payload["name"], single_result):
+                raise ValueError(f"Unparseable classification of {payload['name']}")
+            return {category: payload["name"] in single_result[category] for category in ("people", "hardware")}
+
+        return {"extract": extract, "classify": classify}
+
+    def collect_queued_results(self, job_queue: JobQueue) -> dict:
+        """Builds the result from the completed "classify" jobs, in directory order."""
+        for queue_name in ("extract", "classify"):
+            failed = job_queue.counts(queue_name).get("failed", 0)
+            if failed:
+                self.logger.error(f"{failed} {queue_name} jobs failed and are missing from the result")
+        completed = sorted(job_queue.results("classify").items(), key=lambda item: item[1]["payload"]["order"])
+        result_data = {category: [filename for filename, job in completed if job["result"][category]]
+                       for category in ("people", "hardware")}
+        return self._finalize_result(result_data)
+
+    def ask_question_distributed(self, client, base_path: str, model_name: str, job_queue: JobQueue,
+                                 local_workers: int = 1) -> dict:
+        """
+        Same as ask_question, but through a durable job queue: files are queued
+        as extract jobs, and any number of workers (the local ones started here
+        and `--worker` processes on other hosts sharing the queue file) extract
+        and classify them. Returns once the queue is drained.
+
+        Args:
+            client: The Gemini API client.
+            base_path (str): The path to the directory containing files to process.
+            model_name (str): The name of the Gemini model to use.
+            job_queue (JobQueue): The shared queue.
+            local_workers (int, optional): Worker threads in this process; 0 only waits for remote workers.
+
+        Returns:
+            dict: A dictionary containing lists of filenames classified as 'people' and 'hardware'.
+        """
+        logger = self.logger
+        added = self.enqueue_documents(job_queue, base_path)
+        logger.info(f"Queued {added} files for extraction")
+        handlers = self.job_handlers(client, model_name, job_queue)
+        workers = [threading.Thread(target=Worker(logger, job_queue, handlers).run, daemon=True) for _ in range(local_workers)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        while not job_queue.is_drained(list(handlers)):
+            time.sleep(1.0)
+        return self.collect_queued_results(job_queue)
+
+    def _finalize_result(self, result_data: dict) -> dict:
+        """
+        Applies the final clean-up shared by all processing modes.
+        """
+        logger = self.logger
         logger.info(f"Result data: {result_data}")
 
         # Remove 'other' category from result_data if it exists
@@ -262,16 +892,169 @@ class Classification:
 
         return result_data
 
+    def ask_question_pipelined(self, client, base_path: str, model_name: str,
+                               extract_workers: int = 4, classify_workers: int = 2, queue_size: int = 8) -> dict:
+        """
+        Same as ask_question, but runs extraction (OCR, transcription, reads) and
+        classification in separate worker pools connected by bounded queues, so
+        network waits of the two stages overlap.
+
+        Args:
+            client: The Gemini API client.
+            base_path (str): The path to the directory containing files to process.
+            model_name (str): The name of the Gemini model to use.
+            extract_workers (int, optional): Number of extraction threads.
+            classify_workers (int, optional): Number of classification threads.
+            queue_size (int, optional): Capacity of each queue between stages.
+
+        Returns:
+            dict: A dictionary containing lists of filenames classified as 'people' and 'hardware'.
+        """
+        logger = self.logger
+        order = {}
+        file_queue = queue.Queue(maxsize=queue_size)
+        content_queue = queue.Queue(maxsize=queue_size)
+        extract_stats = StageStats("extract", extract_workers)
+        classify_stats = StageStats("classify", classify_workers)
+        result_lock = threading.Lock()
+        result_data = {
+            "people": [],
+            "hardware": [],
+        }
+
+        def extract_worker():
+            while (document := file_queue.get()) is not None:
+                started = time.perf_counter()
+                try:
+                    text_content = self._extract_document(client, document, model_name)
+                except Exception as e:
+                    logger.error(f"Error extracting content from {document.name}: {e}")
+                    text_content = None
+                extract_stats.add(time.perf_counter() - started)
+                content_queue.put((document.name, text_content))
+
+        def classify_worker():
+            while (item := content_queue.get()) is not None:
+                file, text_content = item
+                started = time.perf_counter()
+                file_result = {"people": [], "hardware": []}
+                try:
+                    self._classify_content(client, text_content, model_name, file, file_result)
+                except Exception as e:
+                    logger.error(f"Error classifying {file}: {e}")
+                classify_stats.add(time.perf_counter() - started)
+                with result_lock:
+                    result_data["people"].extend(file_result["people"])
+                    result_data["hardware"].extend(file_result["hardware"])
+
+        started = time.perf_counter()
+        extractors = [threading.Thread(target=extract_worker, daemon=True) for _ in range(extract_workers)]
+        classifiers = [threading.Thread(target=classify_worker, daemon=True) for _ in range(classify_workers)]
+        for thread in extractors + classifiers:
+            thread.start()
+
+        # Archives are read member by member here, so the bounded queue also bounds memory
+        for document in self.ingestor.iter_directory(base_path):
+            logger.info(f"Queueing file: {document.name}")
+            order[document.name] = len(order)
+            file_queue.put(document)
+        for _ in extractors:
+            file_queue.put(None)
+        for thread in extractors:
+            thread.join()
+        for _ in classifiers:
+            content_queue.put(None)
+        for thread in classifiers:
+            thread.join()
+        wall_seconds = time.perf_counter() - started
+
+        # Keep the directory order of the sequential mode
+        for category in result_data:
+            result_data[category].sort(key=order.get)
+
+        for stats in (extract_stats, classify_stats):
+            logger.info(event="Pipeline stage stats", wall_seconds=round(wall_seconds, 3), **stats.report(wall_seconds))
+        return self._finalize_result(result_data)
+
 if __name__ == "__main__":
     setup_logging()
     logger = structlog.get_logger(__name__)
-    client = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
-    AIDEVS_API_KEY = os.getenv('AIDEVS_API_KEY')
+    client = genai.Client(api_key=get_secret('GEMINI_API_KEY'))
+    AIDEVS_API_KEY = get_secret('AIDEVS_API_KEY')
     base_path = "./documents/pliki_z_fabryki"
     model_name = "gemini-2.0-flash"
 
-    classification = Classification(logger)
+    prefilter = None
+    if "--prefilter" in sys.argv:
+        prefilter = LocalPrefilter(logger).fit(load_labels(DEFAULT_LABELS_PATH))
+    prompt_cache = PromptCache(logger, client) if "--cache-prompt" in sys.argv else None
+    admission = AdmissionController(logger, {
+        ("gemini", "*"): ProviderLimits(
+            requests_per_minute=float(os.getenv('GEMINI_RPM', '15')),
+            tokens_per_minute=float(os.getenv('GEMINI_TPM', '1000000'))
+        )
+    })
+    if "--evaluate-prefilter" in sys.argv:
+        evaluator = Classification(logger, admission=admission)  # <--- No prefilter and no labels_path: only asks the LLM
+
+        def llm(text_content):
+            single_result = {"people": [], "hardware": []}
+            if not evaluator._classify_content(client, text_content, model_name, "evaluation", single_result):
+                return None
+            return {category: "evaluation" in single_result[category] for category in ("people", "hardware")}
+
+        print(json.dumps(LocalPrefilter(logger).evaluate(load_labels(DEFAULT_LABELS_PATH), llm), indent=2))
+        print(f"LLM calls: {evaluator.llm_calls}")
+        sys.exit(0)
+    other_modes = [flag for flag in ("--worker", "--distributed", "--offline", "--pipelined", "--batched") if flag in sys.argv]
+    if "--dedup" in sys.argv and other_modes:
+        raise ValueError(f"--dedup only applies to the default mode, not to {', '.join(other_modes)}")
+    archive_password = get_secret('ARCHIVE_PASSWORD')  # <--- weapons_tests.zip is encrypted
+    ingestor = DocumentIngestor(logger, archive_password=archive_password.encode() if archive_password else None)
+    hedging = None
+    if "--hedge" in sys.argv:
+        hedging = HedgingPolicy(logger, backup_models={model_name: os.getenv('GEMINI_BACKUP_MODEL', model_name)})
+    classification = Classification(logger, prefilter=prefilter, labels_path=DEFAULT_LABELS_PATH, prompt_cache=prompt_cache,
+                                    ingestor=ingestor, streaming="--stream" in sys.argv, admission=admission, hedging=hedging,
+                                    cascade=ModelCascade(logger) if "--cascade" in sys.argv else None,
+                                    dedup_threshold=float(os.getenv('DEDUP_THRESHOLD', '0.8')) if "--dedup" in sys.argv else None,
+                                    audit_rate=float(os.getenv('DEDUP_AUDIT_RATE', '0.0')),
+                                    few_shot_k=int(os.getenv('FEW_SHOT_K', '2')) if "--few-shot" in sys.argv else None,
+                                    results_store=ResultsStore(logger, os.getenv('RESULTS_STORE_PATH', DEFAULT_STORE_PATH)))
+
+    job_queue = None
+    if "--worker" in sys.argv or "--distributed" in sys.argv:
+        job_queue = JobQueue(logger, os.getenv('JOB_QUEUE_PATH', DEFAULT_QUEUE_PATH),
+                             journal_mode=os.getenv('JOB_QUEUE_JOURNAL_MODE', 'WAL'))
+    if "--worker" in sys.argv:
+        print(f"Worker: {Worker(logger, job_queue, classification.job_handlers(client, model_name, job_queue)).run()}")
+        sys.exit(0)
 
-    result = classification.ask_question(client, base_path, model_name)
+    if "--distributed" in sys.argv:
+        result = classification.ask_question_distributed(client, base_path, model_name, job_queue,
+                                                         local_workers=int(os.getenv('LOCAL_WORKERS', '1')))
+    elif "--offline" in sys.argv:
+        runner = BatchJobRunner(logger, GeminiBatchBackend(client),
+                                poll_interval_seconds=float(os.getenv('BATCH_POLL_SECONDS', '60')))
+        result = classification.ask_question_offline(client, base_path, model_name, runner)
+    elif "--pipelined" in sys.argv:
+        result = classification.ask_question_pipelined(client, base_path, model_name)
+    elif "--batched" in sys.argv:
+        result = classification.ask_question_batched(client, base_path, model_name)
+    else:
+        result = classification.ask_question(client, base_path, model_name)
     print(result)
+    if prompt_cache:
+        prompt_cache.close()
+    print(f"LLM calls: {classification.llm_calls}, decided locally: {classification.local_decisions}")
+    print(f"Admission: {admission.report()}")
+    if classification.dedup_threshold is not None:
+        print(f"Deduplication: {classification.dedup_stats}")
+    if classification.cascade:
+        print(f"Cascade: {classification.cascade.report()}")
+    if classification.hedging:
+        print(f"Hedging: {classification.hedging.report()}")
+    print(f"Prompt tokens: {classification.prompts.report()}")
+    if "--save-prompt-baseline" in sys.argv:
+        classification.prompts.save_baseline()
     send_answer("kategorie", AIDEVS_API_KEY, result)
\ No newline at end of file
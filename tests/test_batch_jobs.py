@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from config.batch_jobs import BatchJobRunner, LocalBatchStandIn, build_request, response_text, text_part
+
+
+@pytest.fixture
+def requests():
+    return {f"doc-{number}": build_request([text_part(f"document {number}")]) for number in range(5)}
+
+
+def runner(tmp_path, backend, **kwargs):
+    return BatchJobRunner(None, backend, state_dir=str(tmp_path), chunk_size=2, poll_interval_seconds=0.01, **kwargs)
+
+
+def test_results_are_mapped_back_to_keys(tmp_path, requests):
+    stand_in = LocalBatchStandIn(lambda key, request: f"echo of {key}")
+    results = runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests)
+    assert results == {key: f"echo of {key}" for key in requests}
+    assert stand_in.submitted == 3
+
+
+def test_resume_reuses_submitted_chunks(tmp_path, requests):
+    stand_in = LocalBatchStandIn(lambda key, request: key, delay_seconds=0.05)
+    first = runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests, wait=False)
+    assert all(value is None for value in first.values())
+    second = runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests)
+    assert second == {key: key for key in requests}
+    assert stand_in.submitted == 3
+
+
+def test_changed_requests_start_a_new_job(tmp_path, requests):
+    stand_in = LocalBatchStandIn(lambda key, request: key)
+    runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests)
+    requests["doc-5"] = build_request([text_part("document 5")])
+    assert runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests)["doc-5"] == "doc-5"
+    assert stand_in.submitted == 6
+
+
+def test_failed_request_is_none(tmp_path, requests):
+    def responder(key, request):
+        if key == "doc-1":
+            raise ValueError("blocked")
+        return key
+
+    results = runner(tmp_path, LocalBatchStandIn(responder)).run("demo", "gemini-2.0-flash", requests)
+    assert results["doc-1"] is None and results["doc-0"] == "doc-0"
+
+
+def test_failed_chunks_are_resubmitted_up_to_the_limit(tmp_path, requests):
+    stand_in = LocalBatchStandIn(lambda key, request: key)
+    state = stand_in.state
+    stand_in.state = lambda job_name: "JOB_STATE_FAILED" if job_name == "batches/local-1" else state(job_name)
+    assert runner(tmp_path, stand_in).run("demo", "gemini-2.0-flash", requests) == {key: key for key in requests}
+    assert stand_in.submitted == 4
+
+    stand_in.state = lambda job_name: "JOB_STATE_FAILED"
+    results = runner(tmp_path / "failing", stand_in, max_resubmits=1).run("demo", "gemini-2.0-flash", requests)
+    assert all(value is None for value in results.values())
+    assert stand_in.submitted == 4 + 3 * 2
+    runner(tmp_path / "failing", stand_in, max_resubmits=1).run("demo", "gemini-2.0-flash", requests)
+    assert stand_in.submitted == 10  # <--- Retries are exhausted, resuming submits nothing
+    with open(tmp_path / "failing" / "demo.state.json") as f:
+        assert [chunk["submissions"] for chunk in json.load(f)["chunks"]] == [2, 2, 2]
+
+
+def test_response_text_joins_parts():
+    response = {"candidates": [{"content": {"parts": [{"text": "a"}, {"text": "b"}]}}]}
+    assert response_text(response) == "ab"
@@ -0,0 +1,53 @@
+import importlib
+from types import SimpleNamespace
+
+import pytest
+
+PAGE = '<p id="human-question">Question:<br />Rok zdobycia Konstantynopola przez Turków?</p>'
+
+
+@pytest.fixture
+def captcha(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # <--- The module sets up logs/ and keeps its memo in downloads/
+    return importlib.import_module("tasks.s01e01.captcha")
+
+
+class LoginSession:
+    def __init__(self, accepted_answer):
+        self.accepted_answer = accepted_answer
+        self.answers = []
+
+    def post(self, url, data):
+        self.answers.append(data["answer"])
+        ok = data["answer"] == self.accepted_answer
+        return SimpleNamespace(ok=True, text="Welcome" if ok else PAGE)
+
+
+def test_extract_question(captcha):
+    assert captcha.extract_question(PAGE) == "Rok zdobycia Konstantynopola przez Turków?"
+    assert captcha.extract_question("<p>nothing here</p>") is None
+
+
+def test_non_numeric_answer_moves_on_to_the_next_question(captcha, monkeypatch):
+    session = LoginSession(1453)
+    monkeypatch.setattr(captcha.requests, "Session", lambda: session)
+    monkeypatch.setattr(captcha, "fetch_question_page", lambda s: (s, PAGE))
+    answers = iter(["around 1450", "1453"])
+    monkeypatch.setattr(captcha, "solve_captcha",
+                        lambda question, memo, hedging, cascade: captcha.parse_captcha_answer(next(answers)))
+
+    response = captcha.login(attempts=3, prefetch=False)
+    assert response.text == "Welcome" and session.answers == [1453]
+    assert captcha.load_memo() == {"rok zdobycia konstantynopola przez turków": 1453}
+
+
+def test_login_without_any_answer_returns_none(captcha, monkeypatch):
+    session = LoginSession(1453)
+    monkeypatch.setattr(captcha.requests, "Session", lambda: session)
+    monkeypatch.setattr(captcha, "fetch_question_page", lambda s: (s, PAGE))
+
+    def unanswerable(question, memo, hedging, cascade):
+        raise ValueError("invalid literal for int()")
+
+    monkeypatch.setattr(captcha, "solve_captcha", unanswerable)
+    assert captcha.login(attempts=2) is None and session.answers == []
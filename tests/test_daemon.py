@@ -0,0 +1,33 @@
+import json
+import os
+import subprocess
+
+import pytest
+
+from config.daemon import BENCHMARK_FUNCTIONS, BENCHMARK_SCRIPTS, PROJECT_ROOT, _benchmark_job, benchmark, benchmark_entry_points
+
+
+def test_entry_points_cover_scripts_and_functions(monkeypatch):
+    monkeypatch.chdir(PROJECT_ROOT)
+    entries = benchmark_entry_points()
+    assert entries[:len(BENCHMARK_SCRIPTS)] == [path for path in BENCHMARK_SCRIPTS if os.path.exists(path)]
+    assert entries[-len(BENCHMARK_FUNCTIONS):] == list(BENCHMARK_FUNCTIONS)
+
+
+def test_function_entry_becomes_a_function_job():
+    command, job = _benchmark_job("tasks.s01e01.captcha:login")
+    assert job == {"function": "tasks.s01e01.captcha:login", "kwargs": {"attempts": 1}}
+    assert json.loads(command[-1]) == {"attempts": 1}
+
+
+def test_cold_command_calls_the_function(monkeypatch):
+    monkeypatch.setitem(BENCHMARK_FUNCTIONS, "json:loads", {"s": "[1]"})
+    assert subprocess.run(_benchmark_job("json:loads")[0]).returncode == 0
+    monkeypatch.setitem(BENCHMARK_FUNCTIONS, "json:loads", {"s": "not json"})
+    assert subprocess.run(_benchmark_job("json:loads")[0], capture_output=True).returncode != 0
+
+
+@pytest.mark.parametrize("entry", ["tasks/s02e01/mp3.py", "tasks.s02e01.mp3:main", "os:system"])
+def test_unlisted_entries_are_rejected_before_anything_runs(entry):
+    with pytest.raises(ValueError):
+        benchmark(["tasks/s01e01/captcha.py", entry], socket_path="/nonexistent.sock")
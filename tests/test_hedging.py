@@ -0,0 +1,73 @@
+import time
+import asyncio
+
+import pytest
+
+from config.hedging import HedgeBudgetExceeded, HedgingPolicy
+
+
+def policy(**kwargs):
+    return HedgingPolicy(None, initial_delay_seconds=0.05, **kwargs)
+
+
+def test_hedge_wins_but_only_the_primary_latency_is_recorded():
+    hedging = policy()
+
+    def slow():
+        time.sleep(0.3)
+        return "primary"
+
+    assert hedging.call("ocr", slow, lambda: "hedge") == "hedge"
+    assert list(hedging._latencies["ocr"]) == []  # <--- The hedge's quick answer is not a sample
+    time.sleep(0.35)
+    assert list(hedging._latencies["ocr"]) == [pytest.approx(0.3, abs=0.1)]
+    assert hedging.report()["ocr"]["hedges_won"] == 1
+
+
+def test_failed_primary_adds_no_sample():
+    hedging = policy()
+
+    def broken():
+        raise ConnectionError("reset")
+
+    assert hedging.call("ocr", broken, lambda: "hedge") == "hedge"
+    assert list(hedging._latencies["ocr"]) == []
+
+
+def test_sync_call_stops_waiting_at_the_budget():
+    hedging = policy(budget_seconds=0.15)
+    assert hedging.attempt_timeout() == 0.15
+    with pytest.raises(HedgeBudgetExceeded):
+        hedging.call("ocr", lambda: time.sleep(0.5))
+    assert hedging.report()["ocr"]["budget_exceeded"] == 1
+
+
+def test_async_loser_is_cancelled():
+    hedging = policy()
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append("primary")
+            raise
+        return "primary"
+
+    async def fast():
+        return "hedge"
+
+    async def main():
+        result = await hedging.call_async("ready", slow, fast)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == "hedge"
+    assert cancelled == ["primary"] and list(hedging._latencies["ready"]) == []
+
+
+def test_primary_latencies_drive_the_hedge_delay():
+    hedging = policy(min_samples=3, percentile=0.5)
+    for _ in range(3):
+        hedging.call("captcha", lambda: time.sleep(0.01))
+    assert hedging.hedge_delay("captcha") == pytest.approx(0.01, abs=0.02)
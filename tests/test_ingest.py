@@ -0,0 +1,73 @@
+import io
+import zipfile
+
+import pytest
+
+from config.ingest import DocumentIngestor, sniff
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 16
+MP3 = b"ID3\x04\x00" + b"\x00" * 16
+
+
+def zip_bytes(members: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("head, expected", [
+    (PNG, ("image", "image/png")),
+    (b"\xff\xd8\xff\xe0", ("image", "image/jpeg")),
+    (b"RIFF\x00\x00\x00\x00WEBPVP8 ", ("image", "image/webp")),
+    (MP3, ("audio", "audio/mpeg")),
+    (b"RIFF\x00\x00\x00\x00WAVEfmt ", ("audio", "audio/wav")),
+    (zip_bytes({"a.txt": b"a"}), ("zip", "application/zip")),
+    ("Raport z sektora C4: zatrzymano".encode("utf-8"), ("text", "text/plain")),
+    ("żółw".encode("utf-8")[:-1], ("text", "text/plain")),  # <--- Multi-byte character cut by the sniff window
+    (b"\x00\x01\x02binary", None),
+    (b"", None),
+])
+def test_sniff_by_magic_bytes(head, expected):
+    assert sniff(head) == expected
+
+
+def test_files_are_routed_by_content_not_extension(tmp_path):
+    (tmp_path / "photo.txt").write_bytes(PNG)
+    (tmp_path / "notes.png").write_text("plain notes")
+    (tmp_path / "blob.bin").write_bytes(b"\x00\x01")
+    documents = {d.name: d.kind for d in DocumentIngestor(None).iter_directory(str(tmp_path))}
+    assert documents == {"photo.txt": "image", "notes.png": "text"}
+
+
+def test_nested_archives_are_read_from_memory(tmp_path):
+    inner = zip_bytes({"deep.mp3": MP3})
+    (tmp_path / "drop.zip").write_bytes(zip_bytes({"report.txt": b"report", "nested/inner.zip": inner}))
+    documents = [(d.name, d.kind, d.data) for d in DocumentIngestor(None).iter_path(str(tmp_path / "drop.zip"))]
+    assert documents == [("drop.zip/report.txt", "text", b"report"),
+                         ("drop.zip/nested/inner.zip/deep.mp3", "audio", MP3)]
+
+
+def test_nesting_deeper_than_max_depth_is_skipped(tmp_path):
+    (tmp_path / "drop.zip").write_bytes(zip_bytes({"inner.zip": zip_bytes({"deep.txt": b"deep"}), "top.txt": b"top"}))
+    documents = [d.name for d in DocumentIngestor(None, max_depth=1).iter_path(str(tmp_path / "drop.zip"))]
+    assert documents == ["drop.zip/top.txt"]
+
+
+def test_size_cap_stops_reading_the_archive(tmp_path):
+    (tmp_path / "drop.zip").write_bytes(zip_bytes({"a.txt": b"a" * 60, "b.txt": b"b" * 60, "c.txt": b"c" * 10}))
+    documents = [d.name for d in DocumentIngestor(None, archive_cap_bytes=100).iter_path(str(tmp_path / "drop.zip"))]
+    assert documents == ["drop.zip/a.txt"]
+
+
+def test_size_cap_covers_nested_archives(tmp_path):
+    inner = zip_bytes({"inner.txt": b"i" * 60})
+    (tmp_path / "drop.zip").write_bytes(zip_bytes({"a.txt": b"a" * 50, "inner.zip": inner}))
+    ingestor = DocumentIngestor(None, archive_cap_bytes=len(inner) + 80)
+    assert [d.name for d in ingestor.iter_path(str(tmp_path / "drop.zip"))] == ["drop.zip/a.txt"]
+
+
+def test_invalid_archive_yields_nothing(tmp_path):
+    (tmp_path / "broken.zip").write_bytes(b"PK\x03\x04" + b"\x00" * 40)
+    assert list(DocumentIngestor(None).iter_path(str(tmp_path / "broken.zip"))) == []
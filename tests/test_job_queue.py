@@ -0,0 +1,90 @@
+import time
+import threading
+
+import pytest
+
+from config.job_queue import JobQueue, Worker
+
+
+@pytest.fixture
+def job_queue(tmp_path):
+    queue = JobQueue(None, str(tmp_path / "jobs.sqlite"), lease_seconds=0.2)
+    yield queue
+    queue.close()
+
+
+def test_enqueue_is_idempotent_per_key(job_queue):
+    assert job_queue.enqueue_many("extract", [("a", {"n": 1}), ("b", {"n": 2})]) == 2
+    assert job_queue.enqueue_many("extract", [("a", {"n": 10}), ("c", {"n": 3})]) == 1
+    assert not job_queue.enqueue("extract", "b", {"n": 20})
+    assert job_queue.counts("extract") == {"pending": 3}
+
+
+def test_lease_is_exclusive_until_it_expires(job_queue):
+    job_queue.enqueue("extract", "a", {})
+    [job] = job_queue.lease(["extract"], "first")
+    assert job.attempts == 1
+    assert job_queue.lease(["extract"], "second") == []
+
+    time.sleep(0.25)
+    [again] = job_queue.lease(["extract"], "second")
+    assert again.id == job.id and again.attempts == 2
+    assert not job_queue.heartbeat(job.id, "first")
+    assert job_queue.heartbeat(job.id, "second")
+
+
+def test_first_completion_wins(job_queue):
+    job_queue.enqueue("classify", "a", {"order": 0})
+    [job] = job_queue.lease(["classify"], "worker")
+    assert job_queue.complete(job.id, {"people": True})
+    assert not job_queue.complete(job.id, {"people": False})
+    assert job_queue.results("classify") == {"a": {"result": {"people": True}, "payload": {"order": 0}}}
+
+
+def test_failed_job_is_retried_up_to_max_attempts(job_queue):
+    job_queue.enqueue("extract", "a", {}, max_attempts=2)
+    for _ in range(2):
+        [job] = job_queue.lease(["extract"], "worker")
+        job_queue.fail(job.id, "worker", "boom")
+    assert job_queue.lease(["extract"], "worker") == []
+    assert job_queue.counts("extract") == {"failed": 1}
+    assert job_queue.is_drained(["extract"])
+
+
+def test_expired_lease_without_attempts_left_is_failed(job_queue):
+    job_queue.enqueue("extract", "a", {}, max_attempts=1)
+    job_queue.lease(["extract"], "dead-worker")
+    time.sleep(0.25)
+    assert job_queue.lease(["extract"], "worker") == []
+    assert job_queue.counts("extract") == {"failed": 1}
+
+
+def test_workers_drain_follow_up_jobs(job_queue):
+    job_queue.enqueue_many("extract", [(str(number), {"number": number}) for number in range(5)])
+
+    def extract(payload):
+        job_queue.enqueue("classify", f"doc-{payload['number']}", payload)
+        return {}
+
+    handlers = {"extract": extract, "classify": lambda payload: payload["number"] * 2}
+    workers = [Worker(None, job_queue, handlers, idle_seconds=0.01) for _ in range(3)]
+    threads = [threading.Thread(target=worker.run) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    results = job_queue.results("classify")
+    assert {key: job["result"] for key, job in results.items()} == {f"doc-{number}": number * 2 for number in range(5)}
+    assert sum(worker.stats["completed"] for worker in workers) == 10
+
+
+def test_worker_fails_job_when_handler_raises(job_queue):
+    job_queue.enqueue("classify", "a", {}, max_attempts=2)
+
+    def classify(payload):
+        raise ValueError("Unparseable classification")
+
+    stats = Worker(None, job_queue, {"classify": classify}, idle_seconds=0.01).run()
+    assert stats == {"completed": 0, "duplicates": 0, "failed": 2}
+    assert job_queue.counts("classify") == {"failed": 1}
@@ -0,0 +1,121 @@
+import time
+
+import pytest
+
+from config.load_balancer import Endpoint, LoadBalancer, is_endpoint_error
+from config.rate_limiter import ProviderLimits, RateLimitError
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class APIConnectionError(Exception):
+    """Named like openai.APIConnectionError."""
+
+
+def balancer(*names, **kwargs):
+    limits = ProviderLimits(requests_per_minute=6000, initial_concurrency=8)
+    return LoadBalancer(None, [Endpoint(name, "unused", limits=limits, client=name) for name in names], **kwargs)
+
+
+@pytest.mark.parametrize("error, expected", [
+    (StatusError(401), True),
+    (StatusError(403), True),
+    (StatusError(503), True),
+    (ConnectionError("reset"), True),
+    (APIConnectionError("timeout"), True),
+    (StatusError(400), False),
+    (StatusError(404), False),
+    (StatusError(422), False),
+    (ValueError("caller could not parse the response"), False),
+])
+def test_endpoint_errors(error, expected):
+    assert is_endpoint_error(error) is expected
+
+
+def test_invalid_request_is_raised_without_retry_or_health_penalty():
+    lb = balancer("a", "b")
+    calls = []
+
+    def bad_request(client, model_name):
+        calls.append(client)
+        raise StatusError(400)
+
+    with pytest.raises(StatusError):
+        lb.call("gpt-4o-mini", bad_request)
+    assert len(calls) == 1
+    report = lb.report()[calls[0]]
+    assert report["rejected"] == 1 and report["failed"] == 0 and report["error_rate"] == 0.0
+
+
+def test_failing_endpoint_is_ejected_and_traffic_moves():
+    lb = balancer("a", "b", max_consecutive_failures=1, eject_seconds=30)
+
+    def complete(client, model_name):
+        if client == "a":
+            raise StatusError(503)
+        return client
+
+    assert [lb.call("gpt-4o-mini", complete) for _ in range(10)] == ["b"] * 10
+    report = lb.report()
+    assert report["a"]["ejected"] == 1 and report["a"]["ejected_for"] > 0
+    assert report["b"]["succeeded"] == 10
+
+
+def test_rate_limits_do_not_eject():
+    lb = balancer("a", "b", max_consecutive_failures=1)
+
+    def complete(client, model_name):
+        if client == "a":
+            raise RateLimitError()
+        return client
+
+    for _ in range(5):
+        lb.call("gpt-4o-mini", complete)
+    assert lb.report()["a"]["ejected"] == 0
+
+
+def test_probe_success_rejoins_the_endpoint():
+    lb = balancer("a", "b", max_consecutive_failures=1, eject_seconds=0.05)
+    healthy = {"a": False}
+
+    def complete(client, model_name):
+        if client == "a" and not healthy["a"]:
+            raise StatusError(500)
+        return client
+
+    while lb.report()["a"]["ejected"] == 0:
+        lb.call("gpt-4o-mini", complete)
+    healthy["a"] = True
+    time.sleep(0.06)
+    assert lb.call("gpt-4o-mini", complete) == "a"  # <--- The probe goes to the endpoint that was ejected
+    assert lb.health["a"].ejections == 0 and lb.health["a"].error_rate == 0.0
+
+
+def test_model_prefix_is_applied():
+    lb = LoadBalancer(None, [Endpoint("openrouter-0", "unused", model_prefix="openai/", client="router")])
+    assert lb.call("gpt-4o-mini", lambda client, model_name: model_name) == "openai/gpt-4o-mini"
+
+
+def test_cancelled_probe_lets_the_next_request_probe():
+    lb = balancer("a", "b", max_consecutive_failures=1, eject_seconds=0.05)
+
+    def complete(client, model_name):
+        if client == "a":
+            raise StatusError(500)
+        return client
+
+    while lb.report()["a"]["ejected"] == 0:
+        lb.call("gpt-4o-mini", complete)
+    time.sleep(0.06)
+
+    def interrupted(client, model_name):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        lb.call("gpt-4o-mini", interrupted)  # <--- The probe goes to "a" and is interrupted
+    assert not lb.health["a"].probing
+    assert lb.call("gpt-4o-mini", lambda client, model_name: client) == "a"
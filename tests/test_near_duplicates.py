@@ -0,0 +1,40 @@
+from config.near_duplicates import NearDuplicateIndex, choose_bands, shingles
+
+REPORT = ("Godzina 02:13, sektor C4. Czujnik ruchu wykrył osobnika w pobliżu ogrodzenia. "
+          "Patrol zatrzymał podejrzanego i przekazał go do działu kontroli.")
+
+
+def test_choose_bands_splits_the_signature():
+    bands, rows = choose_bands(128, 0.8)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+
+def test_shingles_of_short_text():
+    assert shingles("") == set()
+    assert len(shingles("sensor")) == 1
+
+
+def test_identical_texts_have_similarity_one():
+    index = NearDuplicateIndex(None)
+    assert index.similarity(index.signature(REPORT), index.signature(REPORT)) == 1.0
+
+
+def test_near_duplicate_joins_the_cluster():
+    index = NearDuplicateIndex(None, threshold=0.7)
+    assert index.add("report-01.txt", REPORT) == "report-01.txt"
+    assert index.add("report-02.txt", REPORT.replace("02:13", "02:14")) == "report-01.txt"
+    assert index.clusters == {"report-01.txt": ["report-01.txt", "report-02.txt"]}
+    assert index.representative_of["report-02.txt"] == "report-01.txt"
+
+
+def test_different_texts_start_their_own_clusters():
+    index = NearDuplicateIndex(None, threshold=0.8)
+    index.add("report-01.txt", REPORT)
+    other = "Naprawiono przewód zasilający w jednostce transportowej. Bateria wymieniona, usterka usunięta."
+    assert index.add("report-03.txt", other) == "report-03.txt"
+    assert len(index.clusters) == 2
+
+
+def test_signatures_are_reproducible_across_instances():
+    assert NearDuplicateIndex(None, seed=7).signature(REPORT) == NearDuplicateIndex(None, seed=7).signature(REPORT)
@@ -0,0 +1,90 @@
+import random
+
+import pytest
+
+from config.prefilter import LogisticModel, LocalPrefilter, PlattCalibrator, append_label, featurize, load_labels
+
+PEOPLE = ["Captured an intruder near the fence, the man was handed over to the patrol.",
+          "Found a person hiding in the warehouse, identity being checked.",
+          "Two strangers detained at the gate, they claimed to be lost.",
+          "A woman was caught near sector C and interrogated by the guards."]
+HARDWARE = ["Replaced the broken antenna cable on the north tower.",
+            "The motion sensor was repaired, a faulty relay was swapped.",
+            "Fixed the damaged camera housing and restored the power supply.",
+            "Battery pack of the drone replaced after a hardware failure."]
+OTHER = ["Quiet night, nothing to report in the area.",
+         "Routine patrol finished without incidents.",
+         "Weather was calm, no activity observed near the fence.",
+         "The shift ended on time, all quiet."]
+
+
+def records():
+    data = [{"filename": f"p{i}", "text": t, "people": True, "hardware": False} for i, t in enumerate(PEOPLE)]
+    data += [{"filename": f"h{i}", "text": t, "people": False, "hardware": True} for i, t in enumerate(HARDWARE)]
+    data += [{"filename": f"o{i}", "text": t, "people": False, "hardware": False} for i, t in enumerate(OTHER)]
+    random.Random(1).shuffle(data)
+    return data * 3
+
+
+def test_label_store_keeps_the_latest_record_per_file(tmp_path):
+    path = str(tmp_path / "labels.jsonl")
+    append_label(path, "a.txt", "text", {"people": True})
+    append_label(path, "a.txt", "text", {"hardware": "yes"})
+    assert load_labels(path) == [{"filename": "a.txt", "text": "text", "people": False, "hardware": True}]
+    assert load_labels(str(tmp_path / "missing.jsonl")) == []
+
+
+def test_logistic_model_separates_the_training_data():
+    samples = [featurize(text) for text in PEOPLE + OTHER]
+    model = LogisticModel().fit(samples, [1] * len(PEOPLE) + [0] * len(OTHER))
+    assert all(model.decision(s) > 0 for s in samples[:len(PEOPLE)])
+    assert all(model.decision(s) < 0 for s in samples[len(PEOPLE):])
+
+
+def test_calibration_is_monotonic_and_smoothed():
+    scores, targets = [-3, -2, -1, 1, 2, 3], [0, 0, 0, 1, 1, 1]
+    calibrator = PlattCalibrator().fit(scores, targets)
+    probabilities = [calibrator.probability(score) for score in scores]
+    assert probabilities == sorted(probabilities)
+    assert probabilities[0] > 0.0 and probabilities[-1] < 1.0  # <--- Smoothed targets never reach 0 or 1
+    assert 0.25 < calibrator.probability(0) < 0.75
+
+
+def test_untrained_prefilter_always_escalates():
+    prefilter = LocalPrefilter(None).fit(records()[:3])
+    assert not prefilter.trained
+    assert prefilter.decide(PEOPLE[0]) is None
+    assert prefilter.decide("Entry deleted.") == {"people": False, "hardware": False}  # <--- Rules still apply
+
+
+def test_threshold_controls_what_is_decided_locally():
+    data = records()
+    lenient, strict = LocalPrefilter(None, threshold=0.5).fit(data), LocalPrefilter(None, threshold=1.0).fit(data)
+    assert lenient.decide(HARDWARE[0]) == {"people": False, "hardware": True}
+    assert strict.decide(HARDWARE[0]) is None
+
+
+def test_evaluation_without_an_llm_is_an_upper_bound():
+    report = LocalPrefilter(None, threshold=0.99).evaluate(records())
+    assert "combined" not in report and "llm_failures" not in report
+    assert report["combined_upper_bound"]["people"] == {"precision": 1.0, "recall": 1.0}
+
+
+def test_evaluation_scores_escalated_documents_with_the_llm_answers():
+    calls = []
+
+    def llm(text):
+        calls.append(text)
+        return None if text in OTHER else {"people": False, "hardware": False}  # <--- Misses everything
+
+    report = LocalPrefilter(None, threshold=1.0).evaluate(records(), llm)
+    assert report["decided_locally"] == 0 and len(calls) == len(records())
+    assert report["llm_failures"] == 3 * len(OTHER)
+    assert report["combined"]["people"] == {"precision": None, "recall": 0.0}
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.8])
+def test_local_decisions_save_llm_calls(threshold):
+    report = LocalPrefilter(None, threshold=threshold).evaluate(records(), lambda text: {"people": False, "hardware": False})
+    assert report["decided_locally"] > 0
+    assert report["llm_calls_saved"] == round(report["decided_locally"] / report["documents"], 3)
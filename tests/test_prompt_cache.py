@@ -0,0 +1,61 @@
+import pytest
+
+from config.prompt_cache import LocalCacheStandIn, PromptCache, min_cache_tokens, normalize_prompt
+from config.tokens import estimate_tokens
+
+PROMPT = normalize_prompt("You are a classifier. " * 1000)
+
+
+class StatusError(Exception):
+    def __init__(self, code):
+        super().__init__(f"HTTP {code}")
+        self.code = code
+
+
+def test_cached_prompt_is_billed_once():
+    stand_in = LocalCacheStandIn()
+    cache = PromptCache(None, stand_in)
+    for _ in range(25):
+        cache.generate_content("gemini-2.0-flash", PROMPT, "entry deleted")
+    assert stand_in.created == 1 and stand_in.calls == 25
+    assert stand_in.billed_input_tokens == estimate_tokens(PROMPT) + 25 * estimate_tokens("entry deleted")
+
+
+def test_small_prompt_is_sent_inline():
+    stand_in = LocalCacheStandIn()
+    cache = PromptCache(None, stand_in)
+    prompt = "You are a classifier."
+    for _ in range(3):
+        cache.generate_content("gemini-2.0-flash", prompt, "entry deleted")
+    assert stand_in.created == 0
+    assert stand_in.billed_input_tokens == 3 * (estimate_tokens(prompt) + estimate_tokens("entry deleted"))
+
+
+def test_model_minimums():
+    assert min_cache_tokens("models/gemini-2.0-flash-001") == 2048
+    assert min_cache_tokens("gemini-2.5-flash") == 1024
+    assert min_cache_tokens("unknown-model") == 4096
+
+
+def test_deleted_cache_is_recreated_after_an_inline_retry():
+    stand_in = LocalCacheStandIn()
+    cache = PromptCache(None, stand_in)
+    name = cache.handle("gemini-2.0-flash", PROMPT)
+    stand_in.caches.delete(name=name)
+    cache.generate_content("gemini-2.0-flash", PROMPT, "entry deleted")  # <--- KeyError is definitive: retried inline
+    assert stand_in.calls == 2
+    assert cache.handle("gemini-2.0-flash", PROMPT) != name and stand_in.created == 2
+
+
+def test_transient_error_keeps_the_cache():
+    stand_in = LocalCacheStandIn()
+    cache = PromptCache(None, stand_in)
+    name = cache.handle("gemini-2.0-flash", PROMPT)
+
+    def throttled(model, config, contents):
+        raise StatusError(429)
+
+    stand_in.models.generate_content = throttled
+    with pytest.raises(StatusError):
+        cache.generate_content("gemini-2.0-flash", PROMPT, "entry deleted")
+    assert cache.handle("gemini-2.0-flash", PROMPT) == name and stand_in.created == 1
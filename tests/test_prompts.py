@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from config.prompts import FewShotExample, PromptBudgetExceeded, PromptRegistry, PromptTemplate
+
+EXAMPLES = [
+    FewShotExample("The repair went smoothly and the unit works again.", "positive"),
+    FewShotExample("Sensor broke down again, nobody came to fix it.", "negative"),
+    FewShotExample("Patrol finished at 22:00.", "neutral"),
+    FewShotExample("The cable broke down and the sensor is dead.", "negative"),
+]
+TEMPLATE = """
+        Classify the sentiment of the text.
+
+        $examples
+    """
+
+
+def registry(**kwargs):
+    prompts = PromptRegistry(None, baseline_path=None)
+    prompts.register(PromptTemplate("sentiment", TEMPLATE, EXAMPLES, **kwargs))
+    return prompts
+
+
+def test_template_whitespace_is_normalized():
+    prompt, _ = registry().render("sentiment")
+    assert prompt.startswith("Classify the sentiment of the text.\n\nSample input 1:")
+    assert not any(line != line.rstrip() for line in prompt.splitlines())
+
+
+def test_selection_keeps_one_example_per_label():
+    prompts = registry()
+    assert prompts.select_examples("sentiment", "the sensor broke down", 1) == [3, 0, 2]
+    assert prompts.select_examples("sentiment", "the sensor broke down", 4)[:3] == [3, 0, 2]
+
+
+def test_budget_drops_examples_before_failing():
+    full, tokens = registry().render("sentiment", "The sensor broke down.")
+    prompt, trimmed = registry(budget_tokens=tokens - 5).render("sentiment", "The sensor broke down.")
+    assert trimmed <= tokens - 5 and len(prompt) < len(full)
+    with pytest.raises(PromptBudgetExceeded):
+        registry(budget_tokens=5).render("sentiment", "The sensor broke down.")
+
+
+def test_baseline_is_read_lazily_and_regressions_are_reported(tmp_path):
+    path = tmp_path / "prompt_tokens.json"
+    prompts = PromptRegistry(None, baseline_path=str(path))
+    path.write_text(json.dumps({"sentiment": 100}))  # <--- Written after construction, still picked up
+    prompts.record("sentiment", 150)
+    prompts.record("sentiment", 110)
+    assert prompts.report() == {"sentiment": {"calls": 2, "mean_tokens": 130.0, "max_tokens": 150, "change_vs_baseline": 0.3}}
+    prompts.save_baseline()
+    assert json.loads(path.read_text()) == {"sentiment": 130.0}
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+
+from config.rate_limiter import (AdmissionController, ProviderLimits, ProviderState, RateLimitError, TokenBucket,
+                                 is_rate_limit_error, retry_after_seconds)
+
+
+class StatusError(Exception):
+    def __init__(self, message="", **attributes):
+        super().__init__(message)
+        for name, value in attributes.items():
+            setattr(self, name, value)
+
+
+class ResourceExhausted(Exception):
+    """Named like google.api_core.exceptions.ResourceExhausted."""
+
+
+def test_reserve_charges_the_full_amount():
+    bucket = TokenBucket(rate_per_second=10, capacity=100)
+    assert bucket.reserve(50) == 0.0
+    assert bucket.reserve(150) == pytest.approx(10.0, abs=0.05)  # <--- 100 tokens short at 10 per second
+    assert bucket.available() < -99
+
+
+def test_token_bucket_holds_a_minute_of_quota():
+    state = ProviderState(ProviderLimits(requests_per_minute=60, tokens_per_minute=6000))
+    assert state.tokens.capacity == 6000
+    assert state.tokens.reserve(6000) == 0.0
+
+
+@pytest.mark.parametrize("error", [
+    RateLimitError(),
+    ResourceExhausted("quota"),
+    StatusError(status_code=429),
+    StatusError(code=429),
+    StatusError(status="RESOURCE_EXHAUSTED"),
+    StatusError(response=StatusError(status_code=429)),
+])
+def test_rate_limit_errors_are_recognised(error):
+    assert is_rate_limit_error(error)
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("Response of 4290 bytes could not be parsed"),
+    StatusError("RESOURCE_EXHAUSTED mentioned in a message", status_code=500),
+    StatusError(code=400),
+])
+def test_other_errors_are_not_rate_limits(error):
+    assert not is_rate_limit_error(error)
+
+
+def test_retry_after_is_read_from_headers():
+    assert retry_after_seconds(RateLimitError(retry_after=3)) == 3.0
+    assert retry_after_seconds(StatusError(response=StatusError(headers={"retry-after": "7"}))) == 7.0
+    assert retry_after_seconds(ValueError()) is None
+
+
+def test_throttling_halves_concurrency_and_success_raises_it():
+    controller = AdmissionController(None, default_limits=ProviderLimits(requests_per_minute=6000, initial_concurrency=8))
+    with pytest.raises(RateLimitError):
+        with controller.admit("gemini", "flash"):
+            raise RateLimitError()
+    state = controller.state("gemini", "flash")
+    assert state.concurrency_limit == 4
+    with controller.admit("gemini", "flash"):
+        pass
+    assert state.concurrency_limit == pytest.approx(4.25)
+    assert state.stats == {"admitted": 2, "succeeded": 1, "throttled": 1, "failed": 0}
+
+
+def test_call_retries_rate_limits_only():
+    controller = AdmissionController(None, default_limits=ProviderLimits(requests_per_minute=6000))
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RateLimitError(retry_after=0.01)
+        return "ok"
+
+    assert controller.call("openai", "gpt-4o-mini", flaky) == "ok"
+    assert len(attempts) == 3
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        controller.call("openai", "gpt-4o-mini", broken)
+    assert len(attempts) == 4
+
+
+def test_interrupted_call_releases_its_slot():
+    controller = AdmissionController(None, default_limits=ProviderLimits(requests_per_minute=6000, initial_concurrency=1))
+    with pytest.raises(KeyboardInterrupt):
+        with controller.admit("openai", "gpt-4o-mini"):
+            raise KeyboardInterrupt
+    state = controller.state("openai", "gpt-4o-mini")
+    assert state.in_flight == 0 and state.stats["failed"] == 1
+
+
+def test_cancelled_task_releases_its_slot():
+    controller = AdmissionController(None, default_limits=ProviderLimits(requests_per_minute=6000, initial_concurrency=1))
+
+    async def slow():
+        await asyncio.sleep(10)
+
+    async def main():
+        task = asyncio.create_task(controller.call_async("gemini", "flash", slow))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await asyncio.wait_for(controller.call_async("gemini", "flash", asyncio.sleep, 0, result="ok"), 1)
+
+    assert asyncio.run(main()) == "ok"
+    assert controller.state("gemini", "flash").in_flight == 0
@@ -0,0 +1,43 @@
+import threading
+
+from config.results_store import ResultsStore
+
+
+def test_newest_result_per_source_wins(tmp_path):
+    store = ResultsStore(None, str(tmp_path / "results.sqlite"))
+    store.add("a.png", "hash-a", "ocr", "first", model="gemini-2.0-flash")
+    store.add("a.png", "hash-a", "ocr", "second", model="gemini-2.0-flash")
+    store.add("b.mp3", "hash-b", "transcribe", "hello")
+    assert store.texts("ocr") == {"a.png": "second"}
+    assert store.latest("hash-a", "ocr", "gemini-2.0-flash")["text"] == "second"
+    assert store.latest("hash-a", "ocr", "gemini-1.5-flash") is None
+
+
+def test_concurrent_writers_lose_no_rows(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    stores = [ResultsStore(None, path, busy_timeout_ms=30000) for _ in range(2)]  # <--- Two stores act like two processes
+    errors = []
+
+    def write(store, writer):
+        try:
+            for number in range(50):
+                store.add(f"{writer}-{number}.png", f"hash-{writer}-{number}", "ocr", f"text {number}")
+            store.add_many([{"source_path": f"{writer}-batch-{number}.png", "source_hash": "batch", "stage": "ocr",
+                             "text": "batch"} for number in range(20)])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write, args=(stores[writer % 2], writer)) for writer in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(ResultsStore(None, path).texts("ocr")) == 6 * 70
+
+
+def test_export_writes_sidecar_files(tmp_path):
+    store = ResultsStore(None, str(tmp_path / "results.sqlite"))
+    store.add(str(tmp_path / "scan.png"), "hash", "ocr", "text")
+    assert store.export_txt("ocr") == [str(tmp_path / "scan.txt")]
+    assert (tmp_path / "scan.txt").read_text() == "text"
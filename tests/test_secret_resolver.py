@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from config.secret_resolver import EncryptedFileCache, LocalSecretManagerFake, SecretManagerBackend, SecretResolver
+
+SECRETS = {"GEMINI_API_KEY": "gemini-value", "OPENAI_API_KEY": "openai-value"}
+
+
+@pytest.fixture
+def fake():
+    return LocalSecretManagerFake(SECRETS)
+
+
+def resolver(fake, **kwargs):
+    return SecretResolver(None, SecretManagerBackend("local", fake), **kwargs)
+
+
+def take_down(fake):
+    def unreachable(request):
+        fake.calls += 1
+        raise ConnectionError("Secret Manager unreachable")
+    fake.access_secret_version = unreachable
+
+
+def test_one_remote_call_per_name_per_ttl(fake):
+    secrets = resolver(fake)
+    assert secrets.get_many(["GEMINI_API_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY"]) == SECRETS
+    for _ in range(5):
+        assert secrets.get("GEMINI_API_KEY") == "gemini-value"
+    assert fake.calls == 2
+
+
+def test_expired_value_is_fetched_again(fake):
+    secrets = resolver(fake, ttl_seconds=0.05, refresh_margin_seconds=0)
+    secrets.get("GEMINI_API_KEY")
+    time.sleep(0.06)
+    fake.secrets["GEMINI_API_KEY"] = "rotated"
+    assert secrets.get("GEMINI_API_KEY") == "rotated" and fake.calls == 2
+
+
+def test_value_close_to_expiry_is_refreshed_in_the_background(fake):
+    secrets = resolver(fake, ttl_seconds=0.5, refresh_margin_seconds=0.45)
+    secrets.get("GEMINI_API_KEY")
+    time.sleep(0.1)
+    fake.secrets["GEMINI_API_KEY"] = "rotated"
+    assert secrets.get("GEMINI_API_KEY") == "gemini-value"  # <--- Served at once, refreshed behind the caller
+    deadline = time.time() + 2
+    while secrets.stats["background_refreshes"] == 0 and time.time() < deadline:
+        time.sleep(0.01)
+    assert secrets.get("GEMINI_API_KEY") == "rotated" and fake.calls == 2
+
+
+def test_stale_value_is_served_while_the_backend_is_down(fake):
+    secrets = resolver(fake, ttl_seconds=0.05, refresh_margin_seconds=0)
+    secrets.get("GEMINI_API_KEY")
+    time.sleep(0.06)
+    take_down(fake)
+    assert secrets.get("GEMINI_API_KEY") == "gemini-value"
+    assert secrets.stats["stale_served"] == 1
+
+
+def test_failed_lookup_is_not_repeated_within_the_failure_ttl(fake, monkeypatch):
+    monkeypatch.setenv("GEMINI_API_KEY", "env-value")
+    take_down(fake)
+    secrets = resolver(fake, failure_ttl_seconds=0.1)
+    for _ in range(3):
+        assert secrets.get("GEMINI_API_KEY") == "env-value"
+    assert fake.calls == 1 and secrets.stats["failures_cached"] == 2
+    time.sleep(0.11)
+    secrets.get("GEMINI_API_KEY")
+    assert fake.calls == 2
+
+
+def test_missing_secret_falls_back_to_the_environment(fake, monkeypatch):
+    monkeypatch.setenv("AIDEVS_API_KEY", "env-value")
+    secrets = resolver(fake)
+    assert secrets.get("AIDEVS_API_KEY") == "env-value"
+    assert secrets.get("UNSET_SECRET_FOR_TESTS", "default") == "default"
+    secrets.get("AIDEVS_API_KEY")
+    assert fake.calls == 2  # <--- Missing names are cached too
+    assert SecretResolver(None).get("AIDEVS_API_KEY") == "env-value"
+
+
+def test_encrypted_file_cache_round_trip(fake, tmp_path):
+    from cryptography.fernet import Fernet
+    key = Fernet.generate_key().decode()
+    path = str(tmp_path / "secrets.cache")
+    resolver(fake, file_cache=EncryptedFileCache(None, path, key)).get_many(SECRETS)
+    with open(path, "rb") as f:
+        assert b"gemini-value" not in f.read()
+
+    assert resolver(fake, file_cache=EncryptedFileCache(None, path, key)).get_many(SECRETS) == SECRETS
+    assert fake.calls == 2  # <--- The second process is served from the file
+    assert EncryptedFileCache(None, path, Fernet.generate_key().decode()).load() == {}
@@ -0,0 +1,97 @@
+import http.client
+
+import pytest
+
+from config.artifact_store import ArtifactStore, description_key, stub_producer
+from config.static_server import StaticServer, parse_range
+
+
+def counting_producer(calls):
+    def produce(description):
+        calls.append(description)
+        return stub_producer(description)
+    return produce
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(None, str(tmp_path / "artifacts"))
+
+
+@pytest.fixture
+def server(store):
+    server = StaticServer(None, store, port=0)
+    server.start()
+    yield server
+    server.stop()
+
+
+def request(server, path, headers=None):
+    host, port = server.httpd.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request("GET", path, headers=headers or {})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+
+def test_repeated_or_normalised_description_is_produced_once(store):
+    calls = []
+    first = store.get_or_create("A robot with  four legs.", counting_producer(calls))
+    again = store.get_or_create("a robot with four legs", counting_producer(calls))
+    assert calls == ["A robot with  four legs."]
+    assert again == first and first["key"] == description_key("A ROBOT WITH FOUR LEGS!")
+
+
+def test_missing_artifact_file_is_produced_again(store, tmp_path):
+    calls = []
+    metadata = store.get_or_create("a robot", counting_producer(calls))
+    (tmp_path / "artifacts" / metadata["filename"]).unlink()
+    store.get_or_create("a robot", counting_producer(calls))
+    assert len(calls) == 2
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=5-", (5, 69)),
+    ("bytes=-10", (60, 69)),
+    ("bytes=60-200", (60, 69)),
+    ("bytes=70-", None),
+    ("bytes=9-5", None),
+    ("bytes=-0", None),
+    ("bytes=0-1,4-5", None),
+    ("items=0-1", None),
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 70) == expected
+
+
+def test_etag_revalidation_returns_304(server, store):
+    metadata = store.get_or_create("a robot", stub_producer)
+    response, body = request(server, f"/{metadata['filename']}")
+    assert response.status == 200 and body == stub_producer("a robot")[0]
+    assert response.getheader("Content-Type") == "image/png"
+
+    response, body = request(server, f"/{metadata['filename']}", {"If-None-Match": response.getheader("ETag")})
+    assert response.status == 304 and body == b""
+
+
+def test_single_range_returns_206(server, store):
+    metadata = store.get_or_create("a robot", stub_producer)
+    data = stub_producer("a robot")[0]
+    response, body = request(server, f"/{metadata['filename']}", {"Range": "bytes=0-7"})
+    assert response.status == 206 and body == data[:8]
+    assert response.getheader("Content-Range") == f"bytes 0-7/{len(data)}"
+
+
+def test_unsatisfiable_range_returns_416(server, store):
+    metadata = store.get_or_create("a robot", stub_producer)
+    response, body = request(server, f"/{metadata['filename']}", {"Range": f"bytes={metadata['size']}-"})
+    assert response.status == 416
+    assert response.getheader("Content-Range") == f"bytes */{metadata['size']}"
+
+
+def test_unknown_key_returns_404(server):
+    response, _ = request(server, "/../secrets.png")
+    assert response.status == 404
@@ -0,0 +1,67 @@
+import pytest
+
+from config.streaming_json import IncrementalJSONObjectParser, first_json_object
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 5, 1000])
+def test_object_split_across_chunks(size):
+    parser = IncrementalJSONObjectParser()
+    completed = []
+    for chunk in split('{"people": true, "nested": {"hardware": false}}', size):
+        completed += parser.feed(chunk)
+    assert completed == ['{"people": true, "nested": {"hardware": false}}']
+
+
+def test_braces_and_escapes_inside_strings_are_not_counted():
+    parser = IncrementalJSONObjectParser()
+    source = r'{"reason": "a } and a { and an escaped \" quote }", "path": "C:\\"}'
+    assert parser.feed(source[:20]) == []
+    assert parser.feed(source[20:]) == [source]
+
+
+def test_every_top_level_object_is_reported():
+    parser = IncrementalJSONObjectParser()
+    assert parser.feed('{"a": 1} text {"b": ') == ['{"a": 1}']
+    assert parser.feed('2}') == ['{"b": 2}']
+
+
+@pytest.mark.parametrize("wrapped", [
+    '```json\n{"people": true}\n```',
+    'Here is the answer: {"people": true} Let me know if you need more.',
+    '"{"people": true}"',
+])
+def test_wrapped_or_fenced_output(wrapped):
+    parsed, _ = first_json_object(split(wrapped, 3))
+    assert parsed == {"people": True}
+
+
+def test_stream_is_closed_after_the_first_valid_object():
+    consumed = []
+
+    def stream():
+        try:
+            for chunk in ['{"people": ', 'true}', ' trailing', ' tokens']:
+                consumed.append(chunk)
+                yield chunk
+        finally:
+            consumed.append("closed")
+
+    parsed, text = first_json_object(stream())
+    assert parsed == {"people": True} and text == '{"people": true}'
+    assert consumed == ['{"people": ', 'true}', "closed"]
+
+
+def test_malformed_and_invalid_objects_are_skipped():
+    chunks = ['{"people": tru}', '{"other": 1}', '{"people": false, "hardware": true}']
+    parsed, _ = first_json_object(chunks, validate=lambda obj: "people" in obj)
+    assert parsed == {"people": False, "hardware": True}
+
+
+@pytest.mark.parametrize("chunks", [[], ["no json here"], ['{"people": true', None], ["[1, 2, 3]"]])
+def test_no_complete_object(chunks):
+    parsed, text = first_json_object(chunks)
+    assert parsed is None and text == "".join(chunk or "" for chunk in chunks)